@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+class UserCache:
+    """Bounded LRU cache of authenticated users keyed by token subject (email).
+
+    Entries expire after ``ttl_seconds`` so changes made by another worker
+    process are picked up without explicit invalidation; changes made in this
+    process call ``invalidate`` right away.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._emails_by_id = {}
+        self._lock = threading.Lock()
+
+    def get(self, email: str):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                self._remove(email)
+                return None
+            self._entries.move_to_end(email)
+            # Hand out a copy so request handlers can't mutate the cached entry
+            return dict(user)
+
+    def set(self, email: str, user: dict):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._remove(email)
+            self._entries[email] = (time.monotonic() + self.ttl_seconds, dict(user))
+            if user.get("id"):
+                self._emails_by_id[user["id"]] = email
+            while len(self._entries) > self.max_size:
+                oldest_email = next(iter(self._entries))
+                self._remove(oldest_email)
+
+    def invalidate(self, email: str = None, user_id: str = None):
+        with self._lock:
+            if user_id is not None:
+                email = self._emails_by_id.get(user_id, email)
+            if email is not None:
+                self._remove(email)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._emails_by_id.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, email: str):
+        entry = self._entries.pop(email, None)
+        if entry is not None:
+            user_id = entry[1].get("id")
+            if user_id is not None and self._emails_by_id.get(user_id) == email:
+                del self._emails_by_id[user_id]
@@ -0,0 +1,11 @@
+from passlib.context import CryptContext
+
+# Kept free of database/app imports: this module is loaded by every
+# password-hashing worker process.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
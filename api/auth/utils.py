@@ -1,19 +1,64 @@
-from passlib.context import CryptContext
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from config.settings import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
-from database.connection import driver
+from config.settings import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS,
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT
+)
+from database.async_connection import read_query
+from auth.cache import UserCache
+from auth.hashing import pwd_context, hash_password, check_password
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+user_cache = UserCache(max_size=USER_CACHE_MAX_SIZE, ttl_seconds=USER_CACHE_TTL_SECONDS)
+
+_hash_executor = None
+_pending_hash_jobs = 0
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return check_password(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hash_password(password)
+
+def get_hash_executor():
+    """Return the process pool used for bcrypt, starting it on first use"""
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+    return _hash_executor
+
+def shutdown_hash_executor():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+async def _run_in_hash_executor(func, *args):
+    global _pending_hash_jobs
+    if _pending_hash_jobs >= PASSWORD_HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    _pending_hash_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_hash_executor(), func, *args)
+    finally:
+        _pending_hash_jobs -= 1
+
+async def verify_password_async(plain_password, hashed_password):
+    """Verify a bcrypt hash in the hashing process pool"""
+    return await _run_in_hash_executor(check_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    """Hash a password in the hashing process pool"""
+    return await _run_in_hash_executor(hash_password, password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -25,7 +70,11 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def invalidate_user(email: str = None, user_id: str = None):
+    """Drop a user from the auth cache after their account or profile changes"""
+    user_cache.invalidate(email=email, user_id=user_id)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -37,17 +86,20 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         if email is None:
             raise credentials_exception
         
+        cached_user = user_cache.get(email)
+        if cached_user is not None:
+            return cached_user
+        
         # Get user from Neo4j
-        with driver.session() as session:
-            result = session.run(
-                "MATCH (u:User {email: $email}) RETURN u",
-                email=email
-            )
-            record = result.single()
-            if record is None:
-                raise credentials_exception
-            user_dict = dict(record["u"])
-            del user_dict["password"]  # Don't return password
-            return user_dict
+        records = await read_query(
+            "MATCH (u:User {email: $email}) RETURN u",
+            {"email": email}
+        )
+        if not records:
+            raise credentials_exception
+        user_dict = dict(records[0]["u"])
+        del user_dict["password"]  # Don't return password
+        user_cache.set(email, user_dict)
+        return dict(user_dict)
     except JWTError:
         raise credentials_exception
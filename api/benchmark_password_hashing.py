@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark login throughput with bcrypt verification inline vs. in the hashing process pool
+Runs offline - no database or server needed
+"""
+
+import sys
+import os
+import time
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from auth.hashing import hash_password, check_password
+
+CONCURRENT_LOGINS = 64
+TEST_PASSWORD = "benchmarkpassword123"
+
+async def run_logins(executor, hashed):
+    """Verify CONCURRENT_LOGINS passwords at once and return logins per second"""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        loop.run_in_executor(executor, check_password, TEST_PASSWORD, hashed)
+        for _ in range(CONCURRENT_LOGINS)
+    ])
+    return CONCURRENT_LOGINS / (time.perf_counter() - start)
+
+def benchmark_password_hashing():
+    print("🔐 Password Hashing Throughput Benchmark")
+    print("=" * 50)
+
+    hashed = hash_password(TEST_PASSWORD)
+    cpu_count = os.cpu_count() or 1
+    print(f"CPUs: {cpu_count}, concurrent logins per run: {CONCURRENT_LOGINS}")
+    print("-" * 50)
+
+    # Baseline: what the request handlers did before - threads contending for the GIL
+    with ThreadPoolExecutor(max_workers=40) as executor:
+        baseline = asyncio.run(run_logins(executor, hashed))
+    print(f"Threadpool (40 threads):   {baseline:8.1f} logins/s")
+
+    workers = 1
+    while True:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Warm up so process start-up isn't counted
+            list(executor.map(check_password, [TEST_PASSWORD] * workers, [hashed] * workers))
+            throughput = asyncio.run(run_logins(executor, hashed))
+        print(f"Process pool ({workers:2d} workers): {throughput:8.1f} logins/s ({throughput / baseline:.1f}x)")
+
+        if workers >= cpu_count:
+            break
+        workers = min(workers * 2, cpu_count)
+
+if __name__ == "__main__":
+    benchmark_password_hashing()
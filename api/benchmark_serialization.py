@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark Neo4j record -> JSON response serialization on a 10k-row result
+Compares the per-router dict()/str() loops rendered through FastAPI's default
+JSONResponse with database.serialization. Runs offline - no database or server needed
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from neo4j import Record
+from neo4j.graph import Graph, Node
+from neo4j.time import DateTime
+
+from database.serialization import GraphJSONResponse, serialize_node
+
+ROWS = 10_000
+ROUNDS = 5
+
+def build_records():
+    """Appointment rows shaped like /appointments/my-appointments: (a, d, du)"""
+    graph = Graph()
+    created = DateTime(2024, 5, 1, 9, 30, 0)
+    records = []
+    for i in range(ROWS):
+        appointment = Node(graph, f"a{i}", i, ["Appointment"], {
+            "id": f"appointment-{i}", "patient_id": f"patient-{i % 500}", "doctor_id": f"doctor-{i % 50}",
+            "appointment_date": "2024-05-02", "appointment_time": "10:00", "appointment_type": "consultation",
+            "reason": "Follow-up visit", "duration_minutes": 30, "status": "scheduled", "is_urgent": False,
+            "created_at": created, "updated_at": created
+        })
+        doctor = Node(graph, f"d{i}", ROWS + i, ["Doctor"], {
+            "user_id": f"doctor-{i % 50}", "full_name": "Dr. Jane Doe", "specialization": "Cardiology",
+            "rating": 4.5, "consultation_fee": 80.0, "available_days": ["Monday", "Tuesday", "Wednesday"],
+            "created_at": created, "updated_at": created
+        })
+        doctor_user = Node(graph, f"u{i}", 2 * ROWS + i, ["User"], {
+            "id": f"doctor-{i % 50}", "email": "jane@example.com", "role": "doctor",
+            "password": "$2b$12$abcdefghijklmnopqrstuv", "created_at": created, "updated_at": created
+        })
+        records.append(Record({"a": appointment, "d": doctor, "du": doctor_user}))
+    return records
+
+def router_loops(records):
+    """What the routers did before: copy, stringify known fields, delete the password"""
+    appointments = []
+    for record in records:
+        appointment = dict(record["a"])
+        for field in ['created_at', 'updated_at']:
+            if field in appointment and appointment[field]:
+                appointment[field] = str(appointment[field])
+        doctor = dict(record["d"]) if record["d"] else None
+        for field in ['created_at', 'updated_at']:
+            if field in doctor and doctor[field]:
+                doctor[field] = str(doctor[field])
+        doctor_user = dict(record["du"]) if record["du"] else None
+        if doctor_user and 'password' in doctor_user:
+            del doctor_user['password']
+        for field in ['created_at', 'updated_at']:
+            if field in doctor_user and doctor_user[field]:
+                doctor_user[field] = str(doctor_user[field])
+        appointments.append({"appointment": appointment, "doctor": doctor, "doctor_user": doctor_user})
+    # FastAPI runs jsonable_encoder over a returned dict before rendering it
+    return JSONResponse(jsonable_encoder({"appointments": appointments})).body
+
+def serializer_returned(records):
+    """serialize_node in the router, returned as a dict through the default response class"""
+    appointments = [
+        {"appointment": serialize_node(record["a"]), "doctor": serialize_node(record["d"]),
+         "doctor_user": serialize_node(record["du"])}
+        for record in records
+    ]
+    return GraphJSONResponse(jsonable_encoder({"appointments": appointments})).body
+
+def graph_response(records):
+    """Raw nodes returned in a GraphJSONResponse, converted while orjson encodes"""
+    return GraphJSONResponse({
+        "appointments": [{"appointment": record["a"], "doctor": record["d"], "doctor_user": record["du"]} for record in records]
+    }).body
+
+def best_time(func, records):
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        body = func(records)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+def benchmark_serialization():
+    print("📦 Record Serialization Benchmark")
+    print("=" * 50)
+    records = build_records()
+    print(f"Rows: {ROWS}, best of {ROUNDS} rounds")
+    print("-" * 50)
+
+    baseline, body = best_time(router_loops, records)
+    print(f"Router loops + JSONResponse:     {baseline * 1000:8.1f} ms ({len(body) / 1024:.0f} KiB)")
+
+    for label, func in [
+        ("serialize_node + jsonable_encoder", serializer_returned),
+        ("GraphJSONResponse (raw nodes)", graph_response),
+    ]:
+        elapsed, body = best_time(func, records)
+        assert b"password" not in body
+        print(f"{label + ':':33s}{elapsed * 1000:8.1f} ms ({baseline / elapsed:.1f}x)")
+
+if __name__ == "__main__":
+    benchmark_serialization()
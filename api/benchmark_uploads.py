@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark peak memory of saving a 100 MB upload
+Compares the old read-everything-then-write handler with services.file_storage
+streaming, measured with tracemalloc. Runs offline - no database or server needed
+"""
+
+import sys
+import os
+import tempfile
+import time
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import UploadFile
+
+from services.file_storage import store_upload
+
+UPLOAD_MB = 100
+
+def make_upload(path):
+    """An UploadFile over a file on disk, like Starlette's spooled multipart parts"""
+    return UploadFile(open(path, "rb"), size=os.path.getsize(path), filename="scan.pdf")
+
+def read_whole(upload, directory):
+    """What the routers did before"""
+    with open(os.path.join(directory, "whole.pdf"), "wb") as buffer:
+        content = upload.file.read()
+        buffer.write(content)
+    return len(content)
+
+def streamed(upload, directory):
+    return store_upload(upload, directory, "streamed.pdf", max_size=UPLOAD_MB * 1024 * 1024).size
+
+def measure(func, source, directory):
+    upload = make_upload(source)
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        size = func(upload, directory)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        upload.file.close()
+    return size, elapsed, peak
+
+def benchmark_uploads():
+    print("📁 Upload Memory Benchmark")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source.bin")
+        with open(source, "wb") as f:
+            for _ in range(UPLOAD_MB):
+                f.write(os.urandom(1024 * 1024))
+        print(f"Upload size: {UPLOAD_MB} MB")
+        print("-" * 50)
+
+        for label, func in [
+            ("read() then write", read_whole),
+            ("streamed in chunks", streamed),
+        ]:
+            size, elapsed, peak = measure(func, source, directory)
+            assert size == UPLOAD_MB * 1024 * 1024
+            print(f"{label + ':':22s} peak {peak / (1024 * 1024):7.1f} MB, {elapsed * 1000:7.1f} ms")
+
+        # One byte over the limit is rejected mid-stream and leaves nothing behind
+        upload = make_upload(source)
+        upload.size = None
+        try:
+            store_upload(upload, directory, "rejected.pdf", max_size=UPLOAD_MB * 1024 * 1024 - 1)
+            print("❌ Oversized upload was accepted")
+        except Exception as e:
+            leftovers = [name for name in os.listdir(directory) if name.startswith((".upload-", "rejected"))]
+            print(f"Oversized upload: {getattr(e, 'status_code', e)}, leftover files: {len(leftovers)}")
+        finally:
+            upload.file.close()
+
+if __name__ == "__main__":
+    benchmark_uploads()
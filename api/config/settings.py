@@ -9,11 +9,81 @@ NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "change_this_password")
 
+# Neo4j connection pool settings (applied to both the sync and async drivers)
+NEO4J_MAX_CONNECTION_POOL_SIZE = int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", "100"))
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "60"))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+NEO4J_CONNECTION_TIMEOUT = float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "30"))
+# How long managed transactions keep retrying transient errors (leader switch, deadlock, lost connection)
+NEO4J_MAX_TRANSACTION_RETRY_TIME = float(os.getenv("NEO4J_MAX_TRANSACTION_RETRY_TIME", "15"))
+# Seconds a pooled connection may sit idle before it is pinged on checkout; empty disables the check
+NEO4J_LIVENESS_CHECK_TIMEOUT = float(os.getenv("NEO4J_LIVENESS_CHECK_TIMEOUT")) if os.getenv("NEO4J_LIVENESS_CHECK_TIMEOUT") else None
+
+# Apply pending constraint/index migrations (database/schema.py) on startup
+SCHEMA_AUTO_MIGRATE = os.getenv("SCHEMA_AUTO_MIGRATE", "true").lower() == "true"
+
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your_super_secure_jwt_secret_here_minimum_32_characters")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Password hashing worker pool (bcrypt runs in separate processes, off the event loop).
+# Every uvicorn worker builds its own pool, so a server runs uvicorn workers x
+# PASSWORD_HASH_WORKERS hashing processes; lower this when running several workers
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS") or os.cpu_count() or 1)
+# Hash/verify jobs allowed in flight in each uvicorn worker's pool before new
+# logins get a 503; the server-wide limit is uvicorn workers x this
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "256"))
+
+# Authenticated user cache used by get_current_user (0 disables it)
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+# In-process doctor catalog behind autocomplete and /profiles/doctors/search
+DOCTOR_CATALOG_REFRESH_SECONDS = float(os.getenv("DOCTOR_CATALOG_REFRESH_SECONDS", "300"))
+# Width of the consultation fee buckets used by the catalog's max-fee filter
+DOCTOR_CATALOG_FEE_BUCKET = float(os.getenv("DOCTOR_CATALOG_FEE_BUCKET", "25"))
+
+# Doctors whose computed availability is cached per worker process
+AVAILABILITY_CACHE_MAX_DOCTORS = int(os.getenv("AVAILABILITY_CACHE_MAX_DOCTORS", "5000"))
+
+# How long a doctor holds a claimed consultation before it returns to the queue
+CONSULTATION_LEASE_SECONDS = int(os.getenv("CONSULTATION_LEASE_SECONDS", "900"))
+
+# Pub/sub backend that fans real-time events out to every worker:
+# memory:// (single worker), redis://host:port or unix:///path/to/redis.sock
+PUBSUB_URL = os.getenv("PUBSUB_URL", "memory://")
+
+# Outbound WebSocket queues (notifications and video rooms): messages queued per
+# socket, and seconds one send may take before the socket is dropped
+WEBSOCKET_SEND_QUEUE_SIZE = int(os.getenv("WEBSOCKET_SEND_QUEUE_SIZE", "256"))
+WEBSOCKET_SEND_TIMEOUT_SECONDS = float(os.getenv("WEBSOCKET_SEND_TIMEOUT_SECONDS", "5"))
+
+# Video room chat is written in batches: every CHAT_FLUSH_INTERVAL_MS or
+# CHAT_FLUSH_MAX_MESSAGES messages, holding at most CHAT_BUFFER_MAX_MESSAGES unsaved
+CHAT_FLUSH_INTERVAL_MS = int(os.getenv("CHAT_FLUSH_INTERVAL_MS", "200"))
+CHAT_FLUSH_MAX_MESSAGES = int(os.getenv("CHAT_FLUSH_MAX_MESSAGES", "100"))
+CHAT_BUFFER_MAX_MESSAGES = int(os.getenv("CHAT_BUFFER_MAX_MESSAGES", "10000"))
+
+# Admin analytics rollups: seconds between batched counter writes, and
+# between full recounts that correct any drift
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "5"))
+ANALYTICS_RECONCILE_SECONDS = float(os.getenv("ANALYTICS_RECONCILE_SECONDS", "3600"))
+
+# Admin report snapshots: how often closed days/months are materialized and
+# how far back the scheduler fills in missing ones
+REPORT_SCHEDULER_INTERVAL_SECONDS = float(os.getenv("REPORT_SCHEDULER_INTERVAL_SECONDS", "3600"))
+REPORT_BACKFILL_DAYS = int(os.getenv("REPORT_BACKFILL_DAYS", "90"))
+REPORT_BACKFILL_MONTHS = int(os.getenv("REPORT_BACKFILL_MONTHS", "12"))
+
+# Uploaded files: where they are stored, the URL path UPLOAD_DIR is served
+# under, size limits in bytes, and the chunk size they are streamed to disk in
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_URL_PREFIX = os.getenv("UPLOAD_URL_PREFIX", "/uploads").rstrip("/")
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", str(10 * 1024 * 1024)))
+MAX_AVATAR_SIZE = int(os.getenv("MAX_AVATAR_SIZE", str(5 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
 # CORS settings
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
 
@@ -0,0 +1,74 @@
+"""Async Neo4j data access.
+
+Routers that are declared with ``async def`` must not touch the blocking
+driver in ``database.connection`` - every Bolt round-trip would stall the
+event loop. They should import from this module instead:
+
+    from database.async_connection import run_query, run_write
+
+    @router.get("/{user_id}")
+    async def get_patient(user_id: str):
+        result = await run_query("MATCH (p:Patient {user_id: $user_id}) RETURN p", {"user_id": user_id})
+
+Routers that still use ``driver.session()`` keep working unchanged as plain
+``def`` endpoints (FastAPI runs them in its threadpool), so they can be
+migrated one at a time.
+"""
+
+from neo4j import AsyncGraphDatabase, READ_ACCESS, WRITE_ACCESS
+from config.settings import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+from database.connection import get_driver_config, get_pool_stats, is_write_query
+
+_async_driver = None
+
+def get_async_driver():
+    """Return the shared async driver, creating it on first use"""
+    global _async_driver
+    if _async_driver is None:
+        _async_driver = AsyncGraphDatabase.driver(
+            NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD), **get_driver_config()
+        )
+    return _async_driver
+
+async def close_async_driver():
+    """Close the shared async driver (called on application shutdown)"""
+    global _async_driver
+    if _async_driver is not None:
+        await _async_driver.close()
+        _async_driver = None
+
+def get_async_pool_stats():
+    """Pool utilization of the async driver (empty until it is first used)"""
+    return get_pool_stats(_async_driver)
+
+async def _collect_records(tx, query, parameters):
+    result = await tx.run(query, parameters)
+    return [record async for record in result]
+
+async def read_query(query: str, parameters: dict = None):
+    """Run a query in a managed read transaction (retried, routed to followers)"""
+    async with get_async_driver().session(default_access_mode=READ_ACCESS) as session:
+        return await session.execute_read(_collect_records, query, parameters or {})
+
+async def write_query(query: str, parameters: dict = None):
+    """Run a query in a managed write transaction on the cluster leader"""
+    async with get_async_driver().session(default_access_mode=WRITE_ACCESS) as session:
+        return await session.execute_write(_collect_records, query, parameters or {})
+
+async def run_query(query: str, parameters: dict = None):
+    """Run a query as a read or write transaction and return every record as a dict"""
+    if is_write_query(query):
+        records = await write_query(query, parameters)
+    else:
+        records = await read_query(query, parameters)
+    return [record.data() for record in records]
+
+async def run_write(query: str, parameters: dict = None):
+    """Run a query inside a managed write transaction and return every record as a dict"""
+    records = await write_query(query, parameters)
+    return [record.data() for record in records]
+
+async def write_transaction(work, *args):
+    """Run ``await work(tx, *args)`` as one managed write transaction, retried as a whole"""
+    async with get_async_driver().session(default_access_mode=WRITE_ACCESS) as session:
+        return await session.execute_write(work, *args)
@@ -1,12 +1,104 @@
-from neo4j import GraphDatabase
-from config.settings import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+import re
+from neo4j import GraphDatabase, READ_ACCESS, WRITE_ACCESS
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+from config.settings import (
+    NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+    NEO4J_MAX_CONNECTION_POOL_SIZE, NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+    NEO4J_MAX_CONNECTION_LIFETIME, NEO4J_CONNECTION_TIMEOUT, NEO4J_LIVENESS_CHECK_TIMEOUT,
+    NEO4J_MAX_TRANSACTION_RETRY_TIME
+)
 
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+# Errors that are still raised after managed transactions have exhausted their
+# retries; main.py turns them into 503 responses instead of 500s.
+DATABASE_UNAVAILABLE_ERRORS = (ServiceUnavailable, SessionExpired, TransientError)
+
+_WRITE_CLAUSE = re.compile(r"\b(CREATE|MERGE|SET|DELETE|REMOVE|DROP|FOREACH|LOAD\s+CSV)\b", re.IGNORECASE)
+_STRING_OR_COMMENT = re.compile(r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|//[^\n]*""")
+
+def get_driver_config():
+    """Pool settings shared by the sync and async drivers"""
+    return {
+        "max_connection_pool_size": NEO4J_MAX_CONNECTION_POOL_SIZE,
+        "connection_acquisition_timeout": NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+        "max_connection_lifetime": NEO4J_MAX_CONNECTION_LIFETIME,
+        "connection_timeout": NEO4J_CONNECTION_TIMEOUT,
+        "liveness_check_timeout": NEO4J_LIVENESS_CHECK_TIMEOUT,
+        "max_transaction_retry_time": NEO4J_MAX_TRANSACTION_RETRY_TIME,
+    }
+
+def create_driver():
+    """Create a sync driver with the configured pool settings"""
+    return GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD), **get_driver_config())
+
+# Creating the driver does not open any sockets; connections are made lazily
+# and released by close_driver() from the application lifespan.
+driver = create_driver()
 
 def get_database():
     return driver
 
+def close_driver():
+    """Close every pooled connection of the sync driver"""
+    driver.close()
+
+def get_pool_stats(target_driver):
+    """Summarize pool utilization for a sync or async driver.
+
+    The driver has no public pool API, so this reads its pool's connection
+    table and degrades to empty figures if the internals change.
+    """
+    pool = getattr(target_driver, "_pool", None)
+    connections = getattr(pool, "connections", None) or {}
+
+    # The pool size limit applies per server address
+    max_size = NEO4J_MAX_CONNECTION_POOL_SIZE
+    addresses = {}
+    total_in_use = 0
+    total_idle = 0
+    busiest = 0.0
+    for address, pooled in list(connections.items()):
+        in_use = sum(1 for connection in list(pooled) if getattr(connection, "in_use", False))
+        idle = len(pooled) - in_use
+        utilization = round(in_use / max_size, 4) if max_size > 0 else 0.0
+        addresses[str(address)] = {"in_use": in_use, "idle": idle, "utilization": utilization}
+        total_in_use += in_use
+        total_idle += idle
+        busiest = max(busiest, utilization)
+
+    return {
+        "max_pool_size": max_size,
+        "in_use": total_in_use,
+        "idle": total_idle,
+        "utilization": busiest,
+        "addresses": addresses
+    }
+
+def is_write_query(query: str) -> bool:
+    """Classify a Cypher statement as a write if it contains any updating clause"""
+    return bool(_WRITE_CLAUSE.search(_STRING_OR_COMMENT.sub("", query)))
+
+def _collect_records(tx, query, parameters):
+    return list(tx.run(query, parameters))
+
+def read_query(query: str, parameters: dict = None):
+    """Run a query in a managed read transaction.
+
+    Reads are retried on transient errors and, with a neo4j:// URI, routed to
+    cluster followers. Returns the records, detached from the transaction.
+    """
+    with driver.session(default_access_mode=READ_ACCESS) as session:
+        return session.execute_read(_collect_records, query, parameters or {})
+
+def write_query(query: str, parameters: dict = None):
+    """Run a query in a managed write transaction on the cluster leader"""
+    with driver.session(default_access_mode=WRITE_ACCESS) as session:
+        return session.execute_write(_collect_records, query, parameters or {})
+
+def run_records(query: str, parameters: dict = None):
+    """Run a query as a read or write transaction depending on its clauses"""
+    if is_write_query(query):
+        return write_query(query, parameters)
+    return read_query(query, parameters)
+
 def run_query(query: str, parameters: dict = None):
-    with driver.session() as session:
-        result = session.run(query, parameters or {})
-        return [record.data() for record in result]
+    return [record.data() for record in run_records(query, parameters)]
@@ -0,0 +1,35 @@
+import re
+from neo4j.exceptions import ClientError
+from database.connection import read_query
+
+_LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+def build_fulltext_query(text: str):
+    """Turn free text into a Lucene query where every word must match.
+
+    Each word matches exactly or as a prefix (so "cardi" finds "Cardiology"),
+    with exact matches ranked higher. Returns None if nothing is searchable.
+    """
+    terms = [
+        _LUCENE_SPECIAL.sub(r"\\\1", term.lower())
+        for term in text.split()
+        if any(char.isalnum() for char in term)
+    ]
+    if not terms:
+        return None
+    return " AND ".join(f"({term}^2 OR {term}*)" for term in terms)
+
+def search_with_fallback(fulltext_query: str, scan_query: str, params: dict):
+    """Run a full-text index query, or the CONTAINS scan if the index can't serve it.
+
+    ``params["search_query"]`` holds the raw search text; the Lucene form is
+    passed to the full-text query as ``$fulltext_query``. The scan covers
+    databases where the index is missing or still populating.
+    """
+    lucene_query = build_fulltext_query(params["search_query"])
+    if lucene_query:
+        try:
+            return read_query(fulltext_query, {**params, "fulltext_query": lucene_query})
+        except ClientError as e:
+            print(f"Full-text search unavailable, falling back to scan: {e}")
+    return read_query(scan_query, params)
@@ -0,0 +1,54 @@
+import base64
+import json
+from typing import Optional
+from fastapi import HTTPException
+from neo4j.time import DateTime
+
+# Keyset ("seek") pagination for newest-first lists. A page is ordered by
+# (sort property DESC, id DESC) and the cursor is the sort key of its last row,
+# so the next page starts with an index seek instead of skipping every row
+# already returned. Cursors are opaque base64 to clients.
+
+def encode_cursor(sort_value, item_id: str) -> str:
+    if isinstance(sort_value, DateTime):
+        # Naive values come from LocalDateTime properties
+        kind = "datetime" if sort_value.tzinfo is not None else "localdatetime"
+        payload = {"t": kind, "v": sort_value.iso_format(), "id": item_id}
+    else:
+        payload = {"t": "value", "v": sort_value, "id": item_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["t"] not in ("datetime", "localdatetime", "value") or not isinstance(payload["id"], str):
+            raise ValueError(cursor)
+        return payload
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_condition(cursor: Optional[str], sort_field: str, id_field: str, params: dict) -> Optional[str]:
+    """WHERE condition selecting rows after the cursor, or None for the first page.
+
+    Adds the $cursor_sort / $cursor_id parameters it references to params.
+    """
+    if not cursor:
+        return None
+    payload = decode_cursor(cursor)
+    params["cursor_sort"] = payload["v"]
+    params["cursor_id"] = payload["id"]
+    sort_value = "$cursor_sort" if payload["t"] == "value" else f"{payload['t']}($cursor_sort)"
+    return (
+        f"({sort_field} < {sort_value} OR "
+        f"({sort_field} = {sort_value} AND {id_field} < $cursor_id))"
+    )
+
+def split_page(records: list, limit: int, node_key: str, sort_property: str = "created_at"):
+    """Split a LIMIT limit + 1 result into the page and the cursor for the next one"""
+    page = records[:limit]
+    if len(records) <= limit or not page:
+        return page, None
+    last = page[-1][node_key]
+    return page, encode_cursor(last[sort_property], last["id"])
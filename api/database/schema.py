@@ -0,0 +1,202 @@
+import re
+from database.async_connection import read_query, write_query
+
+# Ordered schema migrations. Each entry is applied once and recorded as a
+# (:SchemaMigration {version}) node; statements use IF NOT EXISTS so a
+# partially applied migration can simply be re-run. Never edit a released
+# migration - append a new version instead.
+MIGRATIONS = [
+    (1, "Uniqueness constraints and lookup indexes for router access paths", [
+        # Identity lookups
+        "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
+        "CREATE CONSTRAINT user_email_unique IF NOT EXISTS FOR (u:User) REQUIRE u.email IS UNIQUE",
+        "CREATE CONSTRAINT doctor_user_id_unique IF NOT EXISTS FOR (d:Doctor) REQUIRE d.user_id IS UNIQUE",
+        "CREATE CONSTRAINT patient_user_id_unique IF NOT EXISTS FOR (p:Patient) REQUIRE p.user_id IS UNIQUE",
+        "CREATE CONSTRAINT consultation_id_unique IF NOT EXISTS FOR (c:Consultation) REQUIRE c.id IS UNIQUE",
+        "CREATE CONSTRAINT appointment_id_unique IF NOT EXISTS FOR (a:Appointment) REQUIRE a.id IS UNIQUE",
+        "CREATE CONSTRAINT prescription_id_unique IF NOT EXISTS FOR (p:Prescription) REQUIRE p.id IS UNIQUE",
+        "CREATE CONSTRAINT review_id_unique IF NOT EXISTS FOR (r:Review) REQUIRE r.id IS UNIQUE",
+        "CREATE CONSTRAINT notification_id_unique IF NOT EXISTS FOR (n:Notification) REQUIRE n.id IS UNIQUE",
+        "CREATE CONSTRAINT video_room_id_unique IF NOT EXISTS FOR (v:VideoRoom) REQUIRE v.id IS UNIQUE",
+        "CREATE CONSTRAINT medical_history_id_unique IF NOT EXISTS FOR (h:MedicalHistory) REQUIRE h.id IS UNIQUE",
+        "CREATE CONSTRAINT health_metrics_id_unique IF NOT EXISTS FOR (m:HealthMetrics) REQUIRE m.id IS UNIQUE",
+        "CREATE CONSTRAINT medical_record_id_unique IF NOT EXISTS FOR (f:MedicalRecord) REQUIRE f.id IS UNIQUE",
+        "CREATE CONSTRAINT password_reset_user_id_unique IF NOT EXISTS FOR (r:PasswordReset) REQUIRE r.user_id IS UNIQUE",
+        "CREATE CONSTRAINT system_settings_name_unique IF NOT EXISTS FOR (s:SystemSettings) REQUIRE s.name IS UNIQUE",
+        # Consultations
+        "CREATE INDEX consultation_patient_id IF NOT EXISTS FOR (c:Consultation) ON (c.patient_id)",
+        "CREATE INDEX consultation_status_created IF NOT EXISTS FOR (c:Consultation) ON (c.status, c.created_at)",
+        "CREATE INDEX consultation_created_at IF NOT EXISTS FOR (c:Consultation) ON (c.created_at)",
+        # Appointments (booking conflict checks and availability)
+        "CREATE INDEX appointment_doctor_date IF NOT EXISTS FOR (a:Appointment) ON (a.doctor_id, a.appointment_date)",
+        "CREATE INDEX appointment_patient_date IF NOT EXISTS FOR (a:Appointment) ON (a.patient_id, a.appointment_date)",
+        "CREATE INDEX appointment_created_at IF NOT EXISTS FOR (a:Appointment) ON (a.created_at)",
+        # Notifications
+        "CREATE INDEX notification_recipient_read IF NOT EXISTS FOR (n:Notification) ON (n.recipient_id, n.read)",
+        "CREATE INDEX notification_recipient_created IF NOT EXISTS FOR (n:Notification) ON (n.recipient_id, n.created_at)",
+        # Prescriptions, reviews and medical records
+        "CREATE INDEX prescription_patient_status IF NOT EXISTS FOR (p:Prescription) ON (p.patient_id, p.status)",
+        "CREATE INDEX prescription_doctor_id IF NOT EXISTS FOR (p:Prescription) ON (p.doctor_id)",
+        "CREATE INDEX review_doctor_id IF NOT EXISTS FOR (r:Review) ON (r.doctor_id)",
+        "CREATE INDEX review_patient_doctor IF NOT EXISTS FOR (r:Review) ON (r.patient_id, r.doctor_id)",
+        "CREATE INDEX medical_history_patient_type IF NOT EXISTS FOR (h:MedicalHistory) ON (h.patient_id, h.entry_type)",
+        "CREATE INDEX health_metrics_patient_date IF NOT EXISTS FOR (m:HealthMetrics) ON (m.patient_id, m.date_recorded)",
+        "CREATE INDEX medical_record_user_id IF NOT EXISTS FOR (f:MedicalRecord) ON (f.user_id)",
+        # Video rooms
+        "CREATE INDEX video_room_host_id IF NOT EXISTS FOR (v:VideoRoom) ON (v.host_id)",
+        "CREATE INDEX video_room_participant_id IF NOT EXISTS FOR (v:VideoRoom) ON (v.participant_id)",
+        # Misc lookups
+        "CREATE INDEX user_role IF NOT EXISTS FOR (u:User) ON (u.role)",
+        "CREATE INDEX user_created_at IF NOT EXISTS FOR (u:User) ON (u.created_at)",
+        "CREATE INDEX password_reset_token IF NOT EXISTS FOR (r:PasswordReset) ON (r.token)",
+        "CREATE INDEX audit_log_created_at IF NOT EXISTS FOR (a:AuditLog) ON (a.created_at)",
+    ]),
+    (2, "Full-text indexes for /search/global", [
+        # Doctor emails live on the User node, so the index spans both labels
+        "CREATE FULLTEXT INDEX doctor_search IF NOT EXISTS FOR (n:Doctor|User) "
+        "ON EACH [n.full_name, n.specialization, n.email]",
+        "CREATE FULLTEXT INDEX consultation_search IF NOT EXISTS FOR (c:Consultation) "
+        "ON EACH [c.question, c.symptoms, c.diagnosis]",
+    ]),
+    (3, "Sort-key indexes for cursor-paginated lists", [
+        "CREATE INDEX review_doctor_created IF NOT EXISTS FOR (r:Review) ON (r.doctor_id, r.created_at)",
+        "CREATE INDEX video_room_host_created IF NOT EXISTS FOR (v:VideoRoom) ON (v.host_id, v.created_at)",
+        "CREATE INDEX video_room_participant_created IF NOT EXISTS FOR (v:VideoRoom) ON (v.participant_id, v.created_at)",
+    ]),
+    (4, "One active appointment per doctor, date and start time", [
+        # slot_key is removed when an appointment is cancelled, freeing the slot
+        "CREATE CONSTRAINT appointment_slot_key_unique IF NOT EXISTS FOR (a:Appointment) REQUIRE a.slot_key IS UNIQUE",
+    ]),
+    (5, "Dispatch order for pending consultations", [
+        "CREATE INDEX consultation_status_rank IF NOT EXISTS FOR (c:Consultation) ON (c.status, c.dispatch_rank)",
+        # Rank existing consultations with the boosts from services.consultation_dispatch
+        "MATCH (c:Consultation) WHERE c.dispatch_rank IS NULL AND c.created_at IS NOT NULL "
+        "SET c.dispatch_rank = c.created_at.epochSeconds - "
+        "(CASE c.severity WHEN 'high' THEN 3600 WHEN 'low' THEN 0 ELSE 900 END + "
+        "CASE c.category WHEN 'emergency' THEN 14400 ELSE 0 END)",
+    ]),
+    (6, "Admin analytics rollups", [
+        "CREATE CONSTRAINT analytics_rollup_key_unique IF NOT EXISTS FOR (r:AnalyticsRollup) REQUIRE r.key IS UNIQUE",
+        "CREATE INDEX analytics_rollup_period IF NOT EXISTS FOR (r:AnalyticsRollup) ON (r.period)",
+        # Top doctors, counted in services.analytics_rollup
+        "CREATE INDEX doctor_consultations_answered IF NOT EXISTS FOR (d:Doctor) ON (d.consultations_answered)",
+    ]),
+    (7, "Materialized admin reports", [
+        "CREATE CONSTRAINT report_key_unique IF NOT EXISTS FOR (r:Report) REQUIRE r.key IS UNIQUE",
+        # Range counts behind services.reports
+        "CREATE INDEX appointment_date IF NOT EXISTS FOR (a:Appointment) ON (a.appointment_date)",
+        "CREATE INDEX prescription_created_at IF NOT EXISTS FOR (p:Prescription) ON (p.created_at)",
+    ]),
+    (8, "Running rating aggregate on doctors", [
+        # Seed rating_sum and the star histogram that services.doctor_ratings keeps up to date
+        "MATCH (d:Doctor) WHERE d.rating_sum IS NULL "
+        "OPTIONAL MATCH (d)<-[:REVIEWED]-(r:Review) "
+        "WITH d, collect(r.rating) as ratings "
+        "WITH d, ratings, reduce(total = 0, rating IN ratings | total + rating) as rating_sum "
+        "SET d.rating_sum = rating_sum, d.total_reviews = size(ratings), "
+        "d.rating_1 = size([rating IN ratings WHERE rating = 1]), "
+        "d.rating_2 = size([rating IN ratings WHERE rating = 2]), "
+        "d.rating_3 = size([rating IN ratings WHERE rating = 3]), "
+        "d.rating_4 = size([rating IN ratings WHERE rating = 4]), "
+        "d.rating_5 = size([rating IN ratings WHERE rating = 5]), "
+        "d.rating = CASE WHEN size(ratings) > 0 THEN toFloat(rating_sum) / size(ratings) ELSE 0.0 END",
+    ]),
+    (9, "Analytics reconcile lease", [
+        # One lease node shared by every worker, see services.analytics_rollup
+        "CREATE CONSTRAINT analytics_reconcile_key_unique IF NOT EXISTS FOR (f:AnalyticsReconcile) REQUIRE f.key IS UNIQUE",
+    ]),
+    (10, "Analytics epoch stripes", [
+        "CREATE CONSTRAINT analytics_epoch_stripe_unique IF NOT EXISTS FOR (e:AnalyticsEpoch) REQUIRE e.stripe IS UNIQUE",
+        # EPOCH_STRIPES in services.analytics_rollup
+        "UNWIND range(0, 15) as stripe MERGE (e:AnalyticsEpoch {stripe: stripe}) ON CREATE SET e.epoch = 0",
+        # Left over from the clock-based fence this replaces
+        "MATCH (r:AnalyticsRollup) WHERE r.fence IS NOT NULL REMOVE r.fence, r.after_fence",
+        "MATCH (f:AnalyticsReconcile) REMOVE f.fence",
+    ]),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+class MigrationError(RuntimeError):
+    """A migration failed; it and every later version are left unapplied"""
+
+    def __init__(self, summary: dict):
+        self.summary = summary
+        failure = summary["failed"][0]
+        super().__init__(
+            f"Schema migration {failure['version']} failed, not applied: {summary['not_applied']}; "
+            f"errors: {failure['errors']}"
+        )
+
+_SCHEMA_OBJECT_NAME = re.compile(
+    r"CREATE\s+(?:CONSTRAINT|(?:RANGE\s+|TEXT\s+|POINT\s+|FULLTEXT\s+)?INDEX)\s+(\w+)", re.IGNORECASE
+)
+
+def expected_schema_objects():
+    """Names of every constraint and index declared by the migrations"""
+    names = []
+    for _, _, statements in MIGRATIONS:
+        for statement in statements:
+            match = _SCHEMA_OBJECT_NAME.match(statement)
+            if match:
+                names.append(match.group(1))
+    return names
+
+async def get_applied_versions():
+    records = await read_query("MATCH (m:SchemaMigration) RETURN m.version as version")
+    return {record["version"] for record in records}
+
+async def apply_migrations():
+    """Apply every pending migration in order and return a summary
+
+    Raises MigrationError at the first migration with a failing statement.
+    """
+    applied = await get_applied_versions()
+    summary = {"applied": [], "failed": [], "not_applied": []}
+
+    for version, description, statements in MIGRATIONS:
+        if version in applied:
+            continue
+
+        errors = []
+        for statement in statements:
+            try:
+                await write_query(statement)
+            except Exception as e:
+                errors.append({"statement": statement, "error": str(e)})
+
+        if errors:
+            # Leave the version unrecorded so the next startup retries it;
+            # later migrations may depend on it, so none of them run either
+            summary["failed"].append({"version": version, "errors": errors})
+            summary["not_applied"] = [v for v, _, _ in MIGRATIONS if v >= version and v not in applied]
+            raise MigrationError(summary)
+
+        await write_query(
+            """
+            MERGE (m:SchemaMigration {version: $version})
+            SET m.description = $description, m.applied_at = datetime()
+            """,
+            {"version": version, "description": description}
+        )
+        summary["applied"].append(version)
+
+    return summary
+
+async def get_schema_status():
+    """Compare the live schema with the migrations and report gaps"""
+    applied = await get_applied_versions()
+    constraints = await read_query("SHOW CONSTRAINTS YIELD name RETURN name")
+    indexes = await read_query("SHOW INDEXES YIELD name, state RETURN name, state")
+
+    existing = {record["name"] for record in constraints}
+    existing.update(record["name"] for record in indexes)
+    not_online = [record["name"] for record in indexes if record["state"] != "ONLINE"]
+
+    return {
+        "current_version": max(applied) if applied else 0,
+        "latest_version": LATEST_SCHEMA_VERSION,
+        "pending": [version for version, _, _ in MIGRATIONS if version not in applied],
+        "missing": [name for name in expected_schema_objects() if name not in existing],
+        "not_online": not_online
+    }
@@ -0,0 +1,118 @@
+"""Neo4j values to JSON in one pass.
+
+Routers used to copy every node with dict(), then walk known datetime
+fields calling str() and delete passwords by hand. This module replaces
+that with one converter:
+
+    serialize_node(node)     - a node's properties with temporal values as
+                               strings and the label's secret fields removed
+    serialize_record(record) - every value of a record, converted the same way
+
+GraphJSONResponse renders with orjson and converts nodes and temporal
+values itself, via orjson's default hook, while it encodes. A route can
+therefore return raw query results:
+
+    return GraphJSONResponse({"notifications": [record["n"] for record in records]})
+
+This skips both the per-router copy and FastAPI's jsonable_encoder pass.
+benchmark_serialization.py compares this against the old per-router loops.
+"""
+from typing import Iterable, Optional
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from neo4j.graph import Node, Relationship, Path
+from neo4j.spatial import Point
+from neo4j.time import Date, DateTime, Duration, Time
+
+# Properties never sent to clients, by node label
+LABEL_EXCLUDED_FIELDS = {
+    "User": frozenset({"password"}),
+    "PasswordReset": frozenset({"token"}),
+}
+
+_NO_FIELDS = frozenset()
+_TEMPORAL_TYPES = (DateTime, Date, Time, Duration)
+_PLAIN_TYPES = frozenset({str, int, float, bool, type(None)})
+_excluded_by_labels = {}
+
+def _excluded_fields(labels: frozenset) -> frozenset:
+    excluded = _excluded_by_labels.get(labels)
+    if excluded is None:
+        excluded = _NO_FIELDS.union(*(LABEL_EXCLUDED_FIELDS.get(label, _NO_FIELDS) for label in labels))
+        _excluded_by_labels[labels] = excluded
+    return excluded
+
+def _format_datetime(value: DateTime) -> str:
+    # Same text as str(value), without DateTime.iso_format's intermediate Date/Time objects
+    text = "%04d-%02d-%02dT%02d:%02d:%02d.%09d" % (value.year_month_day + value.hour_minute_second_nanosecond)
+    offset = value.utcoffset()
+    if offset is not None:
+        text += "%+03d:%02d" % divmod(offset.total_seconds() // 60, 60)
+    return text
+
+def _format_temporal(value) -> str:
+    return _format_datetime(value) if type(value) is DateTime else str(value)
+
+def serialize_value(value):
+    """A JSON-ready copy of any value a Neo4j query can return"""
+    value_type = type(value)
+    if value_type in _PLAIN_TYPES:
+        return value
+    if value_type is Node:
+        return serialize_node(value)
+    if isinstance(value, _TEMPORAL_TYPES):
+        return _format_temporal(value)
+    if isinstance(value, (list, tuple)):
+        return [serialize_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: serialize_value(item) for key, item in value.items()}
+    if isinstance(value, Relationship):
+        return _serialize_properties(value.items(), _NO_FIELDS)
+    if isinstance(value, Path):
+        return [serialize_node(node) for node in value.nodes]
+    if isinstance(value, Point):
+        return list(value)
+    return value
+
+def _serialize_properties(items: Iterable, excluded: frozenset, fields: Optional[Iterable[str]] = None) -> dict:
+    properties = {}
+    for key, value in items:
+        if key in excluded:
+            continue
+        properties[key] = value if type(value) in _PLAIN_TYPES else serialize_value(value)
+    if fields is not None:
+        properties = {key: properties[key] for key in fields if key in properties}
+    return properties
+
+def serialize_node(node, label: Optional[str] = None, fields: Optional[Iterable[str]] = None) -> Optional[dict]:
+    """Properties of a node (or a property dict of the given label), ready for JSON.
+
+    `fields` projects the result to just those properties.
+    """
+    if node is None:
+        return None
+    if isinstance(node, Node):
+        excluded = _excluded_fields(node.labels)
+    else:
+        excluded = LABEL_EXCLUDED_FIELDS.get(label, _NO_FIELDS)
+    return _serialize_properties(node.items(), excluded, fields)
+
+def serialize_record(record) -> dict:
+    """Every value of a record (or record.data() dict), ready for JSON"""
+    return {key: serialize_value(value) for key, value in record.items()}
+
+def _orjson_default(value):
+    if isinstance(value, Node):
+        return serialize_node(value)
+    if isinstance(value, _TEMPORAL_TYPES):
+        return _format_temporal(value)
+    if isinstance(value, (Relationship, Path, Point)):
+        return serialize_value(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class GraphJSONResponse(ORJSONResponse):
+    """orjson response that also encodes Neo4j nodes and temporal values"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
@@ -1,14 +1,75 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from config.settings import ALLOWED_ORIGINS
+from config.settings import ALLOWED_ORIGINS, SCHEMA_AUTO_MIGRATE, DOCTOR_CATALOG_REFRESH_SECONDS
+from database.connection import close_driver, DATABASE_UNAVAILABLE_ERRORS
+from database.async_connection import get_async_driver, close_async_driver
+from database.schema import apply_migrations, MigrationError
+from database.serialization import GraphJSONResponse
+from auth.utils import shutdown_hash_executor
+from services.doctor_catalog import load_doctor_catalog
+from services.pubsub import pubsub
+from services.chat_buffer import chat_buffer
+from services.analytics_rollup import analytics_rollups
+from services.reports import report_scheduler
 from routers import (
     auth, patients, doctors, messages, health, files, 
     enhanced_consultations, prescriptions, profiles, 
     notifications, advanced_appointments, medical_history, admin, reviews, search, password_reset, video_conference
 )
 
-app = FastAPI(title="Doctor Consultation API")
+async def refresh_doctor_catalog_periodically():
+    """Reload the doctor catalog so changes made by other workers show up"""
+    while True:
+        await asyncio.sleep(DOCTOR_CATALOG_REFRESH_SECONDS)
+        try:
+            await load_doctor_catalog()
+        except Exception as e:
+            print(f"Doctor catalog reload failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await get_async_driver().verify_connectivity()
+    except Exception as e:
+        print(f"Neo4j is not reachable at startup: {e}")
+
+    if SCHEMA_AUTO_MIGRATE:
+        try:
+            summary = await apply_migrations()
+            if summary["applied"]:
+                print(f"Applied schema migrations: {summary['applied']}")
+        except MigrationError:
+            # Refuse to serve on a half-migrated schema
+            raise
+        except Exception as e:
+            print(f"Schema migrations skipped: {e}")
+
+    try:
+        await load_doctor_catalog()
+    except Exception as e:
+        print(f"Doctor catalog not loaded at startup: {e}")
+    catalog_refresh = asyncio.create_task(refresh_doctor_catalog_periodically())
+    await pubsub.start()
+    await chat_buffer.start()
+    await analytics_rollups.start()
+    await report_scheduler.start()
+    yield
+    await report_scheduler.close()
+    # Unsaved chat and counters are written before the drivers close
+    await analytics_rollups.close()
+    await chat_buffer.close()
+    await pubsub.close()
+    catalog_refresh.cancel()
+    shutdown_hash_executor()
+    await close_async_driver()
+    close_driver()
+
+app = FastAPI(title="Doctor Consultation API", lifespan=lifespan, default_response_class=GraphJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -19,6 +80,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Database errors that outlived the managed-transaction retries
+async def database_unavailable_handler(request: Request, exc: Exception):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database temporarily unavailable, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
+for error_type in DATABASE_UNAVAILABLE_ERRORS:
+    app.add_exception_handler(error_type, database_unavailable_handler)
+
 # Include all routers
 app.include_router(auth.router)
 app.include_router(patients.router)
@@ -3,99 +3,104 @@ from datetime import timedelta
 import uuid
 
 from models.user import UserCreate, UserLogin, Token
-from auth.utils import get_password_hash, verify_password, create_access_token, get_current_user
+from auth.utils import get_password_hash_async, verify_password_async, create_access_token, get_current_user
 from config.settings import ACCESS_TOKEN_EXPIRE_MINUTES
-from database.connection import driver
+from database.async_connection import read_query, write_transaction
+from services.analytics_rollup import analytics_rollups, stamp_epoch_async
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
+CREATE_USER_QUERY = """
+CREATE (u:User {
+    id: $user_id,
+    email: $email,
+    password: $password,
+    role: $role,
+    created_at: datetime()
+})
+RETURN u
+"""
+
 @router.post("/signup", response_model=Token)
-def signup(user: UserCreate):
-    with driver.session() as session:
-        # Check if user already exists
-        result = session.run(
-            "MATCH (u:User {email: $email}) RETURN u",
-            email=user.email
-        )
-        if result.single():
-            raise HTTPException(
-                status_code=400,
-                detail="Email already registered"
-            )
-        
-        # Create new user
-        user_id = str(uuid.uuid4())
-        hashed_password = get_password_hash(user.password)
-        
-        result = session.run(
-            """
-            CREATE (u:User {
-                id: $user_id,
-                email: $email,
-                password: $password,
-                role: $role,
-                created_at: datetime()
-            })
-            RETURN u
-            """,
-            user_id=user_id,
-            email=user.email,
-            password=hashed_password,
-            role=user.role
-        )
-        
-        user_record = result.single()["u"]
-        user_dict = dict(user_record)
-        del user_dict["password"]  # Don't return password
-        
-        # Convert Neo4j DateTime to string
-        if 'created_at' in user_dict:
-            user_dict['created_at'] = str(user_dict['created_at'])
-        
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
+async def signup(user: UserCreate):
+    # Check if user already exists
+    existing = await read_query(
+        "MATCH (u:User {email: $email}) RETURN u",
+        {"email": user.email}
+    )
+    if existing:
+        raise HTTPException(
+            status_code=400,
+            detail="Email already registered"
         )
-        
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": user_dict
-        }
+    
+    # Create new user
+    user_id = str(uuid.uuid4())
+    hashed_password = await get_password_hash_async(user.password)
+    
+    async def create_user(tx):
+        result = await tx.run(CREATE_USER_QUERY, {
+            "user_id": user_id,
+            "email": user.email,
+            "password": hashed_password,
+            "role": user.role
+        })
+        record = await result.single()
+        return record, await stamp_epoch_async(tx)
+
+    record, stamp = await write_transaction(create_user)
+    analytics_rollups.created(stamp, "user", role=user.role)
+    
+    user_dict = dict(record["u"])
+    del user_dict["password"]  # Don't return password
+    
+    # Convert Neo4j DateTime to string
+    if 'created_at' in user_dict:
+        user_dict['created_at'] = str(user_dict['created_at'])
+    
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.email}, expires_delta=access_token_expires
+    )
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": user_dict
+    }
 
 @router.post("/login", response_model=Token)
-def login(user: UserLogin):
-    with driver.session() as session:
-        result = session.run(
-            "MATCH (u:User {email: $email}) RETURN u",
-            email=user.email
-        )
-        record = result.single()
-        
-        if not record or not verify_password(user.password, record["u"]["password"]):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect email or password",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        user_dict = dict(record["u"])
-        del user_dict["password"]  # Don't return password
-        
-        # Convert Neo4j DateTime to string
-        if 'created_at' in user_dict:
-            user_dict['created_at'] = str(user_dict['created_at'])
-        
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
+async def login(user: UserLogin):
+    records = await read_query(
+        "MATCH (u:User {email: $email}) RETURN u",
+        {"email": user.email}
+    )
+    record = records[0] if records else None
+    
+    if not record or not await verify_password_async(user.password, record["u"]["password"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": user_dict
-        }
+    
+    user_dict = dict(record["u"])
+    del user_dict["password"]  # Don't return password
+    
+    # Convert Neo4j DateTime to string
+    if 'created_at' in user_dict:
+        user_dict['created_at'] = str(user_dict['created_at'])
+    
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.email}, expires_delta=access_token_expires
+    )
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": user_dict
+    }
 
 @router.get("/me")
 def get_current_user_profile(current_user: dict = Depends(get_current_user)):
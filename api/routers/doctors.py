@@ -1,11 +1,11 @@
 from fastapi import APIRouter, HTTPException
 from models.doctor import DoctorCreate
-from database.connection import run_query
+from database.async_connection import run_query, run_write
 
 router = APIRouter(prefix="/doctors", tags=["doctors"])
 
 @router.post("")
-def create_doctor(doctor: DoctorCreate):
+async def create_doctor(doctor: DoctorCreate):
     query = """
     CREATE (d:Doctor {
         user_id: $user_id,
@@ -16,21 +16,21 @@ def create_doctor(doctor: DoctorCreate):
     })
     RETURN d
     """
-    result = run_query(query, doctor.dict())
+    result = await run_write(query, doctor.dict())
     if result:
         return {"success": True, "doctor": result[0]}
     raise HTTPException(status_code=400, detail="Failed to create doctor")
 
 @router.get("/{user_id}")
-def get_doctor(user_id: str):
+async def get_doctor(user_id: str):
     query = "MATCH (d:Doctor {user_id: $user_id}) RETURN d"
-    result = run_query(query, {"user_id": user_id})
+    result = await run_query(query, {"user_id": user_id})
     if result:
         return result[0]
     raise HTTPException(status_code=404, detail="Doctor not found")
 
 @router.get("")
-def get_all_doctors():
+async def get_all_doctors():
     query = "MATCH (d:Doctor) RETURN d ORDER BY d.created_at DESC"
-    result = run_query(query)
+    result = await run_query(query)
     return {"doctors": result}
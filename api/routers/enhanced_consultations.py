@@ -3,9 +3,14 @@ from typing import List, Optional
 import uuid
 from datetime import datetime, timedelta
 from pydantic import BaseModel
+from neo4j import WRITE_ACCESS
 
 from auth.utils import get_current_user, get_password_hash, verify_password, create_access_token
-from database.connection import driver
+from database.connection import driver, read_query, write_query, DATABASE_UNAVAILABLE_ERRORS
+from database.serialization import serialize_node
+from services import consultation_dispatch
+from services.consultation_dispatch import priority_boost_seconds
+from services.analytics_rollup import analytics_rollups, stamp_epoch
 
 router = APIRouter(prefix="/consultations", tags=["consultations"])
 
@@ -28,23 +33,9 @@ class MessageCreate(BaseModel):
     message: str
     sender_role: str  # patient, doctor
 
-# Convert Neo4j DateTime to string
-def serialize_consultation(record):
-    consultation = dict(record["c"]) if "c" in record else {}
-    patient = dict(record["p"]) if "p" in record else {}
-    doctor = dict(record["d"]) if "d" in record else {}
-    
-    # Convert datetime objects
-    for item in [consultation, patient, doctor]:
-        for key, value in item.items():
-            if hasattr(value, 'iso_format'):  # Neo4j datetime
-                item[key] = str(value)
-    
-    return {
-        "consultation": consultation,
-        "patient": patient,
-        "doctor": doctor
-    }
+def require_doctor(current_user: dict, action: str):
+    if current_user["role"] != "doctor":
+        raise HTTPException(status_code=403, detail=f"Only doctors can {action}")
 
 @router.post("/create")
 def create_consultation(
@@ -56,10 +47,11 @@ def create_consultation(
         raise HTTPException(status_code=403, detail="Only patients can create consultations")
     
     try:
-        with driver.session() as session:
-            # Create consultation
-            consultation_id = str(uuid.uuid4())
-            result = session.run(
+        # Create consultation
+        consultation_id = str(uuid.uuid4())
+        
+        def create(tx):
+            record = tx.run(
                 """
                 CREATE (c:Consultation {
                     id: $consultation_id,
@@ -70,33 +62,43 @@ def create_consultation(
                     category: $category,
                     preferred_doctor_id: $preferred_doctor_id,
                     status: 'pending',
+                    dispatch_rank: datetime().epochSeconds - $priority_boost,
                     created_at: datetime(),
                     updated_at: datetime()
                 })
                 RETURN c
                 """,
-                consultation_id=consultation_id,
-                patient_id=current_user["id"],
-                question=consultation_data.question,
-                symptoms=consultation_data.symptoms,
-                severity=consultation_data.severity,
-                category=consultation_data.category,
-                preferred_doctor_id=consultation_data.preferred_doctor_id
-            )
-            
-            consultation_record = result.single()
-            if consultation_record:
-                consultation_dict = dict(consultation_record["c"])
-                consultation_dict['created_at'] = str(consultation_dict['created_at'])
-                consultation_dict['updated_at'] = str(consultation_dict['updated_at'])
-                return {
-                    "success": True,
-                    "message": "Consultation created successfully",
-                    "consultation": consultation_dict
+                {
+                    "consultation_id": consultation_id,
+                    "patient_id": current_user["id"],
+                    "question": consultation_data.question,
+                    "symptoms": consultation_data.symptoms,
+                    "severity": consultation_data.severity,
+                    "category": consultation_data.category,
+                    "preferred_doctor_id": consultation_data.preferred_doctor_id,
+                    "priority_boost": priority_boost_seconds(consultation_data.severity, consultation_data.category)
                 }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to create consultation")
+            ).single()
+            return record, stamp_epoch(tx)
+        
+        with driver.session(default_access_mode=WRITE_ACCESS) as session:
+            consultation_record, stamp = session.execute_write(create)
+        
+        if consultation_record:
+            analytics_rollups.created(stamp, "consultation", status="pending")
+            consultation_dict = serialize_node(consultation_record["c"])
+            return {
+                "success": True,
+                "message": "Consultation created successfully",
+                "consultation": consultation_dict
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to create consultation")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -108,62 +110,61 @@ def get_my_consultations(
 ):
     """Get consultations for current user"""
     try:
-        with driver.session() as session:
-            if current_user["role"] == "patient":
-                query = """
-                MATCH (c:Consultation {patient_id: $user_id})
-                OPTIONAL MATCH (c)<-[:RESPONDED_TO]-(d:Doctor)
-                OPTIONAL MATCH (d)<-[:PROFILE_OF]-(du:User)
-                """
-                if status_filter:
-                    query += " WHERE c.status = $status"
-                query += " RETURN c, d, du ORDER BY c.created_at DESC LIMIT $limit"
-                
-            elif current_user["role"] == "doctor":
-                query = """
-                MATCH (d:Doctor {user_id: $user_id})-[:RESPONDED_TO]->(c:Consultation)
-                OPTIONAL MATCH (c)<-[:HAS_CONSULTATION]-(p:Patient)
-                OPTIONAL MATCH (p)<-[:PROFILE_OF]-(pu:User)
-                """
-                if status_filter:
-                    query += " WHERE c.status = $status"
-                query += " RETURN c, p, pu ORDER BY c.created_at DESC LIMIT $limit"
-            else:
-                raise HTTPException(status_code=403, detail="Access denied")
-            
-            params = {"user_id": current_user["id"], "limit": limit}
+        if current_user["role"] == "patient":
+            query = """
+            MATCH (c:Consultation {patient_id: $user_id})
+            OPTIONAL MATCH (c)<-[:RESPONDED_TO]-(d:Doctor)
+            OPTIONAL MATCH (d)<-[:PROFILE_OF]-(du:User)
+            """
             if status_filter:
-                params["status"] = status_filter
-                
-            result = session.run(query, params)
+                query += " WHERE c.status = $status"
+            query += " RETURN c, d, du ORDER BY c.created_at DESC LIMIT $limit"
             
-            consultations = []
-            for record in result:
-                consultation = dict(record["c"]) if record["c"] else {}
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at', 'answered_at']:
-                    if field in consultation and consultation[field]:
-                        consultation[field] = str(consultation[field])
-                
-                if current_user["role"] == "patient":
-                    doctor = dict(record["d"]) if record["d"] else None
-                    doctor_user = dict(record["du"]) if record["du"] else None
-                    consultations.append({
-                        "consultation": consultation,
-                        "doctor": doctor,
-                        "doctor_user": doctor_user
-                    })
-                else:
-                    patient = dict(record["p"]) if record["p"] else None
-                    patient_user = dict(record["pu"]) if record["pu"] else None
-                    consultations.append({
-                        "consultation": consultation,
-                        "patient": patient,
-                        "patient_user": patient_user
-                    })
+        elif current_user["role"] == "doctor":
+            query = """
+            MATCH (d:Doctor {user_id: $user_id})-[:RESPONDED_TO]->(c:Consultation)
+            OPTIONAL MATCH (c)<-[:HAS_CONSULTATION]-(p:Patient)
+            OPTIONAL MATCH (p)<-[:PROFILE_OF]-(pu:User)
+            """
+            if status_filter:
+                query += " WHERE c.status = $status"
+            query += " RETURN c, p, pu ORDER BY c.created_at DESC LIMIT $limit"
+        else:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        params = {"user_id": current_user["id"], "limit": limit}
+        if status_filter:
+            params["status"] = status_filter
+            
+        result = read_query(query, params)
+        
+        consultations = []
+        for record in result:
+            consultation = serialize_node(record["c"]) or {}
             
-            return {"consultations": consultations}
+            if current_user["role"] == "patient":
+                doctor = serialize_node(record["d"])
+                doctor_user = serialize_node(record["du"])
+                consultations.append({
+                    "consultation": consultation,
+                    "doctor": doctor,
+                    "doctor_user": doctor_user
+                })
+            else:
+                patient = serialize_node(record["p"])
+                patient_user = serialize_node(record["pu"])
+                consultations.append({
+                    "consultation": consultation,
+                    "patient": patient,
+                    "patient_user": patient_user
+                })
+        
+        return {"consultations": consultations}
             
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -172,64 +173,104 @@ def get_available_consultations(
     current_user: dict = Depends(get_current_user),
     severity: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
-    limit: int = Query(20, le=100)
+    limit: int = Query(20, ge=1, le=100)
 ):
-    """Get available consultations for doctors to respond to"""
-    if current_user["role"] != "doctor":
-        raise HTTPException(status_code=403, detail="Only doctors can view available consultations")
+    """Get available consultations for doctors to respond to, in dispatch order"""
+    require_doctor(current_user, "view available consultations")
     
     try:
-        with driver.session() as session:
-            query = """
-            MATCH (c:Consultation {status: 'pending'})
-            WHERE NOT (c)<-[:RESPONDED_TO]-(:Doctor)
-            OPTIONAL MATCH (c)<-[:HAS_CONSULTATION]-(p:Patient)
-            OPTIONAL MATCH (p)<-[:PROFILE_OF]-(pu:User)
-            """
-            
-            conditions = []
-            params = {"doctor_id": current_user["id"], "limit": limit}
-            
-            if severity:
-                conditions.append("c.severity = $severity")
-                params["severity"] = severity
-            
-            if category:
-                conditions.append("c.category = $category")  
-                params["category"] = category
-                
-            # Check if doctor has preference or specialization match
-            query += """
-            OPTIONAL MATCH (d:Doctor {user_id: $doctor_id})
-            WHERE c.preferred_doctor_id IS NULL OR c.preferred_doctor_id = $doctor_id
-            """
-            
-            if conditions:
-                query += " AND " + " AND ".join(conditions)
-                
-            query += " RETURN c, p, pu ORDER BY c.created_at ASC LIMIT $limit"
-            
-            result = session.run(query, params)
-            
-            consultations = []
-            for record in result:
-                consultation = dict(record["c"])
-                patient = dict(record["p"]) if record["p"] else {}
-                patient_user = dict(record["pu"]) if record["pu"] else {}
-                
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at']:
-                    if field in consultation:
-                        consultation[field] = str(consultation[field])
-                        
-                consultations.append({
-                    "consultation": consultation,
-                    "patient": patient,
-                    "patient_user": patient_user
-                })
-            
-            return {"consultations": consultations}
-            
+        queue = consultation_dispatch.list_queue(current_user["id"], severity, category, limit)
+        patients = {
+            record["consultation_id"]: record
+            for record in read_query(
+                """
+                UNWIND $consultation_ids as consultation_id
+                MATCH (c:Consultation {id: consultation_id})
+                OPTIONAL MATCH (c)<-[:HAS_CONSULTATION]-(p:Patient)
+                OPTIONAL MATCH (p)<-[:PROFILE_OF]-(pu:User)
+                RETURN consultation_id, p, pu
+                """,
+                {"consultation_ids": [node["id"] for node in queue]}
+            )
+        } if queue else {}
+        
+        consultations = []
+        for node in queue:
+            record = patients.get(node["id"])
+            consultations.append({
+                "consultation": serialize_node(node),
+                "patient": serialize_node(record["p"]) if record and record["p"] else {},
+                "patient_user": serialize_node(record["pu"]) if record and record["pu"] else {}
+            })
+        
+        return {"consultations": consultations}
+        
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/claim-next")
+def claim_next_consultation(
+    current_user: dict = Depends(get_current_user),
+    severity: Optional[str] = Query(None),
+    category: Optional[str] = Query(None)
+):
+    """Lease the highest-priority available consultation to the calling doctor"""
+    require_doctor(current_user, "claim consultations")
+    
+    try:
+        consultation = consultation_dispatch.claim_next(current_user["id"], severity, category)
+        if consultation is None:
+            raise HTTPException(status_code=404, detail="No consultations waiting")
+        return {"success": True, "consultation": serialize_node(consultation)}
+        
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{consultation_id}/claim")
+def claim_consultation(
+    consultation_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Lease a specific consultation to the calling doctor"""
+    require_doctor(current_user, "claim consultations")
+    
+    try:
+        consultation = consultation_dispatch.claim(consultation_id, current_user["id"])
+        return {"success": True, "consultation": serialize_node(consultation)}
+        
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{consultation_id}/release")
+def release_consultation(
+    consultation_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Return a claimed consultation to the queue"""
+    require_doctor(current_user, "release consultations")
+    
+    try:
+        consultation = consultation_dispatch.release(consultation_id, current_user["id"])
+        if consultation is None:
+            raise HTTPException(status_code=409, detail="Consultation is not claimed by you")
+        return {"success": True, "consultation": serialize_node(consultation)}
+        
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -240,66 +281,28 @@ def respond_to_consultation(
     current_user: dict = Depends(get_current_user)
 ):
     """Doctor responds to a consultation"""
-    if current_user["role"] != "doctor":
-        raise HTTPException(status_code=403, detail="Only doctors can respond to consultations")
+    require_doctor(current_user, "respond to consultations")
     
     try:
-        with driver.session() as session:
-            # Check if consultation exists and is not already answered
-            check_result = session.run(
-                "MATCH (c:Consultation {id: $consultation_id}) RETURN c",
-                consultation_id=consultation_id
-            )
-            
-            consultation_record = check_result.single()
-            if not consultation_record:
-                raise HTTPException(status_code=404, detail="Consultation not found")
-            
-            consultation = dict(consultation_record["c"])
-            if consultation.get("status") == "completed":
-                raise HTTPException(status_code=400, detail="Consultation already completed")
-            
-            # Update consultation with doctor's response
-            update_result = session.run(
-                """
-                MATCH (c:Consultation {id: $consultation_id})
-                MATCH (d:Doctor {user_id: $doctor_id})
-                SET c.response = $response,
-                    c.diagnosis = $diagnosis,
-                    c.prescription = $prescription,
-                    c.follow_up_needed = $follow_up_needed,
-                    c.follow_up_date = $follow_up_date,
-                    c.status = 'answered',
-                    c.answered_at = datetime(),
-                    c.updated_at = datetime()
-                MERGE (d)-[:RESPONDED_TO]->(c)
-                RETURN c
-                """,
-                consultation_id=consultation_id,
-                doctor_id=current_user["id"],
-                response=response_data.response,
-                diagnosis=response_data.diagnosis,
-                prescription=response_data.prescription,
-                follow_up_needed=response_data.follow_up_needed,
-                follow_up_date=response_data.follow_up_date
-            )
-            
-            updated_consultation = update_result.single()
-            if updated_consultation:
-                consultation_dict = dict(updated_consultation["c"])
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at', 'answered_at']:
-                    if field in consultation_dict and consultation_dict[field]:
-                        consultation_dict[field] = str(consultation_dict[field])
-                
-                return {
-                    "success": True,
-                    "message": "Response submitted successfully",
-                    "consultation": consultation_dict
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to update consultation")
-                
+        # Lease check and update run in one write transaction
+        consultation = consultation_dispatch.respond(consultation_id, current_user["id"], {
+            "response": response_data.response,
+            "diagnosis": response_data.diagnosis,
+            "prescription": response_data.prescription,
+            "follow_up_needed": response_data.follow_up_needed,
+            "follow_up_date": response_data.follow_up_date
+        })
+        
+        return {
+            "success": True,
+            "message": "Response submitted successfully",
+            "consultation": serialize_node(consultation)
+        }
+        
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -310,40 +313,40 @@ def get_consultation_messages(
 ):
     """Get messages for a consultation"""
     try:
-        with driver.session() as session:
-            # Verify user has access to this consultation
-            access_query = """
-            MATCH (c:Consultation {id: $consultation_id})
-            WHERE c.patient_id = $user_id 
-               OR (c)<-[:RESPONDED_TO]-(:Doctor {user_id: $user_id})
-            RETURN c
-            """
-            
-            access_result = session.run(access_query, 
-                consultation_id=consultation_id, 
-                user_id=current_user["id"]
-            )
-            
-            if not access_result.single():
-                raise HTTPException(status_code=403, detail="Access denied")
-            
-            # Get messages
-            messages_query = """
-            MATCH (c:Consultation {id: $consultation_id})-[:HAS_MESSAGE]->(m:Message)
-            RETURN m ORDER BY m.sent_at ASC
-            """
-            
-            result = session.run(messages_query, consultation_id=consultation_id)
-            
-            messages = []
-            for record in result:
-                message = dict(record["m"])
-                if "sent_at" in message:
-                    message["sent_at"] = str(message["sent_at"])
-                messages.append(message)
-            
-            return {"messages": messages}
-            
+        # Verify user has access to this consultation
+        access_query = """
+        MATCH (c:Consultation {id: $consultation_id})
+        WHERE c.patient_id = $user_id 
+           OR (c)<-[:RESPONDED_TO]-(:Doctor {user_id: $user_id})
+        RETURN c
+        """
+        
+        access_result = read_query(access_query, {
+            "consultation_id": consultation_id,
+            "user_id": current_user["id"]
+        })
+        
+        if not access_result:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        # Get messages
+        messages_query = """
+        MATCH (c:Consultation {id: $consultation_id})-[:HAS_MESSAGE]->(m:Message)
+        RETURN m ORDER BY m.sent_at ASC
+        """
+        
+        result = read_query(messages_query, {"consultation_id": consultation_id})
+        
+        messages = []
+        for record in result:
+            messages.append(serialize_node(record["m"]))
+        
+        return {"messages": messages}
+            
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -355,57 +358,61 @@ def add_consultation_message(
 ):
     """Add a message to a consultation"""
     try:
-        with driver.session() as session:
-            # Verify user has access to this consultation
-            access_query = """
-            MATCH (c:Consultation {id: $consultation_id})
-            WHERE c.patient_id = $user_id 
-               OR (c)<-[:RESPONDED_TO]-(:Doctor {user_id: $user_id})
-            RETURN c
+        # Verify user has access to this consultation
+        access_query = """
+        MATCH (c:Consultation {id: $consultation_id})
+        WHERE c.patient_id = $user_id 
+           OR (c)<-[:RESPONDED_TO]-(:Doctor {user_id: $user_id})
+        RETURN c
+        """
+        
+        access_result = read_query(access_query, {
+            "consultation_id": consultation_id,
+            "user_id": current_user["id"]
+        })
+        
+        if not access_result:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        # Add message
+        message_id = str(uuid.uuid4())
+        result = write_query(
             """
-            
-            access_result = session.run(access_query, 
-                consultation_id=consultation_id, 
-                user_id=current_user["id"]
-            )
-            
-            if not access_result.single():
-                raise HTTPException(status_code=403, detail="Access denied")
-            
-            # Add message
-            message_id = str(uuid.uuid4())
-            result = session.run(
-                """
-                MATCH (c:Consultation {id: $consultation_id})
-                CREATE (m:Message {
-                    id: $message_id,
-                    consultation_id: $consultation_id,
-                    sender_id: $sender_id,
-                    sender_role: $sender_role,
-                    message: $message,
-                    sent_at: datetime()
-                })
-                CREATE (c)-[:HAS_MESSAGE]->(m)
-                RETURN m
-                """,
-                consultation_id=consultation_id,
-                message_id=message_id,
-                sender_id=current_user["id"],
-                sender_role=message_data.sender_role,
-                message=message_data.message
-            )
-            
-            message_record = result.single()
-            if message_record:
-                message_dict = dict(message_record["m"])
-                message_dict['sent_at'] = str(message_dict['sent_at'])
-                return {
-                    "success": True,
-                    "message": message_dict
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to add message")
+            MATCH (c:Consultation {id: $consultation_id})
+            CREATE (m:Message {
+                id: $message_id,
+                consultation_id: $consultation_id,
+                sender_id: $sender_id,
+                sender_role: $sender_role,
+                message: $message,
+                sent_at: datetime()
+            })
+            CREATE (c)-[:HAS_MESSAGE]->(m)
+            RETURN m
+            """,
+            {
+                "consultation_id": consultation_id,
+                "message_id": message_id,
+                "sender_id": current_user["id"],
+                "sender_role": message_data.sender_role,
+                "message": message_data.message
+            }
+        )
+        
+        message_record = result[0] if result else None
+        if message_record:
+            message_dict = serialize_node(message_record["m"])
+            return {
+                "success": True,
+                "message": message_dict
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to add message")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -416,51 +423,56 @@ def close_consultation(
 ):
     """Close a consultation"""
     try:
-        with driver.session() as session:
-            # Verify user has access (patient or responding doctor)
-            access_query = """
-            MATCH (c:Consultation {id: $consultation_id})
-            WHERE c.patient_id = $user_id 
-               OR (c)<-[:RESPONDED_TO]-(:Doctor {user_id: $user_id})
-            RETURN c
-            """
-            
-            access_result = session.run(access_query, 
-                consultation_id=consultation_id, 
-                user_id=current_user["id"]
-            )
-            
-            if not access_result.single():
-                raise HTTPException(status_code=403, detail="Access denied")
-            
-            # Close consultation
-            result = session.run(
+        # Verify user has access (patient or responding doctor)
+        access_query = """
+        MATCH (c:Consultation {id: $consultation_id})
+        WHERE c.patient_id = $user_id 
+           OR (c)<-[:RESPONDED_TO]-(:Doctor {user_id: $user_id})
+        RETURN c
+        """
+        
+        access_result = read_query(access_query, {
+            "consultation_id": consultation_id,
+            "user_id": current_user["id"]
+        })
+        
+        if not access_result:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        # Close consultation
+        def close(tx):
+            record = tx.run(
                 """
                 MATCH (c:Consultation {id: $consultation_id})
+                WITH c, c.status as previous_status
                 SET c.status = 'closed',
                     c.closed_at = datetime(),
                     c.updated_at = datetime()
-                RETURN c
+                RETURN c, previous_status
                 """,
-                consultation_id=consultation_id
-            )
-            
-            consultation_record = result.single()
-            if consultation_record:
-                consultation_dict = dict(consultation_record["c"])
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at', 'answered_at', 'closed_at']:
-                    if field in consultation_dict and consultation_dict[field]:
-                        consultation_dict[field] = str(consultation_dict[field])
-                
-                return {
-                    "success": True,
-                    "message": "Consultation closed successfully",
-                    "consultation": consultation_dict
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to close consultation")
+                {"consultation_id": consultation_id}
+            ).single()
+            return record, stamp_epoch(tx)
+        
+        with driver.session(default_access_mode=WRITE_ACCESS) as session:
+            consultation_record, stamp = session.execute_write(close)
+        
+        if consultation_record:
+            analytics_rollups.status_changed(stamp, "consultation", consultation_record["previous_status"], "closed")
+            consultation_dict = serialize_node(consultation_record["c"])
+            
+            return {
+                "success": True,
+                "message": "Consultation closed successfully",
+                "consultation": consultation_dict
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to close consultation")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -468,45 +480,48 @@ def close_consultation(
 def get_consultation_stats(current_user: dict = Depends(get_current_user)):
     """Get consultation statistics for dashboard"""
     try:
-        with driver.session() as session:
-            if current_user["role"] == "patient":
-                result = session.run(
-                    """
-                    MATCH (c:Consultation {patient_id: $user_id})
-                    RETURN 
-                        count(c) as total,
-                        count(CASE WHEN c.status = 'pending' THEN 1 END) as pending,
-                        count(CASE WHEN c.status = 'answered' THEN 1 END) as answered,
-                        count(CASE WHEN c.status = 'closed' THEN 1 END) as closed
-                    """,
-                    user_id=current_user["id"]
-                )
-            elif current_user["role"] == "doctor":
-                result = session.run(
-                    """
-                    MATCH (d:Doctor {user_id: $user_id})-[:RESPONDED_TO]->(c:Consultation)
-                    RETURN 
-                        count(c) as total,
-                        count(CASE WHEN c.status = 'answered' THEN 1 END) as answered,
-                        count(CASE WHEN c.status = 'closed' THEN 1 END) as closed
-                    """,
-                    user_id=current_user["id"]
-                )
-            else:
-                # Admin stats
-                result = session.run(
-                    """
-                    MATCH (c:Consultation)
-                    RETURN 
-                        count(c) as total,
-                        count(CASE WHEN c.status = 'pending' THEN 1 END) as pending,
-                        count(CASE WHEN c.status = 'answered' THEN 1 END) as answered,
-                        count(CASE WHEN c.status = 'closed' THEN 1 END) as closed
-                    """
-                )
-            
-            stats = result.single()
-            return dict(stats) if stats else {}
-            
+        if current_user["role"] == "patient":
+            result = read_query(
+                """
+                MATCH (c:Consultation {patient_id: $user_id})
+                RETURN 
+                    count(c) as total,
+                    count(CASE WHEN c.status = 'pending' THEN 1 END) as pending,
+                    count(CASE WHEN c.status = 'answered' THEN 1 END) as answered,
+                    count(CASE WHEN c.status = 'closed' THEN 1 END) as closed
+                """,
+                {"user_id": current_user["id"]}
+            )
+        elif current_user["role"] == "doctor":
+            result = read_query(
+                """
+                MATCH (d:Doctor {user_id: $user_id})-[:RESPONDED_TO]->(c:Consultation)
+                RETURN 
+                    count(c) as total,
+                    count(CASE WHEN c.status = 'answered' THEN 1 END) as answered,
+                    count(CASE WHEN c.status = 'closed' THEN 1 END) as closed
+                """,
+                {"user_id": current_user["id"]}
+            )
+        else:
+            # Admin stats
+            result = read_query(
+                """
+                MATCH (c:Consultation)
+                RETURN 
+                    count(c) as total,
+                    count(CASE WHEN c.status = 'pending' THEN 1 END) as pending,
+                    count(CASE WHEN c.status = 'answered' THEN 1 END) as answered,
+                    count(CASE WHEN c.status = 'closed' THEN 1 END) as closed
+                """
+            )
+        
+        stats = result[0] if result else None
+        return dict(stats) if stats else {}
+            
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,29 +1,53 @@
 from fastapi import APIRouter, Depends
 from auth.utils import get_current_user
-from database.connection import driver
+from database.connection import driver, read_query, get_pool_stats
+from database.async_connection import get_async_driver, get_async_pool_stats
+from services.ws_outbox import get_outbox_stats
+from database.schema import get_schema_status
 
 router = APIRouter(tags=["health"])
 
 @router.get("/nodes")
 def get_nodes(current_user: dict = Depends(get_current_user)):
     query = "MATCH (n) RETURN n LIMIT 10"
-    with driver.session() as session:
-        result = session.run(query)
-        nodes = []
-        for record in result:
-            node = record["n"]
-            nodes.append({
-                "id": node.element_id,
-                "labels": list(node.labels),
-                "properties": dict(node)
-            })
-        return {"nodes": nodes}
+    nodes = []
+    for record in read_query(query):
+        node = record["n"]
+        nodes.append({
+            "id": node.element_id,
+            "labels": list(node.labels),
+            "properties": dict(node)
+        })
+    return {"nodes": nodes}
 
 @router.get("/health")
-def health_check():
+async def health_check():
     try:
-        with driver.session() as session:
-            session.run("RETURN 1")
+        await get_async_driver().verify_connectivity()
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
+
+@router.get("/health/pool")
+def get_connection_pool_stats():
+    """Connection pool utilization for this worker process"""
+    return {
+        "sync_driver": get_pool_stats(driver),
+        "async_driver": get_async_pool_stats()
+    }
+
+@router.get("/health/websockets")
+def get_websocket_queue_stats():
+    """Outbound WebSocket queue depth and drop/coalesce counters for this worker process"""
+    return get_outbox_stats()
+
+@router.get("/health/schema")
+async def schema_health():
+    """Report schema version, unapplied migrations and any missing or building constraints/indexes"""
+    try:
+        status = await get_schema_status()
+        healthy = not status["pending"] and not status["missing"] and not status["not_online"]
+        status["status"] = "healthy" if healthy else "degraded"
+        return status
+    except Exception as e:
+        return {"status": "unknown", "error": str(e)}
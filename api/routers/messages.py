@@ -1,11 +1,11 @@
 from fastapi import APIRouter, HTTPException
 from models.message import MessageCreate
-from database.connection import run_query
+from database.async_connection import run_query, run_write
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
 @router.post("")
-def create_message(message: MessageCreate):
+async def create_message(message: MessageCreate):
     query = """
     MATCH (c:Consultation {id: $consultation_id})
     CREATE (m:Message {
@@ -19,17 +19,17 @@ def create_message(message: MessageCreate):
     CREATE (c)-[:HAS_MESSAGE]->(m)
     RETURN m
     """
-    result = run_query(query, message.dict())
+    result = await run_write(query, message.dict())
     if result:
         return {"success": True, "message": result[0]}
     raise HTTPException(status_code=400, detail="Failed to create message")
 
 @router.get("/consultation/{consultation_id}")
-def get_consultation_messages(consultation_id: str):
+async def get_consultation_messages(consultation_id: str):
     query = """
     MATCH (c:Consultation {id: $consultation_id})-[:HAS_MESSAGE]->(m:Message)
     RETURN m
     ORDER BY m.sent_at ASC
     """
-    result = run_query(query, {"consultation_id": consultation_id})
+    result = await run_query(query, {"consultation_id": consultation_id})
     return {"messages": result}
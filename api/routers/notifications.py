@@ -6,43 +6,101 @@ from datetime import datetime
 from pydantic import BaseModel
 
 from auth.utils import get_current_user
-from database.connection import driver
+from database.connection import read_query, DATABASE_UNAVAILABLE_ERRORS
+from database.async_connection import write_query
+from database.pagination import keyset_condition, split_page
+from database.serialization import GraphJSONResponse, serialize_node
+from services.pubsub import pubsub
+from services.ws_outbox import Outbox, get_outbox_metrics
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 # Connection manager for WebSocket
 class ConnectionManager:
+    """Sockets held by this worker, indexed by user.
+
+    A user may have several sockets open (tabs, devices). Every socket has
+    its own bounded outbox drained by a writer task, so sending only queues
+    the message and one slow client can't hold up anyone else. A socket
+    whose writer fails, times out or overflows is dropped and closed.
+    """
+
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+        self.active_connections: Dict[str, Dict[WebSocket, Outbox]] = {}
+        self.metrics = get_outbox_metrics("notifications")
     
-    async def connect(self, websocket: WebSocket, user_id: str):
+    async def connect(self, websocket: WebSocket, user_id: str) -> Outbox:
         await websocket.accept()
-        self.active_connections[user_id] = websocket
+        outbox = Outbox(websocket, self.metrics, on_close=lambda: self.disconnect(user_id, websocket))
+        self.active_connections.setdefault(user_id, {})[websocket] = outbox
+        return outbox
     
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
+    def disconnect(self, user_id: str, websocket: Optional[WebSocket] = None):
+        """Drop one socket of the user, or all of them when websocket is None"""
+        sockets = self.active_connections.get(user_id)
+        if sockets is None:
+            return
+        removed = [sockets.pop(socket, None) for socket in ([websocket] if websocket is not None else list(sockets))]
+        if not sockets:
             del self.active_connections[user_id]
+        
+        # Closing calls back into disconnect, so the registry is updated first
+        for outbox in removed:
+            if outbox is not None:
+                outbox.close()
     
-    async def send_personal_message(self, message: str, user_id: str):
-        if user_id in self.active_connections:
-            try:
-                await self.active_connections[user_id].send_text(message)
-                return True
-            except:
-                self.disconnect(user_id)
-                return False
-        return False
+    def send(self, message: str, user_id: str, coalesce_key: Optional[str] = None, droppable: bool = False) -> int:
+        """Queue a message on every socket of the user; returns how many accepted it"""
+        return sum(
+            outbox.put(message, coalesce_key, droppable)
+            for outbox in list(self.active_connections.get(user_id, {}).values())
+        )
     
-    async def broadcast_to_role(self, message: str, role: str):
-        # This would need role tracking, simplified for now
-        for user_id, connection in self.active_connections.items():
-            try:
-                await connection.send_text(message)
-            except:
-                self.disconnect(user_id)
+    async def send_personal_message(self, message: str, user_id: str) -> bool:
+        """Queue a message for every socket of the user; True if at least one accepted it"""
+        return self.send(message, user_id) > 0
 
 manager = ConnectionManager()
 
+# Every worker receives every notification and delivers it to the sockets it holds
+NOTIFICATION_CHANNEL = "notifications"
+
+async def deliver_notification(event: str):
+    event = json.loads(event)
+    await manager.send_personal_message(event["message"], event["recipient_id"])
+
+pubsub.subscribe(NOTIFICATION_CHANNEL, deliver_notification)
+
+async def publish_notification(notification_dict: dict):
+    """Push a stored notification to the recipient's sockets on whichever worker holds them"""
+    message = json.dumps({"type": "notification", "data": notification_dict})
+    try:
+        await pubsub.publish(NOTIFICATION_CHANNEL, json.dumps({
+            "recipient_id": notification_dict["recipient_id"],
+            "message": message
+        }))
+        return True
+    except Exception as e:
+        # The notification is stored either way; the client sees it on its next fetch
+        print(f"Failed to publish notification: {e}")
+        return False
+
+CREATE_NOTIFICATION_QUERY = """
+CREATE (n:Notification {
+    id: $notification_id,
+    sender_id: $sender_id,
+    recipient_id: $recipient_id,
+    title: $title,
+    message: $message,
+    type: $type,
+    related_id: $related_id,
+    action_url: $action_url,
+    read: false,
+    created_at: datetime()
+})
+RETURN n
+"""
+
 class NotificationCreate(BaseModel):
     recipient_id: str
     title: str
@@ -54,84 +112,53 @@ class NotificationCreate(BaseModel):
 @router.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
     """WebSocket endpoint for real-time notifications"""
-    await manager.connect(websocket, user_id)
+    outbox = await manager.connect(websocket, user_id)
     try:
         while True:
             # Keep connection alive
             data = await websocket.receive_text()
-            # Echo back for heartbeat
-            await websocket.send_text(f"Server received: {data}")
+            # Echo back for heartbeat; only the latest unsent echo matters
+            outbox.put(f"Server received: {data}", coalesce_key="heartbeat", droppable=True)
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
+        pass
+    finally:
+        manager.disconnect(user_id, websocket)
 
 @router.post("/send")
-def send_notification(
+async def send_notification(
     notification_data: NotificationCreate,
     current_user: dict = Depends(get_current_user)
 ):
     """Send a notification to a user"""
     try:
-        with driver.session() as session:
-            notification_id = str(uuid.uuid4())
-            
-            # Create notification in database
-            result = session.run(
-                """
-                CREATE (n:Notification {
-                    id: $notification_id,
-                    sender_id: $sender_id,
-                    recipient_id: $recipient_id,
-                    title: $title,
-                    message: $message,
-                    type: $type,
-                    related_id: $related_id,
-                    action_url: $action_url,
-                    read: false,
-                    created_at: datetime()
-                })
-                RETURN n
-                """,
-                notification_id=notification_id,
-                sender_id=current_user["id"],
-                recipient_id=notification_data.recipient_id,
-                title=notification_data.title,
-                message=notification_data.message,
-                type=notification_data.type,
-                related_id=notification_data.related_id,
-                action_url=notification_data.action_url
-            )
-            
-            notification_record = result.single()
-            if notification_record:
-                notification_dict = dict(notification_record["n"])
-                notification_dict['created_at'] = str(notification_dict['created_at'])
-                
-                # Send real-time notification via WebSocket
-                notification_json = json.dumps({
-                    "type": "notification",
-                    "data": notification_dict
-                })
-                
-                # Try to send via WebSocket (non-blocking)
-                import asyncio
-                try:
-                    loop = asyncio.get_event_loop()
-                    if loop.is_running():
-                        asyncio.create_task(manager.send_personal_message(
-                            notification_json, 
-                            notification_data.recipient_id
-                        ))
-                except:
-                    pass  # WebSocket delivery failed, notification still saved in DB
-                
-                return {
-                    "success": True,
-                    "message": "Notification sent successfully",
-                    "notification": notification_dict
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to create notification")
-                
+        records = await write_query(CREATE_NOTIFICATION_QUERY, {
+            "notification_id": str(uuid.uuid4()),
+            "sender_id": current_user["id"],
+            "recipient_id": notification_data.recipient_id,
+            "title": notification_data.title,
+            "message": notification_data.message,
+            "type": notification_data.type,
+            "related_id": notification_data.related_id,
+            "action_url": notification_data.action_url
+        })
+        if not records:
+            raise HTTPException(status_code=500, detail="Failed to create notification")
+        
+        notification_dict = serialize_node(records[0]["n"])
+        
+        # Real-time delivery via whichever worker holds the recipient's socket
+        await publish_notification(notification_dict)
+        
+        return {
+            "success": True,
+            "message": "Notification sent successfully",
+            "notification": notification_dict
+        }
+        
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -139,82 +166,103 @@ def send_notification(
 def get_my_notifications(
     current_user: dict = Depends(get_current_user),
     unread_only: bool = False,
+    cursor: Optional[str] = None,
     limit: int = 50
 ):
-    """Get notifications for current user"""
+    """Get notifications for current user, newest first, one page per cursor"""
     try:
-        with driver.session() as session:
-            query = """
-            MATCH (n:Notification {recipient_id: $user_id})
-            """
-            
-            if unread_only:
-                query += " WHERE n.read = false"
-            
-            query += " RETURN n ORDER BY n.created_at DESC LIMIT $limit"
-            
-            result = session.run(query, user_id=current_user["id"], limit=limit)
-            
-            notifications = []
-            for record in result:
-                notification = dict(record["n"])
-                notification['created_at'] = str(notification['created_at'])
-                notifications.append(notification)
-            
-            return {"notifications": notifications}
-            
+        query = """
+        MATCH (n:Notification {recipient_id: $user_id})
+        """
+        
+        conditions = []
+        # One extra row tells us whether there is a next page
+        params = {"user_id": current_user["id"], "limit": limit + 1}
+        
+        if unread_only:
+            conditions.append("n.read = false")
+        
+        after_cursor = keyset_condition(cursor, "n.created_at", "n.id", params)
+        if after_cursor:
+            conditions.append(after_cursor)
+        
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        query += " RETURN n ORDER BY n.created_at DESC, n.id DESC LIMIT $limit"
+        
+        records, next_cursor = split_page(read_query(query, params), limit, "n")
+        
+        # Nodes are encoded straight into the response body
+        return GraphJSONResponse({
+            "notifications": [record["n"] for record in records],
+            "next_cursor": next_cursor
+        })
+        
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/{notification_id}/read")
-def mark_notification_read(
+async def mark_notification_read(
     notification_id: str,
     current_user: dict = Depends(get_current_user)
 ):
     """Mark notification as read"""
     try:
-        with driver.session() as session:
-            result = session.run(
-                """
-                MATCH (n:Notification {id: $notification_id, recipient_id: $user_id})
-                SET n.read = true, n.read_at = datetime()
-                RETURN n
-                """,
-                notification_id=notification_id,
-                user_id=current_user["id"]
-            )
-            
-            if result.single():
-                return {"success": True, "message": "Notification marked as read"}
-            else:
-                raise HTTPException(status_code=404, detail="Notification not found")
+        result = await write_query(
+            """
+            MATCH (n:Notification {id: $notification_id, recipient_id: $user_id})
+            SET n.read = true, n.read_at = datetime()
+            RETURN n
+            """,
+            {
+                "notification_id": notification_id,
+                "user_id": current_user["id"]
+            }
+        )
+        
+        if result:
+            return {"success": True, "message": "Notification marked as read"}
+        else:
+            raise HTTPException(status_code=404, detail="Notification not found")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/mark-all-read")
-def mark_all_notifications_read(current_user: dict = Depends(get_current_user)):
+async def mark_all_notifications_read(current_user: dict = Depends(get_current_user)):
     """Mark all notifications as read"""
     try:
-        with driver.session() as session:
-            result = session.run(
-                """
-                MATCH (n:Notification {recipient_id: $user_id})
-                WHERE n.read = false
-                SET n.read = true, n.read_at = datetime()
-                RETURN count(n) as updated_count
-                """,
-                user_id=current_user["id"]
-            )
-            
-            record = result.single()
-            updated_count = record["updated_count"] if record else 0
-            
-            return {
-                "success": True,
-                "message": f"Marked {updated_count} notifications as read"
-            }
+        result = await write_query(
+            """
+            MATCH (n:Notification {recipient_id: $user_id})
+            WHERE n.read = false
+            SET n.read = true, n.read_at = datetime()
+            RETURN count(n) as updated_count
+            """,
+            {"user_id": current_user["id"]}
+        )
+        
+        record = result[0] if result else None
+        updated_count = record["updated_count"] if record else 0
+        
+        return {
+            "success": True,
+            "message": f"Marked {updated_count} notifications as read"
+        }
             
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -222,21 +270,24 @@ def mark_all_notifications_read(current_user: dict = Depends(get_current_user)):
 def get_unread_count(current_user: dict = Depends(get_current_user)):
     """Get count of unread notifications"""
     try:
-        with driver.session() as session:
-            result = session.run(
-                """
-                MATCH (n:Notification {recipient_id: $user_id})
-                WHERE n.read = false
-                RETURN count(n) as unread_count
-                """,
-                user_id=current_user["id"]
-            )
-            
-            record = result.single()
-            unread_count = record["unread_count"] if record else 0
-            
-            return {"unread_count": unread_count}
+        result = read_query(
+            """
+            MATCH (n:Notification {recipient_id: $user_id})
+            WHERE n.read = false
+            RETURN count(n) as unread_count
+            """,
+            {"user_id": current_user["id"]}
+        )
+        
+        record = result[0] if result else None
+        unread_count = record["unread_count"] if record else 0
+        
+        return {"unread_count": unread_count}
             
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -251,47 +302,20 @@ async def auto_send_notification(
 ):
     """Helper function to automatically send notifications"""
     try:
-        with driver.session() as session:
-            notification_id = str(uuid.uuid4())
-            
-            result = session.run(
-                """
-                CREATE (n:Notification {
-                    id: $notification_id,
-                    sender_id: 'system',
-                    recipient_id: $recipient_id,
-                    title: $title,
-                    message: $message,
-                    type: $type,
-                    related_id: $related_id,
-                    action_url: $action_url,
-                    read: false,
-                    created_at: datetime()
-                })
-                RETURN n
-                """,
-                notification_id=notification_id,
-                recipient_id=recipient_id,
-                title=title,
-                message=message,
-                type=notification_type,
-                related_id=related_id,
-                action_url=action_url
-            )
-            
-            notification_record = result.single()
-            if notification_record:
-                notification_dict = dict(notification_record["n"])
-                notification_dict['created_at'] = str(notification_dict['created_at'])
-                
-                # Send via WebSocket
-                notification_json = json.dumps({
-                    "type": "notification",
-                    "data": notification_dict
-                })
-                
-                await manager.send_personal_message(notification_json, recipient_id)
-                return True
+        records = await write_query(CREATE_NOTIFICATION_QUERY, {
+            "notification_id": str(uuid.uuid4()),
+            "sender_id": "system",
+            "recipient_id": recipient_id,
+            "title": title,
+            "message": message,
+            "type": notification_type,
+            "related_id": related_id,
+            "action_url": action_url
+        })
+        if records:
+            notification_dict = serialize_node(records[0]["n"])
+            return await publish_notification(notification_dict)
+        return False
                 
     except Exception as e:
         print(f"Failed to send notification: {e}")
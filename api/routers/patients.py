@@ -1,11 +1,11 @@
 from fastapi import APIRouter, HTTPException
 from models.patient import PatientCreate
-from database.connection import run_query
+from database.async_connection import run_query, run_write
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
 @router.post("")
-def create_patient(patient: PatientCreate):
+async def create_patient(patient: PatientCreate):
     query = """
     CREATE (p:Patient {
         user_id: $user_id,
@@ -16,21 +16,21 @@ def create_patient(patient: PatientCreate):
     })
     RETURN p
     """
-    result = run_query(query, patient.dict())
+    result = await run_write(query, patient.dict())
     if result:
         return {"success": True, "patient": result[0]}
     raise HTTPException(status_code=400, detail="Failed to create patient")
 
 @router.get("/{user_id}")
-def get_patient(user_id: str):
+async def get_patient(user_id: str):
     query = "MATCH (p:Patient {user_id: $user_id}) RETURN p"
-    result = run_query(query, {"user_id": user_id})
+    result = await run_query(query, {"user_id": user_id})
     if result:
         return result[0]
     raise HTTPException(status_code=404, detail="Patient not found")
 
 @router.get("")
-def get_all_patients():
+async def get_all_patients():
     query = "MATCH (p:Patient) RETURN p ORDER BY p.created_at DESC"
-    result = run_query(query)
+    result = await run_query(query)
     return {"patients": result}
@@ -5,7 +5,7 @@ from datetime import datetime, timedelta
 from pydantic import BaseModel
 
 from auth.utils import get_current_user
-from database.connection import driver
+from database.connection import read_query, write_query, DATABASE_UNAVAILABLE_ERRORS
 
 router = APIRouter(prefix="/prescriptions", tags=["prescriptions"])
 
@@ -41,65 +41,72 @@ def create_prescription(
         raise HTTPException(status_code=403, detail="Only doctors can create prescriptions")
     
     try:
-        with driver.session() as session:
-            # Verify consultation exists and doctor has access
-            consultation_check = session.run(
-                """
-                MATCH (c:Consultation {id: $consultation_id})
-                MATCH (d:Doctor {user_id: $doctor_id})-[:RESPONDED_TO]->(c)
-                RETURN c
-                """,
-                consultation_id=prescription_data.consultation_id,
-                doctor_id=current_user["id"]
-            )
-            
-            if not consultation_check.single():
-                raise HTTPException(status_code=403, detail="Access denied or consultation not found")
-            
-            prescription_id = str(uuid.uuid4())
-            
-            # Create prescription
-            result = session.run(
-                """
-                CREATE (p:Prescription {
-                    id: $prescription_id,
-                    patient_id: $patient_id,
-                    doctor_id: $doctor_id,
-                    consultation_id: $consultation_id,
-                    medications: $medications,
-                    general_instructions: $general_instructions,
-                    follow_up_required: $follow_up_required,
-                    follow_up_days: $follow_up_days,
-                    status: 'active',
-                    created_at: datetime(),
-                    updated_at: datetime()
-                })
-                RETURN p
-                """,
-                prescription_id=prescription_id,
-                patient_id=prescription_data.patient_id,
-                doctor_id=current_user["id"],
-                consultation_id=prescription_data.consultation_id,
-                medications=[med.dict() for med in prescription_data.medications],
-                general_instructions=prescription_data.general_instructions,
-                follow_up_required=prescription_data.follow_up_required,
-                follow_up_days=prescription_data.follow_up_days
-            )
+        # Verify consultation exists and doctor has access
+        consultation_check = read_query(
+            """
+            MATCH (c:Consultation {id: $consultation_id})
+            MATCH (d:Doctor {user_id: $doctor_id})-[:RESPONDED_TO]->(c)
+            RETURN c
+            """,
+            {
+                "consultation_id": prescription_data.consultation_id,
+                "doctor_id": current_user["id"]
+            }
+        )
+        
+        if not consultation_check:
+            raise HTTPException(status_code=403, detail="Access denied or consultation not found")
+        
+        prescription_id = str(uuid.uuid4())
+        
+        # Create prescription
+        result = write_query(
+            """
+            CREATE (p:Prescription {
+                id: $prescription_id,
+                patient_id: $patient_id,
+                doctor_id: $doctor_id,
+                consultation_id: $consultation_id,
+                medications: $medications,
+                general_instructions: $general_instructions,
+                follow_up_required: $follow_up_required,
+                follow_up_days: $follow_up_days,
+                status: 'active',
+                created_at: datetime(),
+                updated_at: datetime()
+            })
+            RETURN p
+            """,
+            {
+                "prescription_id": prescription_id,
+                "patient_id": prescription_data.patient_id,
+                "doctor_id": current_user["id"],
+                "consultation_id": prescription_data.consultation_id,
+                "medications": [med.dict() for med in prescription_data.medications],
+                "general_instructions": prescription_data.general_instructions,
+                "follow_up_required": prescription_data.follow_up_required,
+                "follow_up_days": prescription_data.follow_up_days
+            }
+        )
+        
+        prescription_record = result[0] if result else None
+        if prescription_record:
+            prescription_dict = dict(prescription_record["p"])
+            prescription_dict['created_at'] = str(prescription_dict['created_at'])
+            prescription_dict['updated_at'] = str(prescription_dict['updated_at'])
             
-            prescription_record = result.single()
-            if prescription_record:
-                prescription_dict = dict(prescription_record["p"])
-                prescription_dict['created_at'] = str(prescription_dict['created_at'])
-                prescription_dict['updated_at'] = str(prescription_dict['updated_at'])
-                
-                return {
-                    "success": True,
-                    "message": "Prescription created successfully",
-                    "prescription": prescription_dict
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to create prescription")
+            return {
+                "success": True,
+                "message": "Prescription created successfully",
+                "prescription": prescription_dict
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to create prescription")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -111,62 +118,65 @@ def get_my_prescriptions(
 ):
     """Get prescriptions for current user"""
     try:
-        with driver.session() as session:
-            if current_user["role"] == "patient":
-                query = """
-                MATCH (p:Prescription {patient_id: $user_id})
-                OPTIONAL MATCH (d:Doctor {user_id: p.doctor_id})
-                OPTIONAL MATCH (du:User {id: p.doctor_id})
-                """
-                if status:
-                    query += " WHERE p.status = $status"
-                query += " RETURN p, d, du ORDER BY p.created_at DESC LIMIT $limit"
-                
-            elif current_user["role"] == "doctor":
-                query = """
-                MATCH (p:Prescription {doctor_id: $user_id})
-                OPTIONAL MATCH (pat:Patient {user_id: p.patient_id})
-                OPTIONAL MATCH (pu:User {id: p.patient_id})
-                """
-                if status:
-                    query += " WHERE p.status = $status"
-                query += " RETURN p, pat, pu ORDER BY p.created_at DESC LIMIT $limit"
-            else:
-                raise HTTPException(status_code=403, detail="Access denied")
+        if current_user["role"] == "patient":
+            query = """
+            MATCH (p:Prescription {patient_id: $user_id})
+            OPTIONAL MATCH (d:Doctor {user_id: p.doctor_id})
+            OPTIONAL MATCH (du:User {id: p.doctor_id})
+            """
+            if status:
+                query += " WHERE p.status = $status"
+            query += " RETURN p, d, du ORDER BY p.created_at DESC LIMIT $limit"
             
-            params = {"user_id": current_user["id"], "limit": limit}
+        elif current_user["role"] == "doctor":
+            query = """
+            MATCH (p:Prescription {doctor_id: $user_id})
+            OPTIONAL MATCH (pat:Patient {user_id: p.patient_id})
+            OPTIONAL MATCH (pu:User {id: p.patient_id})
+            """
             if status:
-                params["status"] = status
-                
-            result = session.run(query, params)
+                query += " WHERE p.status = $status"
+            query += " RETURN p, pat, pu ORDER BY p.created_at DESC LIMIT $limit"
+        else:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        params = {"user_id": current_user["id"], "limit": limit}
+        if status:
+            params["status"] = status
             
-            prescriptions = []
-            for record in result:
-                prescription = dict(record["p"])
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at']:
-                    if field in prescription and prescription[field]:
-                        prescription[field] = str(prescription[field])
-                
-                if current_user["role"] == "patient":
-                    doctor = dict(record["d"]) if record["d"] else None
-                    doctor_user = dict(record["du"]) if record["du"] else None
-                    prescriptions.append({
-                        "prescription": prescription,
-                        "doctor": doctor,
-                        "doctor_user": doctor_user
-                    })
-                else:
-                    patient = dict(record["pat"]) if record["pat"] else None
-                    patient_user = dict(record["pu"]) if record["pu"] else None
-                    prescriptions.append({
-                        "prescription": prescription,
-                        "patient": patient,
-                        "patient_user": patient_user
-                    })
+        result = read_query(query, params)
+        
+        prescriptions = []
+        for record in result:
+            prescription = dict(record["p"])
+            # Convert datetime fields
+            for field in ['created_at', 'updated_at']:
+                if field in prescription and prescription[field]:
+                    prescription[field] = str(prescription[field])
             
-            return {"prescriptions": prescriptions}
+            if current_user["role"] == "patient":
+                doctor = dict(record["d"]) if record["d"] else None
+                doctor_user = dict(record["du"]) if record["du"] else None
+                prescriptions.append({
+                    "prescription": prescription,
+                    "doctor": doctor,
+                    "doctor_user": doctor_user
+                })
+            else:
+                patient = dict(record["pat"]) if record["pat"] else None
+                patient_user = dict(record["pu"]) if record["pu"] else None
+                prescriptions.append({
+                    "prescription": prescription,
+                    "patient": patient,
+                    "patient_user": patient_user
+                })
+        
+        return {"prescriptions": prescriptions}
             
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -177,54 +187,57 @@ def get_prescription_details(
 ):
     """Get detailed prescription information"""
     try:
-        with driver.session() as session:
-            # Check access permissions
-            access_query = """
-            MATCH (p:Prescription {id: $prescription_id})
-            WHERE p.patient_id = $user_id OR p.doctor_id = $user_id
-            RETURN p
-            """
-            
-            access_result = session.run(access_query, 
-                prescription_id=prescription_id, 
-                user_id=current_user["id"]
-            )
-            
-            if not access_result.single():
-                raise HTTPException(status_code=403, detail="Access denied")
+        # Check access permissions
+        access_query = """
+        MATCH (p:Prescription {id: $prescription_id})
+        WHERE p.patient_id = $user_id OR p.doctor_id = $user_id
+        RETURN p
+        """
+        
+        access_result = read_query(access_query, {
+            "prescription_id": prescription_id,
+            "user_id": current_user["id"]
+        })
+        
+        if not access_result:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        # Get full prescription details
+        detail_query = """
+        MATCH (p:Prescription {id: $prescription_id})
+        OPTIONAL MATCH (d:Doctor {user_id: p.doctor_id})
+        OPTIONAL MATCH (du:User {id: p.doctor_id})
+        OPTIONAL MATCH (pat:Patient {user_id: p.patient_id})
+        OPTIONAL MATCH (pu:User {id: p.patient_id})
+        OPTIONAL MATCH (c:Consultation {id: p.consultation_id})
+        RETURN p, d, du, pat, pu, c
+        """
+        
+        result = read_query(detail_query, {"prescription_id": prescription_id})
+        record = result[0] if result else None
+        
+        if record:
+            prescription = dict(record["p"])
+            # Convert datetime fields
+            for field in ['created_at', 'updated_at']:
+                if field in prescription and prescription[field]:
+                    prescription[field] = str(prescription[field])
             
-            # Get full prescription details
-            detail_query = """
-            MATCH (p:Prescription {id: $prescription_id})
-            OPTIONAL MATCH (d:Doctor {user_id: p.doctor_id})
-            OPTIONAL MATCH (du:User {id: p.doctor_id})
-            OPTIONAL MATCH (pat:Patient {user_id: p.patient_id})
-            OPTIONAL MATCH (pu:User {id: p.patient_id})
-            OPTIONAL MATCH (c:Consultation {id: p.consultation_id})
-            RETURN p, d, du, pat, pu, c
-            """
-            
-            result = session.run(detail_query, prescription_id=prescription_id)
-            record = result.single()
-            
-            if record:
-                prescription = dict(record["p"])
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at']:
-                    if field in prescription and prescription[field]:
-                        prescription[field] = str(prescription[field])
-                
-                return {
-                    "prescription": prescription,
-                    "doctor": dict(record["d"]) if record["d"] else None,
-                    "doctor_user": dict(record["du"]) if record["du"] else None,
-                    "patient": dict(record["pat"]) if record["pat"] else None,
-                    "patient_user": dict(record["pu"]) if record["pu"] else None,
-                    "consultation": dict(record["c"]) if record["c"] else None
-                }
-            else:
-                raise HTTPException(status_code=404, detail="Prescription not found")
+            return {
+                "prescription": prescription,
+                "doctor": dict(record["d"]) if record["d"] else None,
+                "doctor_user": dict(record["du"]) if record["du"] else None,
+                "patient": dict(record["pat"]) if record["pat"] else None,
+                "patient_user": dict(record["pu"]) if record["pu"] else None,
+                "consultation": dict(record["c"]) if record["c"] else None
+            }
+        else:
+            raise HTTPException(status_code=404, detail="Prescription not found")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -239,70 +252,73 @@ def update_prescription(
         raise HTTPException(status_code=403, detail="Only doctors can update prescriptions")
     
     try:
-        with driver.session() as session:
-            # Check if prescription exists and doctor has access
-            access_query = """
-            MATCH (p:Prescription {id: $prescription_id})
-            WHERE p.doctor_id = $doctor_id
-            RETURN p
-            """
-            
-            access_result = session.run(access_query, 
-                prescription_id=prescription_id, 
-                doctor_id=current_user["id"]
-            )
-            
-            if not access_result.single():
-                raise HTTPException(status_code=403, detail="Access denied")
-            
-            # Build update query
-            set_clauses = ["p.updated_at = datetime()"]
-            params = {"prescription_id": prescription_id}
+        # Check if prescription exists and doctor has access
+        access_query = """
+        MATCH (p:Prescription {id: $prescription_id})
+        WHERE p.doctor_id = $doctor_id
+        RETURN p
+        """
+        
+        access_result = read_query(access_query, {
+            "prescription_id": prescription_id,
+            "doctor_id": current_user["id"]
+        })
+        
+        if not access_result:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        # Build update query
+        set_clauses = ["p.updated_at = datetime()"]
+        params = {"prescription_id": prescription_id}
+        
+        if update_data.medications is not None:
+            set_clauses.append("p.medications = $medications")
+            params["medications"] = [med.dict() for med in update_data.medications]
+        
+        if update_data.general_instructions is not None:
+            set_clauses.append("p.general_instructions = $general_instructions")
+            params["general_instructions"] = update_data.general_instructions
+        
+        if update_data.follow_up_required is not None:
+            set_clauses.append("p.follow_up_required = $follow_up_required")
+            params["follow_up_required"] = update_data.follow_up_required
+        
+        if update_data.follow_up_days is not None:
+            set_clauses.append("p.follow_up_days = $follow_up_days")
+            params["follow_up_days"] = update_data.follow_up_days
+        
+        if update_data.status is not None:
+            set_clauses.append("p.status = $status")
+            params["status"] = update_data.status
+        
+        update_query = f"""
+        MATCH (p:Prescription {{id: $prescription_id}})
+        SET {', '.join(set_clauses)}
+        RETURN p
+        """
+        
+        result = write_query(update_query, params)
+        
+        updated_prescription = result[0] if result else None
+        if updated_prescription:
+            prescription_dict = dict(updated_prescription["p"])
+            # Convert datetime fields
+            for field in ['created_at', 'updated_at']:
+                if field in prescription_dict and prescription_dict[field]:
+                    prescription_dict[field] = str(prescription_dict[field])
             
-            if update_data.medications is not None:
-                set_clauses.append("p.medications = $medications")
-                params["medications"] = [med.dict() for med in update_data.medications]
-            
-            if update_data.general_instructions is not None:
-                set_clauses.append("p.general_instructions = $general_instructions")
-                params["general_instructions"] = update_data.general_instructions
-            
-            if update_data.follow_up_required is not None:
-                set_clauses.append("p.follow_up_required = $follow_up_required")
-                params["follow_up_required"] = update_data.follow_up_required
-            
-            if update_data.follow_up_days is not None:
-                set_clauses.append("p.follow_up_days = $follow_up_days")
-                params["follow_up_days"] = update_data.follow_up_days
-            
-            if update_data.status is not None:
-                set_clauses.append("p.status = $status")
-                params["status"] = update_data.status
-            
-            update_query = f"""
-            MATCH (p:Prescription {{id: $prescription_id}})
-            SET {', '.join(set_clauses)}
-            RETURN p
-            """
-            
-            result = session.run(update_query, params)
-            
-            updated_prescription = result.single()
-            if updated_prescription:
-                prescription_dict = dict(updated_prescription["p"])
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at']:
-                    if field in prescription_dict and prescription_dict[field]:
-                        prescription_dict[field] = str(prescription_dict[field])
-                
-                return {
-                    "success": True,
-                    "message": "Prescription updated successfully",
-                    "prescription": prescription_dict
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to update prescription")
+            return {
+                "success": True,
+                "message": "Prescription updated successfully",
+                "prescription": prescription_dict
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to update prescription")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -313,50 +329,53 @@ def mark_prescription_completed(
 ):
     """Mark prescription as completed (patients can mark their own prescriptions)"""
     try:
-        with driver.session() as session:
-            # Check access permissions
-            access_query = """
+        # Check access permissions
+        access_query = """
+        MATCH (p:Prescription {id: $prescription_id})
+        WHERE p.patient_id = $user_id OR p.doctor_id = $user_id
+        RETURN p
+        """
+        
+        access_result = read_query(access_query, {
+            "prescription_id": prescription_id,
+            "user_id": current_user["id"]
+        })
+        
+        if not access_result:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        # Mark as completed
+        result = write_query(
+            """
             MATCH (p:Prescription {id: $prescription_id})
-            WHERE p.patient_id = $user_id OR p.doctor_id = $user_id
+            SET p.status = 'completed',
+                p.completed_at = datetime(),
+                p.updated_at = datetime()
             RETURN p
-            """
-            
-            access_result = session.run(access_query, 
-                prescription_id=prescription_id, 
-                user_id=current_user["id"]
-            )
-            
-            if not access_result.single():
-                raise HTTPException(status_code=403, detail="Access denied")
-            
-            # Mark as completed
-            result = session.run(
-                """
-                MATCH (p:Prescription {id: $prescription_id})
-                SET p.status = 'completed',
-                    p.completed_at = datetime(),
-                    p.updated_at = datetime()
-                RETURN p
-                """,
-                prescription_id=prescription_id
-            )
+            """,
+            {"prescription_id": prescription_id}
+        )
+        
+        prescription_record = result[0] if result else None
+        if prescription_record:
+            prescription_dict = dict(prescription_record["p"])
+            # Convert datetime fields
+            for field in ['created_at', 'updated_at', 'completed_at']:
+                if field in prescription_dict and prescription_dict[field]:
+                    prescription_dict[field] = str(prescription_dict[field])
             
-            prescription_record = result.single()
-            if prescription_record:
-                prescription_dict = dict(prescription_record["p"])
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at', 'completed_at']:
-                    if field in prescription_dict and prescription_dict[field]:
-                        prescription_dict[field] = str(prescription_dict[field])
-                
-                return {
-                    "success": True,
-                    "message": "Prescription marked as completed",
-                    "prescription": prescription_dict
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to update prescription")
+            return {
+                "success": True,
+                "message": "Prescription marked as completed",
+                "prescription": prescription_dict
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to update prescription")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -364,46 +383,49 @@ def mark_prescription_completed(
 def get_prescription_stats(current_user: dict = Depends(get_current_user)):
     """Get prescription statistics for dashboard"""
     try:
-        with driver.session() as session:
-            if current_user["role"] == "patient":
-                result = session.run(
-                    """
-                    MATCH (p:Prescription {patient_id: $user_id})
-                    RETURN 
-                        count(p) as total,
-                        count(CASE WHEN p.status = 'active' THEN 1 END) as active,
-                        count(CASE WHEN p.status = 'completed' THEN 1 END) as completed,
-                        count(CASE WHEN p.follow_up_required = true THEN 1 END) as follow_up_needed
-                    """,
-                    user_id=current_user["id"]
-                )
-            elif current_user["role"] == "doctor":
-                result = session.run(
-                    """
-                    MATCH (p:Prescription {doctor_id: $user_id})
-                    RETURN 
-                        count(p) as total,
-                        count(CASE WHEN p.status = 'active' THEN 1 END) as active,
-                        count(CASE WHEN p.status = 'completed' THEN 1 END) as completed,
-                        count(CASE WHEN p.follow_up_required = true THEN 1 END) as follow_up_needed
-                    """,
-                    user_id=current_user["id"]
-                )
-            else:
-                # Admin stats
-                result = session.run(
-                    """
-                    MATCH (p:Prescription)
-                    RETURN 
-                        count(p) as total,
-                        count(CASE WHEN p.status = 'active' THEN 1 END) as active,
-                        count(CASE WHEN p.status = 'completed' THEN 1 END) as completed,
-                        count(CASE WHEN p.follow_up_required = true THEN 1 END) as follow_up_needed
-                    """
-                )
-            
-            stats = result.single()
-            return dict(stats) if stats else {}
+        if current_user["role"] == "patient":
+            result = read_query(
+                """
+                MATCH (p:Prescription {patient_id: $user_id})
+                RETURN 
+                    count(p) as total,
+                    count(CASE WHEN p.status = 'active' THEN 1 END) as active,
+                    count(CASE WHEN p.status = 'completed' THEN 1 END) as completed,
+                    count(CASE WHEN p.follow_up_required = true THEN 1 END) as follow_up_needed
+                """,
+                {"user_id": current_user["id"]}
+            )
+        elif current_user["role"] == "doctor":
+            result = read_query(
+                """
+                MATCH (p:Prescription {doctor_id: $user_id})
+                RETURN 
+                    count(p) as total,
+                    count(CASE WHEN p.status = 'active' THEN 1 END) as active,
+                    count(CASE WHEN p.status = 'completed' THEN 1 END) as completed,
+                    count(CASE WHEN p.follow_up_required = true THEN 1 END) as follow_up_needed
+                """,
+                {"user_id": current_user["id"]}
+            )
+        else:
+            # Admin stats
+            result = read_query(
+                """
+                MATCH (p:Prescription)
+                RETURN 
+                    count(p) as total,
+                    count(CASE WHEN p.status = 'active' THEN 1 END) as active,
+                    count(CASE WHEN p.status = 'completed' THEN 1 END) as completed,
+                    count(CASE WHEN p.follow_up_required = true THEN 1 END) as follow_up_needed
+                """
+            )
+        
+        stats = result[0] if result else None
+        return dict(stats) if stats else {}
             
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,13 +2,36 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 import uuid
 from datetime import datetime
+from neo4j import WRITE_ACCESS
 from pydantic import BaseModel
 
 from auth.utils import get_current_user
-from database.connection import driver
+from database.connection import driver, read_query, write_query, DATABASE_UNAVAILABLE_ERRORS
+from database.pagination import keyset_condition, split_page
+from database.serialization import serialize_node
+from services.doctor_catalog import refresh_doctor
+from services.doctor_ratings import RATING_CHANGE_CLAUSE, apply_rating_change, rating_histogram
 
 router = APIRouter(prefix="/reviews", tags=["reviews"])
 
+UPDATE_REVIEW_QUERY = """
+MATCH (r:Review {id: $review_id, patient_id: $patient_id})
+// Lock the review before reading the rating being replaced
+SET r.updated_at = datetime()
+WITH r, r.rating as previous_rating
+SET r += $fields
+RETURN r, previous_rating
+"""
+
+DELETE_REVIEW_QUERY = """
+MATCH (r:Review {id: $review_id})
+WHERE r.patient_id = $user_id OR $is_admin
+SET r.updated_at = datetime()
+WITH r, r.rating as rating, r.doctor_id as doctor_id
+DETACH DELETE r
+RETURN rating, doctor_id
+"""
+
 class ReviewCreate(BaseModel):
     doctor_id: str
     consultation_id: Optional[str] = None
@@ -18,6 +41,12 @@ class ReviewCreate(BaseModel):
     comment: str
     recommend: bool = True
 
+class ReviewUpdate(BaseModel):
+    rating: Optional[int] = None  # 1-5 stars
+    title: Optional[str] = None
+    comment: Optional[str] = None
+    recommend: Optional[bool] = None
+
 class ReviewResponse(BaseModel):
     response: str
 
@@ -35,202 +64,222 @@ def create_review(
         raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
     
     try:
-        with driver.session() as session:
-            # Check if doctor exists
-            doctor_check = session.run(
-                "MATCH (d:Doctor {user_id: $doctor_id}) RETURN d",
-                doctor_id=review_data.doctor_id
+        # Check if doctor exists
+        doctor_check = read_query(
+            "MATCH (d:Doctor {user_id: $doctor_id}) RETURN d",
+            {"doctor_id": review_data.doctor_id}
+        )
+        
+        if not doctor_check:
+            raise HTTPException(status_code=404, detail="Doctor not found")
+        
+        # Check if patient has had consultation/appointment with this doctor
+        if review_data.consultation_id:
+            interaction_check = read_query(
+                """
+                MATCH (c:Consultation {id: $consultation_id, patient_id: $patient_id})
+                MATCH (d:Doctor {user_id: $doctor_id})-[:RESPONDED_TO]->(c)
+                RETURN c
+                """,
+                {
+                    "consultation_id": review_data.consultation_id,
+                    "patient_id": current_user["id"],
+                    "doctor_id": review_data.doctor_id
+                }
             )
-            
-            if not doctor_check.single():
-                raise HTTPException(status_code=404, detail="Doctor not found")
-            
-            # Check if patient has had consultation/appointment with this doctor
-            if review_data.consultation_id:
-                interaction_check = session.run(
-                    """
-                    MATCH (c:Consultation {id: $consultation_id, patient_id: $patient_id})
-                    MATCH (d:Doctor {user_id: $doctor_id})-[:RESPONDED_TO]->(c)
-                    RETURN c
-                    """,
-                    consultation_id=review_data.consultation_id,
-                    patient_id=current_user["id"],
-                    doctor_id=review_data.doctor_id
-                )
-            elif review_data.appointment_id:
-                interaction_check = session.run(
-                    """
-                    MATCH (a:Appointment {id: $appointment_id, patient_id: $patient_id, doctor_id: $doctor_id})
-                    WHERE a.status = 'completed'
-                    RETURN a
-                    """,
-                    appointment_id=review_data.appointment_id,
-                    patient_id=current_user["id"],
-                    doctor_id=review_data.doctor_id
-                )
-            else:
-                # General review - check if patient has any interaction with doctor
-                interaction_check = session.run(
-                    """
-                    MATCH (d:Doctor {user_id: $doctor_id})
-                    WHERE (d)-[:RESPONDED_TO]->(:Consultation {patient_id: $patient_id})
-                       OR (:Appointment {patient_id: $patient_id, doctor_id: $doctor_id, status: 'completed'})
-                    RETURN d
-                    """,
-                    doctor_id=review_data.doctor_id,
-                    patient_id=current_user["id"]
-                )
-            
-            if not interaction_check.single():
-                raise HTTPException(status_code=400, detail="You can only review doctors you have consulted with")
-            
-            # Check for existing review
-            existing_review = session.run(
+        elif review_data.appointment_id:
+            interaction_check = read_query(
                 """
-                MATCH (r:Review {patient_id: $patient_id, doctor_id: $doctor_id})
-                WHERE ($consultation_id IS NULL OR r.consultation_id = $consultation_id)
-                  AND ($appointment_id IS NULL OR r.appointment_id = $appointment_id)
-                RETURN r
+                MATCH (a:Appointment {id: $appointment_id, patient_id: $patient_id, doctor_id: $doctor_id})
+                WHERE a.status = 'completed'
+                RETURN a
                 """,
-                patient_id=current_user["id"],
-                doctor_id=review_data.doctor_id,
-                consultation_id=review_data.consultation_id,
-                appointment_id=review_data.appointment_id
+                {
+                    "appointment_id": review_data.appointment_id,
+                    "patient_id": current_user["id"],
+                    "doctor_id": review_data.doctor_id
+                }
             )
-            
-            if existing_review.single():
-                raise HTTPException(status_code=400, detail="You have already reviewed this interaction")
-            
-            # Create review
-            review_id = str(uuid.uuid4())
-            result = session.run(
+        else:
+            # General review - check if patient has any interaction with doctor
+            interaction_check = read_query(
                 """
-                CREATE (r:Review {
-                    id: $review_id,
-                    patient_id: $patient_id,
-                    doctor_id: $doctor_id,
-                    consultation_id: $consultation_id,
-                    appointment_id: $appointment_id,
-                    rating: $rating,
-                    title: $title,
-                    comment: $comment,
-                    recommend: $recommend,
-                    created_at: datetime(),
-                    updated_at: datetime()
-                })
-                
-                // Update doctor's rating
-                WITH r
                 MATCH (d:Doctor {user_id: $doctor_id})
-                OPTIONAL MATCH (d)<-[:REVIEWED]-(existing:Review)
-                WITH d, r, count(existing) as existing_reviews, avg(existing.rating) as current_avg
-                
-                SET d.total_reviews = existing_reviews + 1,
-                    d.rating = CASE 
-                        WHEN existing_reviews = 0 THEN toFloat($rating)
-                        ELSE (current_avg * existing_reviews + $rating) / (existing_reviews + 1)
-                    END,
-                    d.updated_at = datetime()
-                
-                CREATE (d)<-[:REVIEWED]-(r)
-                RETURN r, d
+                WHERE (d)-[:RESPONDED_TO]->(:Consultation {patient_id: $patient_id})
+                   OR (:Appointment {patient_id: $patient_id, doctor_id: $doctor_id, status: 'completed'})
+                RETURN d
                 """,
-                review_id=review_id,
-                patient_id=current_user["id"],
-                doctor_id=review_data.doctor_id,
-                consultation_id=review_data.consultation_id,
-                appointment_id=review_data.appointment_id,
-                rating=review_data.rating,
-                title=review_data.title,
-                comment=review_data.comment,
-                recommend=review_data.recommend
+                {
+                    "doctor_id": review_data.doctor_id,
+                    "patient_id": current_user["id"]
+                }
             )
+        
+        if not interaction_check:
+            raise HTTPException(status_code=400, detail="You can only review doctors you have consulted with")
+        
+        # Check for existing review
+        existing_review = read_query(
+            """
+            MATCH (r:Review {patient_id: $patient_id, doctor_id: $doctor_id})
+            WHERE ($consultation_id IS NULL OR r.consultation_id = $consultation_id)
+              AND ($appointment_id IS NULL OR r.appointment_id = $appointment_id)
+            RETURN r
+            """,
+            {
+                "patient_id": current_user["id"],
+                "doctor_id": review_data.doctor_id,
+                "consultation_id": review_data.consultation_id,
+                "appointment_id": review_data.appointment_id
+            }
+        )
+        
+        if existing_review:
+            raise HTTPException(status_code=400, detail="You have already reviewed this interaction")
+        
+        # Create review
+        review_id = str(uuid.uuid4())
+        result = write_query(
+            f"""
+            CREATE (r:Review {{
+                id: $review_id,
+                patient_id: $patient_id,
+                doctor_id: $doctor_id,
+                consultation_id: $consultation_id,
+                appointment_id: $appointment_id,
+                rating: $rating,
+                title: $title,
+                comment: $comment,
+                recommend: $recommend,
+                created_at: datetime(),
+                updated_at: datetime()
+            }})
             
-            review_record = result.single()
-            if review_record:
-                review_dict = dict(review_record["r"])
-                review_dict['created_at'] = str(review_dict['created_at'])
-                review_dict['updated_at'] = str(review_dict['updated_at'])
-                
-                return {
-                    "success": True,
-                    "message": "Review submitted successfully",
-                    "review": review_dict
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to create review")
+            // Add the rating to the doctor's running aggregate
+            WITH r
+            MATCH (d:Doctor {{user_id: $doctor_id}})
+            {RATING_CHANGE_CLAUSE}
+            
+            CREATE (d)<-[:REVIEWED]-(r)
+            RETURN r, d
+            """,
+            {
+                "review_id": review_id,
+                "patient_id": current_user["id"],
+                "doctor_id": review_data.doctor_id,
+                "consultation_id": review_data.consultation_id,
+                "appointment_id": review_data.appointment_id,
+                "rating": review_data.rating,
+                "added_rating": review_data.rating,
+                "removed_rating": None,
+                "title": review_data.title,
+                "comment": review_data.comment,
+                "recommend": review_data.recommend
+            }
+        )
+        
+        review_record = result[0] if result else None
+        if review_record:
+            # The review changed the doctor's rating and review count
+            refresh_doctor(review_data.doctor_id)
+            review_dict = serialize_node(review_record["r"])
+            
+            return {
+                "success": True,
+                "message": "Review submitted successfully",
+                "review": review_dict
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to create review")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/doctor/{doctor_id}")
 def get_doctor_reviews(
     doctor_id: str,
+    cursor: Optional[str] = Query(None),
     limit: int = Query(20, le=100),
     rating_filter: Optional[int] = Query(None)
 ):
-    """Get reviews for a doctor"""
+    """Get reviews for a doctor, newest first, one page per cursor"""
     try:
-        with driver.session() as session:
-            query = """
-            MATCH (d:Doctor {user_id: $doctor_id})<-[:REVIEWED]-(r:Review)
-            OPTIONAL MATCH (p:Patient {user_id: r.patient_id})
-            OPTIONAL MATCH (pu:User {id: r.patient_id})
-            """
+        query = """
+        MATCH (r:Review {doctor_id: $doctor_id})
+        """
+        
+        conditions = []
+        # One extra row tells us whether there is a next page
+        params = {"doctor_id": doctor_id, "limit": limit + 1}
+        
+        if rating_filter:
+            conditions.append("r.rating = $rating_filter")
+            params["rating_filter"] = rating_filter
+        
+        after_cursor = keyset_condition(cursor, "r.created_at", "r.id", params)
+        if after_cursor:
+            conditions.append(after_cursor)
+        
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        query += """
+        WITH r
+        ORDER BY r.created_at DESC, r.id DESC
+        LIMIT $limit
+        OPTIONAL MATCH (p:Patient {user_id: r.patient_id})
+        OPTIONAL MATCH (pu:User {id: r.patient_id})
+        RETURN r, p, pu.email as patient_email
+        ORDER BY r.created_at DESC, r.id DESC
+        """
+        
+        records, next_cursor = split_page(read_query(query, params), limit, "r")
+        
+        reviews = []
+        for record in records:
+            review = serialize_node(record["r"])
+            patient = record["p"] or {}
             
-            params = {"doctor_id": doctor_id, "limit": limit}
-            
-            if rating_filter:
-                query += " WHERE r.rating = $rating_filter"
-                params["rating_filter"] = rating_filter
+            # Anonymize patient information
+            patient_info = {
+                "name": patient.get("full_name", "Anonymous")[:1] + "***" if patient.get("full_name") else "Anonymous",
+                "verified": bool(patient)
+            }
             
-            query += """
-            RETURN r, p, pu.email as patient_email
-            ORDER BY r.created_at DESC
-            LIMIT $limit
+            reviews.append({
+                "review": review,
+                "patient": patient_info
+            })
+        
+        # Summary statistics come from the doctor's running aggregate
+        summary_records = read_query(
             """
-            
-            result = session.run(query, params)
-            
-            reviews = []
-            for record in result:
-                review = dict(record["r"])
-                patient = dict(record["p"]) if record["p"] else {}
-                
-                # Convert datetime and anonymize patient info
-                review['created_at'] = str(review['created_at'])
-                review['updated_at'] = str(review['updated_at'])
-                
-                # Anonymize patient information
-                patient_info = {
-                    "name": patient.get("full_name", "Anonymous")[:1] + "***" if patient.get("full_name") else "Anonymous",
-                    "verified": bool(patient)
-                }
-                
-                reviews.append({
-                    "review": review,
-                    "patient": patient_info
-                })
-            
-            # Get summary statistics
-            summary_result = session.run(
-                """
-                MATCH (d:Doctor {user_id: $doctor_id})
-                RETURN d.rating as avg_rating, d.total_reviews as total_reviews
-                """,
-                doctor_id=doctor_id
-            )
-            
-            summary = summary_result.single()
-            
-            return {
-                "reviews": reviews,
-                "summary": {
-                    "average_rating": round(summary["avg_rating"], 2) if summary and summary["avg_rating"] else 0.0,
-                    "total_reviews": summary["total_reviews"] if summary else 0
-                }
+            MATCH (d:Doctor {user_id: $doctor_id})
+            RETURN d
+            """,
+            {"doctor_id": doctor_id}
+        )
+        
+        doctor = summary_records[0]["d"] if summary_records else {}
+        
+        return {
+            "reviews": reviews,
+            "next_cursor": next_cursor,
+            "summary": {
+                "average_rating": round(doctor.get("rating") or 0.0, 2),
+                "total_reviews": doctor.get("total_reviews") or 0,
+                "rating_histogram": rating_histogram(doctor)
             }
-            
+        }
+        
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -245,49 +294,127 @@ def respond_to_review(
         raise HTTPException(status_code=403, detail="Only doctors can respond to reviews")
     
     try:
-        with driver.session() as session:
-            # Check if review exists and is for this doctor
-            review_check = session.run(
-                """
-                MATCH (r:Review {id: $review_id, doctor_id: $doctor_id})
-                RETURN r
-                """,
-                review_id=review_id,
-                doctor_id=current_user["id"]
-            )
-            
-            if not review_check.single():
-                raise HTTPException(status_code=404, detail="Review not found or access denied")
-            
-            # Add response
-            result = session.run(
-                """
-                MATCH (r:Review {id: $review_id})
-                SET r.doctor_response = $response,
-                    r.response_date = datetime(),
-                    r.updated_at = datetime()
-                RETURN r
-                """,
-                review_id=review_id,
-                response=response_data.response
-            )
+        # Check if review exists and is for this doctor
+        review_check = read_query(
+            """
+            MATCH (r:Review {id: $review_id, doctor_id: $doctor_id})
+            RETURN r
+            """,
+            {
+                "review_id": review_id,
+                "doctor_id": current_user["id"]
+            }
+        )
+        
+        if not review_check:
+            raise HTTPException(status_code=404, detail="Review not found or access denied")
+        
+        # Add response
+        result = write_query(
+            """
+            MATCH (r:Review {id: $review_id})
+            SET r.doctor_response = $response,
+                r.response_date = datetime(),
+                r.updated_at = datetime()
+            RETURN r
+            """,
+            {
+                "review_id": review_id,
+                "response": response_data.response
+            }
+        )
+        
+        updated_review = result[0] if result else None
+        if updated_review:
+            review_dict = serialize_node(updated_review["r"])
             
-            updated_review = result.single()
-            if updated_review:
-                review_dict = dict(updated_review["r"])
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at', 'response_date']:
-                    if field in review_dict and review_dict[field]:
-                        review_dict[field] = str(review_dict[field])
-                
-                return {
-                    "success": True,
-                    "message": "Response added successfully",
-                    "review": review_dict
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to add response")
+            return {
+                "success": True,
+                "message": "Response added successfully",
+                "review": review_dict
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to add response")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/{review_id}")
+def update_review(
+    review_id: str,
+    review_data: ReviewUpdate,
+    current_user: dict = Depends(get_current_user)
+):
+    """Edit your own review"""
+    if current_user["role"] != "patient":
+        raise HTTPException(status_code=403, detail="Only patients can edit reviews")
+    
+    if review_data.rating is not None and not 1 <= review_data.rating <= 5:
+        raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
+    
+    fields = review_data.dict(exclude_none=True)
+    
+    def work(tx):
+        record = tx.run(UPDATE_REVIEW_QUERY, {"review_id": review_id, "patient_id": current_user["id"], "fields": fields}).single()
+        if record is None:
+            raise HTTPException(status_code=404, detail="Review not found or access denied")
+        review = record["r"]
+        if review["rating"] != record["previous_rating"]:
+            apply_rating_change(tx, review["doctor_id"], review["rating"], record["previous_rating"])
+        return review
+    
+    try:
+        with driver.session(default_access_mode=WRITE_ACCESS) as session:
+            review = session.execute_write(work)
+        
+        if "rating" in fields:
+            refresh_doctor(review["doctor_id"])
+        
+        return {
+            "success": True,
+            "message": "Review updated successfully",
+            "review": serialize_node(review)
+        }
+        
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/{review_id}")
+def delete_review(
+    review_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Delete a review (its author or an admin)"""
+    if current_user["role"] not in ("patient", "admin"):
+        raise HTTPException(status_code=403, detail="Only the author or an admin can delete a review")
+    
+    def work(tx):
+        record = tx.run(DELETE_REVIEW_QUERY, {"review_id": review_id, "user_id": current_user["id"], "is_admin": current_user["role"] == "admin"}).single()
+        if record is None:
+            raise HTTPException(status_code=404, detail="Review not found or access denied")
+        apply_rating_change(tx, record["doctor_id"], removed_rating=record["rating"])
+        return record["doctor_id"]
+    
+    try:
+        with driver.session(default_access_mode=WRITE_ACCESS) as session:
+            doctor_id = session.execute_write(work)
+        
+        refresh_doctor(doctor_id)
+        
+        return {"success": True, "message": "Review deleted successfully"}
+        
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -301,41 +428,38 @@ def get_my_reviews(
         raise HTTPException(status_code=403, detail="Only patients can view their reviews")
     
     try:
-        with driver.session() as session:
-            result = session.run(
-                """
-                MATCH (r:Review {patient_id: $patient_id})
-                OPTIONAL MATCH (d:Doctor {user_id: r.doctor_id})
-                OPTIONAL MATCH (du:User {id: r.doctor_id})
-                RETURN r, d, du
-                ORDER BY r.created_at DESC
-                LIMIT $limit
-                """,
-                patient_id=current_user["id"],
-                limit=limit
-            )
-            
-            reviews = []
-            for record in result:
-                review = dict(record["r"])
-                doctor = dict(record["d"]) if record["d"] else {}
-                doctor_user = dict(record["du"]) if record["du"] else {}
-                
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at', 'response_date']:
-                    if field in review and review[field]:
-                        review[field] = str(review[field])
-                
-                if 'password' in doctor_user:
-                    del doctor_user['password']
-                
-                reviews.append({
-                    "review": review,
-                    "doctor": doctor,
-                    "doctor_user": doctor_user
-                })
+        result = read_query(
+            """
+            MATCH (r:Review {patient_id: $patient_id})
+            OPTIONAL MATCH (d:Doctor {user_id: r.doctor_id})
+            OPTIONAL MATCH (du:User {id: r.doctor_id})
+            RETURN r, d, du
+            ORDER BY r.created_at DESC
+            LIMIT $limit
+            """,
+            {
+                "patient_id": current_user["id"],
+                "limit": limit
+            }
+        )
+        
+        reviews = []
+        for record in result:
+            review = serialize_node(record["r"])
+            doctor = serialize_node(record["d"]) or {}
+            doctor_user = serialize_node(record["du"]) or {}
             
-            return {"reviews": reviews}
+            reviews.append({
+                "review": review,
+                "doctor": doctor,
+                "doctor_user": doctor_user
+            })
+        
+        return {"reviews": reviews}
             
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -8,23 +8,31 @@ from datetime import datetime, timedelta
 from pydantic import BaseModel
 
 from auth.utils import get_current_user
-from database.connection import driver
+from database.connection import read_query, write_query, DATABASE_UNAVAILABLE_ERRORS
+from database.async_connection import read_query as async_read_query
+from database.pagination import keyset_condition, split_page
+from services.chat_buffer import chat_buffer
+from services.ws_outbox import Outbox, get_outbox_metrics
 
 router = APIRouter(prefix="/video", tags=["video-conference"])
 
 # Video conference connection manager
 class VideoConnectionManager:
+    """Room membership of this worker's sockets; each socket sends through its own bounded outbox"""
+
     def __init__(self):
-        self.room_connections: Dict[str, Dict[str, WebSocket]] = {}
+        self.room_connections: Dict[str, Dict[str, Outbox]] = {}
         self.user_rooms: Dict[str, str] = {}
+        self.metrics = get_outbox_metrics("video")
     
     async def join_room(self, websocket: WebSocket, room_id: str, user_id: str, user_role: str):
         await websocket.accept()
         
-        if room_id not in self.room_connections:
-            self.room_connections[room_id] = {}
+        # A rejoin from a new socket replaces the old one
+        self.leave_room(user_id, notify=False)
         
-        self.room_connections[room_id][user_id] = websocket
+        outbox = Outbox(websocket, self.metrics, on_close=lambda: self._remove(room_id, user_id, outbox))
+        self.room_connections.setdefault(room_id, {})[user_id] = outbox
         self.user_rooms[user_id] = room_id
         
         # Notify others in the room
@@ -36,44 +44,65 @@ class VideoConnectionManager:
                 "timestamp": datetime.now().isoformat()
             }),
             room_id,
-            exclude_user=user_id
+            exclude_user=user_id,
+            **self._presence(user_id)
         )
+        return outbox
     
-    def leave_room(self, user_id: str):
-        if user_id in self.user_rooms:
-            room_id = self.user_rooms[user_id]
-            
-            if room_id in self.room_connections and user_id in self.room_connections[room_id]:
-                del self.room_connections[room_id][user_id]
-                
-                # Notify others in the room
-                asyncio.create_task(self.broadcast_to_room(
-                    json.dumps({
-                        "type": "user_left",
-                        "user_id": user_id,
-                        "timestamp": datetime.now().isoformat()
-                    }),
-                    room_id,
-                    exclude_user=user_id
-                ))
-                
-                # Clean up empty rooms
-                if not self.room_connections[room_id]:
-                    del self.room_connections[room_id]
-            
+    @staticmethod
+    def _presence(user_id: str) -> dict:
+        # Only a user's latest join/leave matters, and it may be dropped under pressure
+        return {"coalesce_key": f"presence:{user_id}", "droppable": True}
+    
+    def _remove(self, room_id: str, user_id: str, outbox: Outbox = None, notify: bool = True) -> bool:
+        connections = self.room_connections.get(room_id, {})
+        current = connections.get(user_id)
+        if current is None or (outbox is not None and current is not outbox):
+            return False
+        
+        del connections[user_id]
+        if not connections:
+            # Clean up empty rooms and persist their chat right away
+            del self.room_connections[room_id]
+            chat_buffer.flush_soon()
+        if self.user_rooms.get(user_id) == room_id:
             del self.user_rooms[user_id]
+        current.close()
+        
+        if notify and connections:
+            # Notify others in the room
+            self._put(
+                json.dumps({
+                    "type": "user_left",
+                    "user_id": user_id,
+                    "timestamp": datetime.now().isoformat()
+                }),
+                room_id,
+                exclude_user=user_id,
+                **self._presence(user_id)
+            )
+        return True
     
-    async def broadcast_to_room(self, message: str, room_id: str, exclude_user: str = None):
-        if room_id in self.room_connections:
-            for user_id, connection in self.room_connections[room_id].items():
-                if user_id != exclude_user:
-                    try:
-                        await connection.send_text(message)
-                    except:
-                        # Remove broken connections
-                        del self.room_connections[room_id][user_id]
-                        if user_id in self.user_rooms:
-                            del self.user_rooms[user_id]
+    def leave_room(self, user_id: str, notify: bool = True, outbox: Outbox = None):
+        """Remove the user from their room (only if still on `outbox`, when given)"""
+        if user_id in self.user_rooms:
+            self._remove(self.user_rooms[user_id], user_id, outbox, notify)
+    
+    def _put(self, message: str, room_id: str, exclude_user: str = None, coalesce_key: str = None, droppable: bool = False):
+        for user_id, outbox in list(self.room_connections.get(room_id, {}).items()):
+            if user_id != exclude_user:
+                outbox.put(message, coalesce_key, droppable)
+    
+    async def broadcast_to_room(
+        self,
+        message: str,
+        room_id: str,
+        exclude_user: str = None,
+        coalesce_key: str = None,
+        droppable: bool = False
+    ):
+        """Queue a message for everyone in the room; never waits on a client's socket"""
+        self._put(message, room_id, exclude_user, coalesce_key, droppable)
 
 video_manager = VideoConnectionManager()
 
@@ -98,86 +127,95 @@ def create_video_room(
 ):
     """Create a video conference room"""
     try:
-        with driver.session() as session:
-            # Verify access to consultation/appointment
-            if room_data.consultation_id:
-                access_check = session.run(
-                    """
-                    MATCH (c:Consultation {id: $consultation_id})
-                    WHERE c.patient_id = $user_id OR (c)<-[:RESPONDED_TO]-(:Doctor {user_id: $user_id})
-                    RETURN c
-                    """,
-                    consultation_id=room_data.consultation_id,
-                    user_id=current_user["id"]
-                )
-            elif room_data.appointment_id:
-                access_check = session.run(
-                    """
-                    MATCH (a:Appointment {id: $appointment_id})
-                    WHERE a.patient_id = $user_id OR a.doctor_id = $user_id
-                    RETURN a
-                    """,
-                    appointment_id=room_data.appointment_id,
-                    user_id=current_user["id"]
-                )
-            else:
-                # Direct room creation
-                access_check = session.run("RETURN true as access")
-            
-            if not access_check.single():
-                raise HTTPException(status_code=403, detail="Access denied")
-            
-            # Create video room
-            room_id = str(uuid.uuid4())
-            room_token = secrets.token_urlsafe(32)
-            
-            result = session.run(
+        # Verify access to consultation/appointment
+        if room_data.consultation_id:
+            access_check = read_query(
                 """
-                CREATE (v:VideoRoom {
-                    id: $room_id,
-                    token: $room_token,
-                    host_id: $host_id,
-                    participant_id: $participant_id,
-                    consultation_id: $consultation_id,
-                    appointment_id: $appointment_id,
-                    room_type: $room_type,
-                    duration_minutes: $duration_minutes,
-                    scheduled_start: $scheduled_start,
-                    status: 'scheduled',
-                    created_at: datetime(),
-                    updated_at: datetime()
-                })
-                RETURN v
+                MATCH (c:Consultation {id: $consultation_id})
+                WHERE c.patient_id = $user_id OR (c)<-[:RESPONDED_TO]-(:Doctor {user_id: $user_id})
+                RETURN c
                 """,
-                room_id=room_id,
-                room_token=room_token,
-                host_id=current_user["id"],
-                participant_id=room_data.participant_id,
-                consultation_id=room_data.consultation_id,
-                appointment_id=room_data.appointment_id,
-                room_type=room_data.room_type,
-                duration_minutes=room_data.duration_minutes,
-                scheduled_start=room_data.scheduled_start
+                {
+                    "consultation_id": room_data.consultation_id,
+                    "user_id": current_user["id"]
+                }
             )
-            
-            room_record = result.single()
-            if room_record:
-                room_dict = dict(room_record["v"])
-                room_dict['created_at'] = str(room_dict['created_at'])
-                room_dict['updated_at'] = str(room_dict['updated_at'])
-                
-                # Send invitation notification to participant
-                # TODO: Auto-send notification
-                
-                return {
-                    "success": True,
-                    "message": "Video room created successfully",
-                    "room": room_dict,
-                    "join_url": f"/video/room/{room_id}?token={room_token}"
+        elif room_data.appointment_id:
+            access_check = read_query(
+                """
+                MATCH (a:Appointment {id: $appointment_id})
+                WHERE a.patient_id = $user_id OR a.doctor_id = $user_id
+                RETURN a
+                """,
+                {
+                    "appointment_id": room_data.appointment_id,
+                    "user_id": current_user["id"]
                 }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to create video room")
+            )
+        else:
+            # Direct room creation
+            access_check = read_query("RETURN true as access")
+        
+        if not access_check:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        # Create video room
+        room_id = str(uuid.uuid4())
+        room_token = secrets.token_urlsafe(32)
+        
+        result = write_query(
+            """
+            CREATE (v:VideoRoom {
+                id: $room_id,
+                token: $room_token,
+                host_id: $host_id,
+                participant_id: $participant_id,
+                consultation_id: $consultation_id,
+                appointment_id: $appointment_id,
+                room_type: $room_type,
+                duration_minutes: $duration_minutes,
+                scheduled_start: $scheduled_start,
+                status: 'scheduled',
+                created_at: datetime(),
+                updated_at: datetime()
+            })
+            RETURN v
+            """,
+            {
+                "room_id": room_id,
+                "room_token": room_token,
+                "host_id": current_user["id"],
+                "participant_id": room_data.participant_id,
+                "consultation_id": room_data.consultation_id,
+                "appointment_id": room_data.appointment_id,
+                "room_type": room_data.room_type,
+                "duration_minutes": room_data.duration_minutes,
+                "scheduled_start": room_data.scheduled_start
+            }
+        )
+        
+        room_record = result[0] if result else None
+        if room_record:
+            room_dict = dict(room_record["v"])
+            room_dict['created_at'] = str(room_dict['created_at'])
+            room_dict['updated_at'] = str(room_dict['updated_at'])
+            
+            # Send invitation notification to participant
+            # TODO: Auto-send notification
+            
+            return {
+                "success": True,
+                "message": "Video room created successfully",
+                "room": room_dict,
+                "join_url": f"/video/room/{room_id}?token={room_token}"
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to create video room")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -189,36 +227,41 @@ def get_video_room(
 ):
     """Get video room details and verify access"""
     try:
-        with driver.session() as session:
-            result = session.run(
-                """
-                MATCH (v:VideoRoom {id: $room_id})
-                WHERE v.token = $token
-                  AND (v.host_id = $user_id OR v.participant_id = $user_id)
-                OPTIONAL MATCH (h:User {id: v.host_id})
-                OPTIONAL MATCH (p:User {id: v.participant_id})
-                RETURN v, h.email as host_email, p.email as participant_email
-                """,
-                room_id=room_id,
-                token=token,
-                user_id=current_user["id"]
-            )
-            
-            room_record = result.single()
-            if not room_record:
-                raise HTTPException(status_code=403, detail="Invalid room or access denied")
-            
-            room = dict(room_record["v"])
-            room['created_at'] = str(room['created_at'])
-            room['updated_at'] = str(room['updated_at'])
-            
-            return {
-                "room": room,
-                "host_email": room_record["host_email"],
-                "participant_email": room_record["participant_email"],
-                "is_host": room["host_id"] == current_user["id"]
+        result = read_query(
+            """
+            MATCH (v:VideoRoom {id: $room_id})
+            WHERE v.token = $token
+              AND (v.host_id = $user_id OR v.participant_id = $user_id)
+            OPTIONAL MATCH (h:User {id: v.host_id})
+            OPTIONAL MATCH (p:User {id: v.participant_id})
+            RETURN v, h.email as host_email, p.email as participant_email
+            """,
+            {
+                "room_id": room_id,
+                "token": token,
+                "user_id": current_user["id"]
             }
-            
+        )
+        
+        room_record = result[0] if result else None
+        if not room_record:
+            raise HTTPException(status_code=403, detail="Invalid room or access denied")
+        
+        room = dict(room_record["v"])
+        room['created_at'] = str(room['created_at'])
+        room['updated_at'] = str(room['updated_at'])
+        
+        return {
+            "room": room,
+            "host_email": room_record["host_email"],
+            "participant_email": room_record["participant_email"],
+            "is_host": room["host_id"] == current_user["id"]
+        }
+            
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -233,24 +276,21 @@ async def video_room_websocket(
     """WebSocket endpoint for video room signaling"""
     try:
         # Verify room access first
-        with driver.session() as session:
-            room_result = session.run(
-                """
-                MATCH (v:VideoRoom {id: $room_id})
-                WHERE v.token = $token
-                  AND (v.host_id = $user_id OR v.participant_id = $user_id)
-                RETURN v
-                """,
-                room_id=room_id,
-                token=token,
-                user_id=user_id
-            )
-            
-            if not room_result.single():
-                await websocket.close(code=403, reason="Access denied")
-                return
+        room_result = await async_read_query(
+            """
+            MATCH (v:VideoRoom {id: $room_id})
+            WHERE v.token = $token
+              AND (v.host_id = $user_id OR v.participant_id = $user_id)
+            RETURN v.id as id
+            """,
+            {"room_id": room_id, "token": token, "user_id": user_id}
+        )
+        
+        if not room_result:
+            await websocket.close(code=403, reason="Access denied")
+            return
         
-        await video_manager.join_room(websocket, room_id, user_id, user_role)
+        outbox = await video_manager.join_room(websocket, room_id, user_id, user_role)
         
         try:
             while True:
@@ -289,37 +329,21 @@ async def video_room_websocket(
                         exclude_user=user_id
                     )
                 elif message_data["type"] == "chat":
-                    # Save chat message
-                    with driver.session() as session:
-                        session.run(
-                            """
-                            MATCH (v:VideoRoom {id: $room_id})
-                            CREATE (m:VideoRoomMessage {
-                                id: randomUUID(),
-                                room_id: $room_id,
-                                sender_id: $user_id,
-                                message: $message,
-                                timestamp: datetime()
-                            })
-                            CREATE (v)-[:HAS_MESSAGE]->(m)
-                            """,
-                            room_id=room_id,
-                            user_id=user_id,
-                            message=message_data["message"]
-                        )
+                    # Saved in the background, batched with other rooms' messages
+                    chat = chat_buffer.add(room_id, user_id, message_data["message"])
                     
                     await video_manager.broadcast_to_room(
                         json.dumps({
                             "type": "chat",
                             "from": user_id,
                             "message": message_data["message"],
-                            "timestamp": datetime.now().isoformat()
+                            "timestamp": chat["timestamp"]
                         }),
                         room_id
                     )
                 
         except WebSocketDisconnect:
-            video_manager.leave_room(user_id)
+            video_manager.leave_room(user_id, outbox=outbox)
     
     except Exception as e:
         await websocket.close(code=500, reason=str(e))
@@ -332,71 +356,76 @@ def update_room_status(
 ):
     """Update video room status"""
     try:
-        with driver.session() as session:
-            # Check access permissions
-            access_result = session.run(
-                """
-                MATCH (v:VideoRoom {id: $room_id})
-                WHERE v.host_id = $user_id OR v.participant_id = $user_id
-                RETURN v
-                """,
-                room_id=room_id,
-                user_id=current_user["id"]
-            )
-            
-            if not access_result.single():
-                raise HTTPException(status_code=403, detail="Access denied")
-            
-            # Build update query
-            set_clauses = ["v.updated_at = datetime()"]
-            params = {"room_id": room_id}
-            
-            if update_data.status:
-                set_clauses.append("v.status = $status")
-                params["status"] = update_data.status
-                
-                # Add timestamps for status changes
-                if update_data.status == "active":
-                    set_clauses.append("v.started_at = datetime()")
-                elif update_data.status == "ended":
-                    set_clauses.append("v.ended_at = datetime()")
-            
-            if update_data.actual_duration is not None:
-                set_clauses.append("v.actual_duration = $actual_duration")
-                params["actual_duration"] = update_data.actual_duration
-            
-            if update_data.recording_url:
-                set_clauses.append("v.recording_url = $recording_url")
-                params["recording_url"] = update_data.recording_url
-            
-            if update_data.summary:
-                set_clauses.append("v.summary = $summary")
-                params["summary"] = update_data.summary
-            
-            update_query = f"""
-            MATCH (v:VideoRoom {{id: $room_id}})
-            SET {', '.join(set_clauses)}
-            RETURN v
+        # Check access permissions
+        access_result = read_query(
             """
+            MATCH (v:VideoRoom {id: $room_id})
+            WHERE v.host_id = $user_id OR v.participant_id = $user_id
+            RETURN v
+            """,
+            {
+                "room_id": room_id,
+                "user_id": current_user["id"]
+            }
+        )
+        
+        if not access_result:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        # Build update query
+        set_clauses = ["v.updated_at = datetime()"]
+        params = {"room_id": room_id}
+        
+        if update_data.status:
+            set_clauses.append("v.status = $status")
+            params["status"] = update_data.status
+            
+            # Add timestamps for status changes
+            if update_data.status == "active":
+                set_clauses.append("v.started_at = datetime()")
+            elif update_data.status == "ended":
+                set_clauses.append("v.ended_at = datetime()")
+        
+        if update_data.actual_duration is not None:
+            set_clauses.append("v.actual_duration = $actual_duration")
+            params["actual_duration"] = update_data.actual_duration
+        
+        if update_data.recording_url:
+            set_clauses.append("v.recording_url = $recording_url")
+            params["recording_url"] = update_data.recording_url
+        
+        if update_data.summary:
+            set_clauses.append("v.summary = $summary")
+            params["summary"] = update_data.summary
+        
+        update_query = f"""
+        MATCH (v:VideoRoom {{id: $room_id}})
+        SET {', '.join(set_clauses)}
+        RETURN v
+        """
+        
+        result = write_query(update_query, params)
+        
+        updated_room = result[0] if result else None
+        if updated_room:
+            room_dict = dict(updated_room["v"])
+            # Convert datetime fields
+            for field in ['created_at', 'updated_at', 'started_at', 'ended_at']:
+                if field in room_dict and room_dict[field]:
+                    room_dict[field] = str(room_dict[field])
             
-            result = session.run(update_query, params)
-            
-            updated_room = result.single()
-            if updated_room:
-                room_dict = dict(updated_room["v"])
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at', 'started_at', 'ended_at']:
-                    if field in room_dict and room_dict[field]:
-                        room_dict[field] = str(room_dict[field])
-                
-                return {
-                    "success": True,
-                    "message": "Room status updated successfully",
-                    "room": room_dict
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to update room")
+            return {
+                "success": True,
+                "message": "Room status updated successfully",
+                "room": room_dict
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to update room")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -404,56 +433,76 @@ def update_room_status(
 def get_my_video_rooms(
     current_user: dict = Depends(get_current_user),
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
     limit: int = 20
 ):
-    """Get video rooms for current user"""
+    """Get video rooms for current user, newest first, one page per cursor"""
     try:
-        with driver.session() as session:
-            query = """
-            MATCH (v:VideoRoom)
-            WHERE v.host_id = $user_id OR v.participant_id = $user_id
-            """
-            
-            params = {"user_id": current_user["id"], "limit": limit}
-            
-            if status:
-                query += " AND v.status = $status"
-                params["status"] = status
-            
-            query += """
-            OPTIONAL MATCH (h:User {id: v.host_id})
-            OPTIONAL MATCH (p:User {id: v.participant_id})
-            OPTIONAL MATCH (c:Consultation {id: v.consultation_id})
-            OPTIONAL MATCH (a:Appointment {id: v.appointment_id})
-            RETURN v, h.email as host_email, p.email as participant_email, c, a
-            ORDER BY v.created_at DESC
-            LIMIT $limit
-            """
-            
-            result = session.run(query, params)
-            
-            rooms = []
-            for record in result:
-                room = dict(record["v"])
-                # Convert datetime fields
-                for field in ['created_at', 'updated_at', 'started_at', 'ended_at']:
-                    if field in room and room[field]:
-                        room[field] = str(room[field])
-                
-                consultation = dict(record["c"]) if record["c"] else None
-                appointment = dict(record["a"]) if record["a"] else None
-                
-                rooms.append({
-                    "room": room,
-                    "host_email": record["host_email"],
-                    "participant_email": record["participant_email"],
-                    "consultation": consultation,
-                    "appointment": appointment,
-                    "is_host": room["host_id"] == current_user["id"]
-                })
-            
-            return {"rooms": rooms}
-            
+        # One extra row tells us whether there is a next page
+        params = {"user_id": current_user["id"], "limit": limit + 1}
+        
+        conditions = []
+        if status:
+            conditions.append("v.status = $status")
+            params["status"] = status
+        
+        after_cursor = keyset_condition(cursor, "v.created_at", "v.id", params)
+        if after_cursor:
+            conditions.append(after_cursor)
+        
+        filters = "WHERE " + " AND ".join(conditions) if conditions else ""
+        
+        # Hosted and joined rooms are separate index seeks; each branch only
+        # needs its own first page before the union is merged
+        query = f"""
+        CALL {{
+            MATCH (v:VideoRoom {{host_id: $user_id}})
+            {filters}
+            RETURN v ORDER BY v.created_at DESC, v.id DESC LIMIT $limit
+            UNION
+            MATCH (v:VideoRoom {{participant_id: $user_id}})
+            {filters}
+            RETURN v ORDER BY v.created_at DESC, v.id DESC LIMIT $limit
+        }}
+        WITH v
+        ORDER BY v.created_at DESC, v.id DESC
+        LIMIT $limit
+        OPTIONAL MATCH (h:User {{id: v.host_id}})
+        OPTIONAL MATCH (p:User {{id: v.participant_id}})
+        OPTIONAL MATCH (c:Consultation {{id: v.consultation_id}})
+        OPTIONAL MATCH (a:Appointment {{id: v.appointment_id}})
+        RETURN v, h.email as host_email, p.email as participant_email, c, a
+        ORDER BY v.created_at DESC, v.id DESC
+        """
+        
+        records, next_cursor = split_page(read_query(query, params), limit, "v")
+        
+        rooms = []
+        for record in records:
+            room = dict(record["v"])
+            # Convert datetime fields
+            for field in ['created_at', 'updated_at', 'started_at', 'ended_at']:
+                if field in room and room[field]:
+                    room[field] = str(room[field])
+            
+            consultation = dict(record["c"]) if record["c"] else None
+            appointment = dict(record["a"]) if record["a"] else None
+            
+            rooms.append({
+                "room": room,
+                "host_email": record["host_email"],
+                "participant_email": record["participant_email"],
+                "consultation": consultation,
+                "appointment": appointment,
+                "is_host": room["host_id"] == current_user["id"]
+            })
+        
+        return {"rooms": rooms, "next_cursor": next_cursor}
+        
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -465,35 +514,40 @@ def send_video_invite(
 ):
     """Send video conference invitation"""
     try:
-        with driver.session() as session:
-            # Get room details
-            room_result = session.run(
-                """
-                MATCH (v:VideoRoom {id: $room_id})
-                WHERE v.host_id = $user_id
-                RETURN v
-                """,
-                room_id=room_id,
-                user_id=current_user["id"]
-            )
-            
-            room_record = room_result.single()
-            if not room_record:
-                raise HTTPException(status_code=403, detail="Only room host can send invitations")
-            
-            room = dict(room_record["v"])
-            
-            # Send invitation notification
-            # TODO: Integrate with notification system
-            invitation_message = invite_message or f"You're invited to a video consultation. Join at your scheduled time."
-            
-            return {
-                "success": True,
-                "message": "Invitation sent successfully",
-                "join_url": f"/video/room/{room_id}?token={room['token']}",
-                "room_id": room_id
+        # Get room details
+        room_result = read_query(
+            """
+            MATCH (v:VideoRoom {id: $room_id})
+            WHERE v.host_id = $user_id
+            RETURN v
+            """,
+            {
+                "room_id": room_id,
+                "user_id": current_user["id"]
             }
-            
+        )
+        
+        room_record = room_result[0] if room_result else None
+        if not room_record:
+            raise HTTPException(status_code=403, detail="Only room host can send invitations")
+        
+        room = dict(room_record["v"])
+        
+        # Send invitation notification
+        # TODO: Integrate with notification system
+        invitation_message = invite_message or f"You're invited to a video consultation. Join at your scheduled time."
+        
+        return {
+            "success": True,
+            "message": "Invitation sent successfully",
+            "join_url": f"/video/room/{room_id}?token={room['token']}",
+            "room_id": room_id
+        }
+            
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -504,41 +558,46 @@ def get_room_messages(
 ):
     """Get chat messages from video room"""
     try:
-        with driver.session() as session:
-            # Check access
-            access_result = session.run(
-                """
-                MATCH (v:VideoRoom {id: $room_id})
-                WHERE v.host_id = $user_id OR v.participant_id = $user_id
-                RETURN v
-                """,
-                room_id=room_id,
-                user_id=current_user["id"]
-            )
-            
-            if not access_result.single():
-                raise HTTPException(status_code=403, detail="Access denied")
-            
-            # Get messages
-            messages_result = session.run(
-                """
-                MATCH (v:VideoRoom {id: $room_id})-[:HAS_MESSAGE]->(m:VideoRoomMessage)
-                OPTIONAL MATCH (u:User {id: m.sender_id})
-                RETURN m, u.email as sender_email
-                ORDER BY m.timestamp ASC
-                """,
-                room_id=room_id
-            )
-            
-            messages = []
-            for record in messages_result:
-                message = dict(record["m"])
-                message['timestamp'] = str(message['timestamp'])
-                message['sender_email'] = record["sender_email"]
-                messages.append(message)
-            
-            return {"messages": messages}
+        # Check access
+        access_result = read_query(
+            """
+            MATCH (v:VideoRoom {id: $room_id})
+            WHERE v.host_id = $user_id OR v.participant_id = $user_id
+            RETURN v
+            """,
+            {
+                "room_id": room_id,
+                "user_id": current_user["id"]
+            }
+        )
+        
+        if not access_result:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        # Get messages
+        messages_result = read_query(
+            """
+            MATCH (v:VideoRoom {id: $room_id})-[:HAS_MESSAGE]->(m:VideoRoomMessage)
+            OPTIONAL MATCH (u:User {id: m.sender_id})
+            RETURN m, u.email as sender_email
+            ORDER BY m.timestamp ASC
+            """,
+            {"room_id": room_id}
+        )
+        
+        messages = []
+        for record in messages_result:
+            message = dict(record["m"])
+            message['timestamp'] = str(message['timestamp'])
+            message['sender_email'] = record["sender_email"]
+            messages.append(message)
+        
+        return {"messages": messages}
             
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -549,75 +608,80 @@ def create_emergency_video_room(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Only patients can create emergency rooms")
     
     try:
-        with driver.session() as session:
-            # Find available emergency doctors
-            available_doctors = session.run(
-                """
-                MATCH (d:Doctor)
-                OPTIONAL MATCH (u:User {id: d.user_id})
-                WHERE u.role = 'doctor' 
-                  AND (d.emergency_available = true OR d.specialization = 'Emergency Medicine')
-                  AND (u.status IS NULL OR u.status = 'active')
-                RETURN d, u
-                ORDER BY d.rating DESC
-                LIMIT 1
-                """
-            )
-            
-            doctor_record = available_doctors.single()
-            if not doctor_record:
-                raise HTTPException(status_code=503, detail="No emergency doctors available right now")
-            
-            doctor = dict(doctor_record["d"])
-            
-            # Create emergency room
-            room_id = str(uuid.uuid4())
-            room_token = secrets.token_urlsafe(32)
+        # Find available emergency doctors
+        available_doctors = read_query(
+            """
+            MATCH (d:Doctor)
+            OPTIONAL MATCH (u:User {id: d.user_id})
+            WHERE u.role = 'doctor' 
+              AND (d.emergency_available = true OR d.specialization = 'Emergency Medicine')
+              AND (u.status IS NULL OR u.status = 'active')
+            RETURN d, u
+            ORDER BY d.rating DESC
+            LIMIT 1
+            """
+        )
+        
+        doctor_record = available_doctors[0] if available_doctors else None
+        if not doctor_record:
+            raise HTTPException(status_code=503, detail="No emergency doctors available right now")
+        
+        doctor = dict(doctor_record["d"])
+        
+        # Create emergency room
+        room_id = str(uuid.uuid4())
+        room_token = secrets.token_urlsafe(32)
+        
+        result = write_query(
+            """
+            CREATE (v:VideoRoom {
+                id: $room_id,
+                token: $room_token,
+                host_id: $patient_id,
+                participant_id: $doctor_id,
+                room_type: 'emergency',
+                duration_minutes: 60,
+                status: 'emergency_pending',
+                priority: 'high',
+                created_at: datetime(),
+                updated_at: datetime()
+            })
+            RETURN v
+            """,
+            {
+                "room_id": room_id,
+                "room_token": room_token,
+                "patient_id": current_user["id"],
+                "doctor_id": doctor["user_id"]
+            }
+        )
+        
+        room_record = result[0] if result else None
+        if room_record:
+            room_dict = dict(room_record["v"])
+            room_dict['created_at'] = str(room_dict['created_at'])
+            room_dict['updated_at'] = str(room_dict['updated_at'])
             
-            result = session.run(
-                """
-                CREATE (v:VideoRoom {
-                    id: $room_id,
-                    token: $room_token,
-                    host_id: $patient_id,
-                    participant_id: $doctor_id,
-                    room_type: 'emergency',
-                    duration_minutes: 60,
-                    status: 'emergency_pending',
-                    priority: 'high',
-                    created_at: datetime(),
-                    updated_at: datetime()
-                })
-                RETURN v
-                """,
-                room_id=room_id,
-                room_token=room_token,
-                patient_id=current_user["id"],
-                doctor_id=doctor["user_id"]
-            )
+            # TODO: Send urgent notification to doctor
             
-            room_record = result.single()
-            if room_record:
-                room_dict = dict(room_record["v"])
-                room_dict['created_at'] = str(room_dict['created_at'])
-                room_dict['updated_at'] = str(room_dict['updated_at'])
-                
-                # TODO: Send urgent notification to doctor
-                
-                return {
-                    "success": True,
-                    "message": "Emergency video room created. Doctor will be notified immediately.",
-                    "room": room_dict,
-                    "assigned_doctor": {
-                        "name": doctor.get("full_name", "Emergency Doctor"),
-                        "specialization": doctor.get("specialization", "Emergency Medicine")
-                    },
-                    "estimated_response": "2-5 minutes",
-                    "join_url": f"/video/room/{room_id}?token={room_token}"
-                }
-            else:
-                raise HTTPException(status_code=500, detail="Failed to create emergency room")
+            return {
+                "success": True,
+                "message": "Emergency video room created. Doctor will be notified immediately.",
+                "room": room_dict,
+                "assigned_doctor": {
+                    "name": doctor.get("full_name", "Emergency Doctor"),
+                    "specialization": doctor.get("specialization", "Emergency Medicine")
+                },
+                "estimated_response": "2-5 minutes",
+                "join_url": f"/video/room/{room_id}?token={room_token}"
+            }
+        else:
+            raise HTTPException(status_code=500, detail="Failed to create emergency room")
                 
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -628,34 +692,39 @@ def get_room_recording(
 ):
     """Get recording of video session (if available)"""
     try:
-        with driver.session() as session:
-            # Check access and get recording info
-            result = session.run(
-                """
-                MATCH (v:VideoRoom {id: $room_id})
-                WHERE v.host_id = $user_id OR v.participant_id = $user_id
-                RETURN v.recording_url as recording_url, v.status as status
-                """,
-                room_id=room_id,
-                user_id=current_user["id"]
-            )
-            
-            record = result.single()
-            if not record:
-                raise HTTPException(status_code=403, detail="Access denied")
-            
-            if not record["recording_url"]:
-                return {
-                    "available": False,
-                    "message": "No recording available for this session"
-                }
-            
+        # Check access and get recording info
+        result = read_query(
+            """
+            MATCH (v:VideoRoom {id: $room_id})
+            WHERE v.host_id = $user_id OR v.participant_id = $user_id
+            RETURN v.recording_url as recording_url, v.status as status
+            """,
+            {
+                "room_id": room_id,
+                "user_id": current_user["id"]
+            }
+        )
+        
+        record = result[0] if result else None
+        if not record:
+            raise HTTPException(status_code=403, detail="Access denied")
+        
+        if not record["recording_url"]:
             return {
-                "available": True,
-                "recording_url": record["recording_url"],
-                "status": record["status"]
+                "available": False,
+                "message": "No recording available for this session"
             }
-            
+        
+        return {
+            "available": True,
+            "recording_url": record["recording_url"],
+            "status": record["status"]
+        }
+            
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -663,43 +732,46 @@ def get_room_recording(
 def get_video_usage_stats(current_user: dict = Depends(get_current_user)):
     """Get video conference usage statistics"""
     try:
-        with driver.session() as session:
-            if current_user["role"] == "admin":
-                # Admin gets platform-wide stats
-                result = session.run(
-                    """
-                    MATCH (v:VideoRoom)
-                    RETURN 
-                        count(v) as total_rooms,
-                        count(CASE WHEN v.status = 'completed' THEN 1 END) as completed_sessions,
-                        count(CASE WHEN v.room_type = 'emergency' THEN 1 END) as emergency_sessions,
-                        avg(v.actual_duration) as avg_duration_minutes
-                    """
-                )
-            else:
-                # Users get their own stats
-                result = session.run(
-                    """
-                    MATCH (v:VideoRoom)
-                    WHERE v.host_id = $user_id OR v.participant_id = $user_id
-                    RETURN 
-                        count(v) as total_rooms,
-                        count(CASE WHEN v.status = 'completed' THEN 1 END) as completed_sessions,
-                        count(CASE WHEN v.room_type = 'emergency' THEN 1 END) as emergency_sessions,
-                        avg(v.actual_duration) as avg_duration_minutes
-                    """,
-                    user_id=current_user["id"]
-                )
-            
-            stats = result.single()
-            return {
-                "video_stats": {
-                    "total_sessions": stats["total_rooms"] if stats else 0,
-                    "completed_sessions": stats["completed_sessions"] if stats else 0,
-                    "emergency_sessions": stats["emergency_sessions"] if stats else 0,
-                    "avg_duration_minutes": round(float(stats["avg_duration_minutes"]), 2) if stats and stats["avg_duration_minutes"] else 0
-                }
+        if current_user["role"] == "admin":
+            # Admin gets platform-wide stats
+            result = read_query(
+                """
+                MATCH (v:VideoRoom)
+                RETURN 
+                    count(v) as total_rooms,
+                    count(CASE WHEN v.status = 'completed' THEN 1 END) as completed_sessions,
+                    count(CASE WHEN v.room_type = 'emergency' THEN 1 END) as emergency_sessions,
+                    avg(v.actual_duration) as avg_duration_minutes
+                """
+            )
+        else:
+            # Users get their own stats
+            result = read_query(
+                """
+                MATCH (v:VideoRoom)
+                WHERE v.host_id = $user_id OR v.participant_id = $user_id
+                RETURN 
+                    count(v) as total_rooms,
+                    count(CASE WHEN v.status = 'completed' THEN 1 END) as completed_sessions,
+                    count(CASE WHEN v.room_type = 'emergency' THEN 1 END) as emergency_sessions,
+                    avg(v.actual_duration) as avg_duration_minutes
+                """,
+                {"user_id": current_user["id"]}
+            )
+        
+        stats = result[0] if result else None
+        return {
+            "video_stats": {
+                "total_sessions": stats["total_rooms"] if stats else 0,
+                "completed_sessions": stats["completed_sessions"] if stats else 0,
+                "emergency_sessions": stats["emergency_sessions"] if stats else 0,
+                "avg_duration_minutes": round(float(stats["avg_duration_minutes"]), 2) if stats and stats["avg_duration_minutes"] else 0
             }
+        }
             
+    except HTTPException:
+        raise
+    except DATABASE_UNAVAILABLE_ERRORS:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,364 @@
+"""Pre-aggregated counters behind the admin analytics dashboard.
+
+Counters live on small (:AnalyticsRollup {key}) nodes, one per entity,
+metric and period:
+
+    user|role:patient|total            - users per role
+    consultation|status:pending|total  - consultations per status
+    consultation|response_seconds|total, consultation|responses|total
+    appointment|created|2024-05-01     - entities created that (UTC) day
+    payment|count|total, payment|amount|total
+
+Write paths record their change (created, status changed) here. Changes are
+summed in memory and written every ANALYTICS_FLUSH_SECONDS with one UNWIND
+query, so busy endpoints never queue up on the same counter node. A
+reconciliation pass recomputes every counter from the graph every
+ANALYTICS_RECONCILE_SECONDS; it corrects drift from crashed workers, writes
+made outside these paths (payments have no write path yet) and rollups
+added after the data existed.
+
+Every write path stamps its own transaction with stamp_epoch, which writes
+one of EPOCH_STRIPES (:AnalyticsEpoch) nodes - taking its lock until commit -
+and tags the change with the epoch read there. Only the worker holding the
+lease on the (:AnalyticsReconcile) node reconciles, in one transaction that
+bumps the epoch on every stripe and then recounts. It waits for writes that
+were stamped before it, and so counts them, while writes stamped after it
+wait for it and carry the new epoch. A flush drops deltas from an older
+epoch than the last reconcile's, because that recount already includes
+them. Flushes and reconciles both lock the reconcile node first, so a flush
+lands wholly before or after a reconcile. Writers of users, consultations
+and appointments wait for the recount while it runs.
+
+Doctors carry their own consultations_answered counter, kept in the respond
+transaction, for the dashboard's top doctors.
+"""
+import asyncio
+import math
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from config.settings import ANALYTICS_FLUSH_SECONDS, ANALYTICS_RECONCILE_SECONDS
+from database.async_connection import read_query, write_query, write_transaction
+
+# Days of daily counters kept by reconciliation and read by the dashboard
+ROLLUP_DAYS = 30
+
+ROLLED_UP_LABELS = {"user": "User", "consultation": "Consultation", "appointment": "Appointment"}
+
+# (:AnalyticsEpoch {stripe}) nodes, seeded by schema migration 10. Writers
+# pick one at random, so they rarely contend with each other for a stripe
+EPOCH_STRIPES = 16
+
+# Setting the epoch to itself takes the stripe's write lock until commit.
+# Until migration 10 or the first reconcile there is no stripe, and changes
+# belong to epoch 0.
+STAMP_EPOCH_QUERY = """
+OPTIONAL MATCH (e:AnalyticsEpoch {stripe: $stripe})
+SET e.epoch = e.epoch
+RETURN coalesce(e.epoch, 0) as epoch, toString(date()) as day
+"""
+
+# Deltas from before the last reconcile's epoch are already in its recount
+INCREMENT_QUERY = """
+MERGE (f:AnalyticsReconcile {key: 'reconcile'})
+SET f.flushed_at = datetime()
+WITH coalesce(f.epoch, 0) as epoch
+UNWIND $deltas as delta
+WITH delta WHERE delta.epoch >= epoch
+MERGE (r:AnalyticsRollup {key: delta.key})
+ON CREATE SET r.entity = delta.entity, r.metric = delta.metric, r.period = delta.period, r.value = 0
+SET r.value = r.value + delta.amount, r.updated_at = datetime()
+"""
+
+# Takes the lock on the reconcile node before checking the lease
+ACQUIRE_LEASE_QUERY = """
+MERGE (f:AnalyticsReconcile {key: 'reconcile'})
+SET f.lease_checked_at = datetime()
+WITH f
+WHERE f.holder IS NULL OR f.holder = $holder OR f.lease_until < datetime()
+SET f.holder = $holder, f.lease_until = datetime() + duration({seconds: $lease_seconds})
+RETURN f.holder as holder
+"""
+
+RELEASE_LEASE_QUERY = """
+MATCH (f:AnalyticsReconcile {key: 'reconcile', holder: $holder})
+REMOVE f.holder, f.lease_until
+"""
+
+# Stops if the lease was lost since it was acquired
+NEXT_EPOCH_QUERY = """
+MATCH (f:AnalyticsReconcile {key: 'reconcile', holder: $holder})
+SET f.epoch = coalesce(f.epoch, 0) + 1
+RETURN f.epoch as epoch
+"""
+
+# Waits for every stamped write in flight; later ones wait for the commit
+LOCK_STRIPES_QUERY = """
+UNWIND range(0, $stripes - 1) as stripe
+MERGE (e:AnalyticsEpoch {stripe: stripe})
+SET e.epoch = $epoch
+"""
+
+OVERWRITE_QUERY = """
+UNWIND $rows as row
+MERGE (r:AnalyticsRollup {key: row.key})
+SET r.entity = row.entity, r.metric = row.metric, r.period = row.period, r.value = row.amount,
+    r.updated_at = datetime(), r.reconciled_at = datetime()
+WITH count(*) as written
+MATCH (r:AnalyticsRollup)
+WHERE (r.period = 'total' OR r.period >= $since) AND NOT r.key IN $keys
+SET r.value = 0, r.reconciled_at = datetime()
+"""
+
+READ_QUERY = """
+MATCH (r:AnalyticsRollup)
+WHERE r.period = 'total' OR r.period >= $since
+RETURN r.entity as entity, r.metric as metric, r.period as period, r.value as value
+"""
+
+TOP_DOCTORS_QUERY = """
+MATCH (d:Doctor)
+WHERE d.consultations_answered > 0
+WITH d ORDER BY d.consultations_answered DESC LIMIT $limit
+OPTIONAL MATCH (u:User {id: d.user_id})
+RETURN d, u, d.consultations_answered as consultation_count
+"""
+
+RECONCILE_DOCTORS_QUERY = """
+MATCH (d:Doctor)
+OPTIONAL MATCH (d)-[:RESPONDED_TO]->(c:Consultation)
+WITH d, count(c) as answered
+WHERE coalesce(d.consultations_answered, 0) <> answered
+SET d.consultations_answered = answered
+"""
+
+# (entity, metric, value) rows of the full recount
+RECOUNT_QUERIES = [
+    """
+    MATCH (u:User)
+    RETURN 'user' as entity, 'role:' + coalesce(u.role, 'unknown') as metric, count(u) as value
+    """,
+    """
+    MATCH (c:Consultation)
+    RETURN 'consultation' as entity, 'status:' + coalesce(c.status, 'unknown') as metric, count(c) as value
+    """,
+    """
+    MATCH (c:Consultation)
+    WHERE c.answered_at IS NOT NULL AND c.created_at IS NOT NULL
+    WITH duration.inSeconds(c.created_at, c.answered_at).seconds as seconds
+    UNWIND [['response_seconds', seconds], ['responses', 1]] as metric
+    RETURN 'consultation' as entity, metric[0] as metric, sum(metric[1]) as value
+    """,
+    """
+    MATCH (a:Appointment)
+    RETURN 'appointment' as entity, 'status:' + coalesce(a.status, 'unknown') as metric, count(a) as value
+    """,
+    """
+    MATCH (p:Payment)
+    UNWIND [['count', 1], ['amount', coalesce(p.amount, 0)]] as metric
+    RETURN 'payment' as entity, metric[0] as metric, sum(metric[1]) as value
+    """,
+]
+
+DAILY_RECOUNT_QUERY = """
+MATCH (n:{label})
+WHERE n.created_at >= datetime($since)
+RETURN toString(date(n.created_at)) as day, count(n) as value
+"""
+
+RollupKey = Tuple[str, str, str]
+# A rollup key and the epoch its changes belong to
+DeltaKey = Tuple[RollupKey, int]
+
+class RollupStamp(NamedTuple):
+    """The epoch and (UTC) day of a write, read inside its transaction"""
+    epoch: int
+    day: str
+
+def stamp_epoch(tx) -> RollupStamp:
+    """Tie the changes of a write to an epoch; call inside its transaction"""
+    record = tx.run(STAMP_EPOCH_QUERY, {"stripe": random.randrange(EPOCH_STRIPES)}).single()
+    return RollupStamp(record["epoch"], record["day"])
+
+async def stamp_epoch_async(tx) -> RollupStamp:
+    result = await tx.run(STAMP_EPOCH_QUERY, {"stripe": random.randrange(EPOCH_STRIPES)})
+    record = await result.single()
+    return RollupStamp(record["epoch"], record["day"])
+
+def _window_start() -> str:
+    return (datetime.now(timezone.utc).date() - timedelta(days=ROLLUP_DAYS - 1)).isoformat()
+
+def _row(key: RollupKey, amount) -> dict:
+    entity, metric, period = key
+    return {"key": f"{entity}|{metric}|{period}", "entity": entity, "metric": metric, "period": period, "amount": amount}
+
+async def _reconcile(tx, holder: str, since: str) -> Optional[int]:
+    """Bump the epoch, recount and overwrite every counter; None without the lease"""
+    record = await (await tx.run(NEXT_EPOCH_QUERY, {"holder": holder})).single()
+    if record is None:
+        return None
+    epoch = record["epoch"]
+    await (await tx.run(LOCK_STRIPES_QUERY, {"stripes": EPOCH_STRIPES, "epoch": epoch})).consume()
+
+    rows = []
+    for query in RECOUNT_QUERIES:
+        async for record in await tx.run(query):
+            rows.append(_row((record["entity"], record["metric"], "total"), record["value"]))
+    for entity, label in ROLLED_UP_LABELS.items():
+        async for record in await tx.run(DAILY_RECOUNT_QUERY.replace("{label}", label), {"since": since}):
+            rows.append(_row((entity, "created", record["day"]), record["value"]))
+
+    await (await tx.run(OVERWRITE_QUERY, {
+        "rows": rows, "keys": [row["key"] for row in rows], "since": since
+    })).consume()
+    return epoch
+
+class AnalyticsRollups:
+    """Sums counter changes in memory and writes them in batches"""
+
+    def __init__(
+        self,
+        flush_interval: float = ANALYTICS_FLUSH_SECONDS,
+        reconcile_interval: float = ANALYTICS_RECONCILE_SECONDS
+    ):
+        self.flush_interval = flush_interval
+        self.reconcile_interval = reconcile_interval
+        self._deltas: Dict[DeltaKey, int] = defaultdict(int)
+        # Sync endpoints record from FastAPI's threadpool
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def created(self, stamp: RollupStamp, entity: str, status: Optional[str] = None, role: Optional[str] = None):
+        """Record a new user, consultation or appointment"""
+        with self._lock:
+            self._deltas[((entity, "created", stamp.day), stamp.epoch)] += 1
+            if status is not None:
+                self._deltas[((entity, f"status:{status}", "total"), stamp.epoch)] += 1
+            if role is not None:
+                self._deltas[((entity, f"role:{role}", "total"), stamp.epoch)] += 1
+
+    def status_changed(self, stamp: RollupStamp, entity: str, old_status: Optional[str], new_status: Optional[str]):
+        if old_status == new_status:
+            return
+        with self._lock:
+            self._deltas[((entity, f"status:{old_status or 'unknown'}", "total"), stamp.epoch)] -= 1
+            self._deltas[((entity, f"status:{new_status or 'unknown'}", "total"), stamp.epoch)] += 1
+
+    def consultation_answered(self, stamp: RollupStamp, response_seconds: Optional[int]):
+        """Record a consultation's first answer and how long it waited for it"""
+        if response_seconds is None:
+            return
+        with self._lock:
+            self._deltas[(("consultation", "response_seconds", "total"), stamp.epoch)] += response_seconds
+            self._deltas[(("consultation", "responses", "total"), stamp.epoch)] += 1
+
+    def _take(self) -> Dict[DeltaKey, int]:
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(int)
+        return deltas
+
+    def _restore(self, deltas: Dict[DeltaKey, int]):
+        with self._lock:
+            for key, amount in deltas.items():
+                self._deltas[key] += amount
+
+    async def flush(self):
+        """Write the changes recorded so far"""
+        async with self._flush_lock:
+            deltas = self._take()
+            # Sorted, so workers flushing at once lock the counter nodes in the same order
+            rows = [
+                {**_row(key, amount), "epoch": epoch}
+                for (key, epoch), amount in sorted(deltas.items()) if amount
+            ]
+            if not rows:
+                return
+            try:
+                await write_query(INCREMENT_QUERY, {"deltas": rows})
+            except (Exception, asyncio.CancelledError):
+                self._restore(deltas)
+                raise
+
+    async def acquire_lease(self) -> bool:
+        """Become (or stay) the reconciling worker until two intervals from now"""
+        records = await write_query(ACQUIRE_LEASE_QUERY, {
+            "holder": self._holder, "lease_seconds": math.ceil(2 * self.reconcile_interval)
+        })
+        return bool(records)
+
+    async def reconcile(self) -> bool:
+        """Recompute every counter from the graph, if this worker holds the lease
+
+        Returns whether it reconciled.
+        """
+        if not await self.acquire_lease():
+            return False
+        if await write_transaction(_reconcile, self._holder, _window_start()) is None:
+            return False
+        await write_query(RECONCILE_DOCTORS_QUERY)
+        return True
+
+    async def read(self) -> dict:
+        """Totals and the last ROLLUP_DAYS daily counters as {entity: {metric: value}}
+
+        Daily counters are summed per metric into "<metric>_last_<n>_days".
+        """
+        rollups = defaultdict(dict)
+        for record in await read_query(READ_QUERY, {"since": _window_start()}):
+            metrics = rollups[record["entity"]]
+            if record["period"] == "total":
+                metrics[record["metric"]] = metrics.get(record["metric"], 0) + record["value"]
+            else:
+                name = f"{record['metric']}_last_{ROLLUP_DAYS}_days"
+                metrics[name] = metrics.get(name, 0) + record["value"]
+        return rollups
+
+    async def top_doctors(self, limit: int = 10):
+        return await read_query(TOP_DOCTORS_QUERY, {"limit": limit})
+
+    async def _run(self):
+        # Reconcile once at startup, then on the interval
+        next_reconcile = time.monotonic()
+        while True:
+            try:
+                if time.monotonic() >= next_reconcile:
+                    next_reconcile = time.monotonic() + self.reconcile_interval
+                    if not await self.reconcile():
+                        await self.flush()
+                else:
+                    await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Analytics rollup update failed: {e}")
+            await asyncio.sleep(self.flush_interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the background task and write what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+            await write_query(RELEASE_LEASE_QUERY, {"holder": self._holder})
+        except Exception:
+            pass
+
+analytics_rollups = AnalyticsRollups()
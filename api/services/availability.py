@@ -0,0 +1,296 @@
+"""Doctor availability computed from booked intervals.
+
+Each doctor's schedule keeps, per date, a sorted list of booked [start, end)
+minute intervals. Free time is the working window minus the merged bookings,
+and a slot is available when it fits entirely inside a free gap, so
+appointments of any duration block exactly the slots they overlap.
+
+Schedules are cached per doctor together with the doctor's booking_version,
+which every booking, cancellation and status update bumps in the same
+transaction. A read compares the cached version with the live one (fetched
+for all requested doctors in one query) and reloads only stale schedules;
+bookings made in this process are applied to the cache incrementally.
+"""
+import bisect
+import heapq
+import threading
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional
+
+from config.settings import AVAILABILITY_CACHE_MAX_DOCTORS
+from database.connection import read_query
+from services.slot_reservation import ACTIVE_APPOINTMENT_STATUSES, DEFAULT_DURATION_MINUTES
+
+SLOT_MINUTES = 30
+# Slot grids cached per doctor, least recently used first out; one 30-day
+# availability window fits
+MAX_CACHED_DAYS = 31
+DEFAULT_AVAILABLE_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+DEFAULT_AVAILABLE_HOURS = "09:00-17:00"
+
+DOCTOR_SCHEDULES_QUERY = """
+UNWIND $doctor_ids as doctor_id
+MATCH (d:Doctor {user_id: doctor_id})
+RETURN d.user_id as doctor_id,
+       coalesce(d.booking_version, 0) as booking_version,
+       d.available_days as available_days,
+       d.available_hours as available_hours
+"""
+
+BOOKED_INTERVALS_QUERY = """
+UNWIND $ranges as range
+MATCH (a:Appointment {doctor_id: range.doctor_id})
+WHERE a.appointment_date >= range.start_date
+  AND a.appointment_date <= range.end_date
+  AND a.status IN $active_statuses
+RETURN a.doctor_id as doctor_id,
+       a.appointment_date as date,
+       a.appointment_time as time,
+       a.start_minute as start_minute,
+       a.end_minute as end_minute,
+       a.duration_minutes as duration_minutes
+"""
+
+def _minute_of_day(time_str: str) -> int:
+    hours, minutes = time_str.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+def _time_str(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+def parse_working_hours(available_hours: Optional[str]):
+    """(start, end) minute of the working day from an "HH:MM-HH:MM" string"""
+    try:
+        start, end = (available_hours or DEFAULT_AVAILABLE_HOURS).split("-")
+        return _minute_of_day(start.strip()), _minute_of_day(end.strip())
+    except ValueError:
+        return parse_working_hours(DEFAULT_AVAILABLE_HOURS)
+
+def booked_interval(row) -> tuple:
+    """[start, end) minutes of an appointment row, deriving them for older appointments"""
+    start = row["start_minute"]
+    if start is None:
+        start = _minute_of_day(row["time"])
+    end = row["end_minute"]
+    if end is None:
+        end = start + (row["duration_minutes"] or DEFAULT_DURATION_MINUTES)
+    return start, end
+
+def free_gaps(window_start: int, window_end: int, booked: List[tuple]) -> List[tuple]:
+    """The parts of [window_start, window_end) not covered by the sorted booked intervals"""
+    gaps = []
+    cursor = window_start
+    for start, end in booked:
+        if end <= cursor:
+            continue
+        if start >= window_end:
+            break
+        if start > cursor:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < window_end:
+        gaps.append((cursor, window_end))
+    return gaps
+
+class DoctorSchedule:
+    """Booked intervals of one doctor at one booking_version"""
+
+    __slots__ = ("version", "profile_key", "available_days", "working_hours", "booked", "loaded_dates", "_days", "_lock")
+
+    def __init__(self, version: int, available_days, available_hours, lock: Optional[threading.Lock] = None):
+        self.version = version
+        self.profile_key = (tuple(available_days or ()), available_hours)
+        self.available_days = set(available_days or DEFAULT_AVAILABLE_DAYS)
+        self.working_hours = parse_working_hours(available_hours)
+        self.booked: Dict[str, List[tuple]] = {}
+        self.loaded_dates = set()
+        self._days: "OrderedDict[str, dict]" = OrderedDict()
+        # The owning engine's lock, which book() and add_loaded() already run under
+        self._lock = lock or threading.Lock()
+
+    def is_current(self, version: int, available_days, available_hours) -> bool:
+        return self.version == version and self.profile_key == (tuple(available_days or ()), available_hours)
+
+    def add_loaded(self, dates, intervals_by_date):
+        for date_str in dates:
+            self.loaded_dates.add(date_str)
+            self.booked[date_str] = sorted(intervals_by_date.get(date_str, ()))
+            self._days.pop(date_str, None)
+
+    def book(self, date_str: str, interval: tuple):
+        if date_str in self.loaded_dates:
+            bisect.insort(self.booked.setdefault(date_str, []), interval)
+            self._days.pop(date_str, None)
+
+    def day(self, day: date) -> Optional[dict]:
+        """The day's slot grid, or None when the doctor doesn't work that day"""
+        day_name = day.strftime("%A")
+        if day_name not in self.available_days:
+            return None
+        date_str = day.strftime("%Y-%m-%d")
+        # Built and stored under the engine lock, so a concurrent book() or
+        # add_loaded() cannot leave a grid of the old bookings in the cache
+        with self._lock:
+            cached = self._days.get(date_str)
+            if cached is None:
+                cached = self._build_day(date_str, day_name)
+                self._days[date_str] = cached
+                if len(self._days) > MAX_CACHED_DAYS:
+                    self._days.popitem(last=False)
+            else:
+                self._days.move_to_end(date_str)
+        return cached
+
+    def _build_day(self, date_str: str, day_name: str) -> dict:
+        window_start, window_end = self.working_hours
+        gaps = free_gaps(window_start, window_end, self.booked.get(date_str, []))
+        slots = []
+        gap_index = 0
+        for start in range(window_start, window_end - SLOT_MINUTES + 1, SLOT_MINUTES):
+            while gap_index < len(gaps) and gaps[gap_index][1] < start + SLOT_MINUTES:
+                gap_index += 1
+            available = gap_index < len(gaps) and gaps[gap_index][0] <= start
+            slots.append({"time": _time_str(start), "is_available": available, "duration_minutes": SLOT_MINUTES})
+        return {"date": date_str, "day_name": day_name, "slots": slots}
+
+    def earliest_free(self, after: datetime, last_day: date, duration_minutes: int) -> Optional[tuple]:
+        """(date, start minute) of the first grid slot at or after `after` with duration_minutes free"""
+        window_start, window_end = self.working_hours
+        day = after.date()
+        while day <= last_day:
+            if day.strftime("%A") in self.available_days:
+                date_str = day.strftime("%Y-%m-%d")
+                not_before = after.hour * 60 + after.minute if day == after.date() else window_start
+                with self._lock:
+                    gaps = free_gaps(window_start, window_end, self.booked.get(date_str, []))
+                for gap_start, gap_end in gaps:
+                    # First slot boundary inside the gap that is not in the past
+                    start = max(gap_start, not_before)
+                    offset = (start - window_start) % SLOT_MINUTES
+                    if offset:
+                        start += SLOT_MINUTES - offset
+                    if start + duration_minutes <= gap_end:
+                        return date_str, start
+            day += timedelta(days=1)
+        return None
+
+class AvailabilityEngine:
+    """Bounded LRU of doctor schedules, validated against booking_version on every read"""
+
+    def __init__(self, max_doctors: int):
+        self.max_doctors = max_doctors
+        self._schedules: "OrderedDict[str, DoctorSchedule]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_schedules(self, doctor_ids: List[str], start_day: date, end_day: date) -> Dict[str, DoctorSchedule]:
+        """Up-to-date schedules covering [start_day, end_day] for every doctor that exists"""
+        doctor_ids = list(dict.fromkeys(doctor_ids))
+        if not doctor_ids:
+            return {}
+        doctors = read_query(DOCTOR_SCHEDULES_QUERY, {"doctor_ids": doctor_ids})
+        dates = [
+            (start_day + timedelta(days=offset)).strftime("%Y-%m-%d")
+            for offset in range((end_day - start_day).days + 1)
+        ]
+
+        schedules = {}
+        ranges = []
+        with self._lock:
+            for doctor in doctors:
+                doctor_id = doctor["doctor_id"]
+                schedule = self._schedules.get(doctor_id)
+                if schedule is None or not schedule.is_current(
+                    doctor["booking_version"], doctor["available_days"], doctor["available_hours"]
+                ):
+                    schedule = DoctorSchedule(
+                        doctor["booking_version"], doctor["available_days"], doctor["available_hours"], self._lock
+                    )
+                    self._store(doctor_id, schedule)
+                else:
+                    self._schedules.move_to_end(doctor_id)
+                schedules[doctor_id] = schedule
+
+                missing = [date_str for date_str in dates if date_str not in schedule.loaded_dates]
+                if missing:
+                    ranges.append({"doctor_id": doctor_id, "start_date": missing[0], "end_date": missing[-1]})
+
+        if ranges:
+            # Every stale doctor's bookings in one round-trip
+            rows = read_query(BOOKED_INTERVALS_QUERY, {"ranges": ranges, "active_statuses": ACTIVE_APPOINTMENT_STATUSES})
+            intervals = {}
+            for row in rows:
+                intervals.setdefault(row["doctor_id"], {}).setdefault(row["date"], []).append(booked_interval(row))
+            with self._lock:
+                for loaded in ranges:
+                    doctor_id = loaded["doctor_id"]
+                    loaded_dates = [d for d in dates if loaded["start_date"] <= d <= loaded["end_date"]]
+                    schedules[doctor_id].add_loaded(loaded_dates, intervals.get(doctor_id, {}))
+
+        return schedules
+
+    def record_booking(self, doctor_id: str, booking_version: int, date_str: str, interval: tuple):
+        """Apply a booking made in this process, or drop the schedule if another booking raced it"""
+        with self._lock:
+            schedule = self._schedules.get(doctor_id)
+            if schedule is None:
+                return
+            if schedule.version == booking_version - 1:
+                schedule.book(date_str, interval)
+                schedule.version = booking_version
+            else:
+                del self._schedules[doctor_id]
+
+    def invalidate(self, doctor_id: str):
+        with self._lock:
+            self._schedules.pop(doctor_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._schedules.clear()
+
+    def _store(self, doctor_id: str, schedule: DoctorSchedule):
+        if self.max_doctors <= 0:
+            return
+        self._schedules[doctor_id] = schedule
+        self._schedules.move_to_end(doctor_id)
+        while len(self._schedules) > self.max_doctors:
+            self._schedules.popitem(last=False)
+
+availability_engine = AvailabilityEngine(AVAILABILITY_CACHE_MAX_DOCTORS)
+
+def get_availability(doctor_ids: List[str], start_day: date, end_day: date) -> Dict[str, List[dict]]:
+    """Slot grid per working day for each existing doctor"""
+    schedules = availability_engine.get_schedules(doctor_ids, start_day, end_day)
+    availability = {}
+    for doctor_id, schedule in schedules.items():
+        days = []
+        day = start_day
+        while day <= end_day:
+            slots = schedule.day(day)
+            if slots:
+                days.append(slots)
+            day += timedelta(days=1)
+        availability[doctor_id] = days
+    return availability
+
+def find_earliest_slots(doctor_ids: List[str], after: datetime, duration_minutes: int, days_ahead: int, limit: int):
+    """The earliest free slot of each doctor, earliest first"""
+    last_day = after.date() + timedelta(days=days_ahead)
+    schedules = availability_engine.get_schedules(doctor_ids, after.date(), last_day)
+
+    candidates = []
+    for doctor_id, schedule in schedules.items():
+        slot = schedule.earliest_free(after, last_day, duration_minutes)
+        if slot:
+            candidates.append((slot[0], slot[1], doctor_id))
+
+    return [
+        {
+            "doctor_id": doctor_id,
+            "date": date_str,
+            "time": _time_str(start),
+            "duration_minutes": duration_minutes
+        }
+        for date_str, start, doctor_id in heapq.nsmallest(limit, candidates)
+    ]
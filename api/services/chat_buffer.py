@@ -0,0 +1,128 @@
+"""Write-behind buffer for video room chat messages.
+
+The room WebSocket hands each chat message to the buffer and goes straight
+back to signaling. A background task writes the buffered messages with one
+UNWIND query per batch: CHAT_FLUSH_MAX_MESSAGES messages, or whatever has
+arrived CHAT_FLUSH_INTERVAL_MS after the first one. Messages keep the time
+they were sent, not the time they were written.
+
+The buffer is flushed as soon as a room's last socket leaves, and on
+shutdown. A failed batch is put back for the next flush.
+CHAT_BUFFER_MAX_MESSAGES bounds what is held during an outage; beyond that
+the oldest messages are dropped and logged.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from config.settings import CHAT_FLUSH_INTERVAL_MS, CHAT_FLUSH_MAX_MESSAGES, CHAT_BUFFER_MAX_MESSAGES
+from database.async_connection import write_query
+
+INSERT_MESSAGES_QUERY = """
+UNWIND $messages as message
+MATCH (v:VideoRoom {id: message.room_id})
+CREATE (m:VideoRoomMessage {
+    id: message.id,
+    room_id: message.room_id,
+    sender_id: message.sender_id,
+    message: message.message,
+    timestamp: datetime(message.timestamp)
+})
+CREATE (v)-[:HAS_MESSAGE]->(m)
+"""
+
+class ChatWriteBuffer:
+    """Batches VideoRoomMessage inserts off the WebSocket's path"""
+
+    def __init__(
+        self,
+        flush_interval_ms: int = CHAT_FLUSH_INTERVAL_MS,
+        max_batch: int = CHAT_FLUSH_MAX_MESSAGES,
+        max_pending: int = CHAT_BUFFER_MAX_MESSAGES
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending: List[dict] = []
+        self._has_pending = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, room_id: str, sender_id: str, message: str) -> dict:
+        """Queue a chat message for writing and return it as it will be stored"""
+        row = {
+            "id": str(uuid.uuid4()),
+            "room_id": room_id,
+            "sender_id": sender_id,
+            "message": message,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+        self._pending.append(row)
+        if len(self._pending) > self.max_pending:
+            dropped = len(self._pending) - self.max_pending
+            del self._pending[:dropped]
+            print(f"Chat buffer full, dropped {dropped} unsaved messages")
+        self._has_pending.set()
+        if len(self._pending) >= self.max_batch:
+            self._batch_full.set()
+        return row
+
+    def flush_soon(self):
+        """Have the background task write what is buffered without waiting for the interval"""
+        if self._pending:
+            self._batch_full.set()
+
+    async def flush(self):
+        """Write everything buffered so far"""
+        async with self._flush_lock:
+            rows, self._pending = self._pending, []
+            self._has_pending.clear()
+            self._batch_full.clear()
+            for start in range(0, len(rows), self.max_batch):
+                batch = rows[start:start + self.max_batch]
+                try:
+                    await write_query(INSERT_MESSAGES_QUERY, {"messages": batch})
+                except (Exception, asyncio.CancelledError) as e:
+                    # Keep the unwritten messages (ahead of newer ones) for the next flush
+                    self._pending[:0] = rows[start:]
+                    del self._pending[:max(0, len(self._pending) - self.max_pending)]
+                    self._has_pending.set()
+                    print(f"Chat flush failed, {len(rows) - start} messages kept for retry: {e!r}")
+                    raise
+
+    async def _run(self):
+        while True:
+            await self._has_pending.wait()
+            # Give the batch until the interval ends to fill up
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await asyncio.sleep(self.flush_interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the background task and write what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            pass
+
+chat_buffer = ChatWriteBuffer()
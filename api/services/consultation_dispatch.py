@@ -0,0 +1,198 @@
+"""Dispatch queue for pending consultations.
+
+Queue order is a single static key, dispatch_rank: the creation time in epoch
+seconds minus a priority boost for severity and category. A high-severity
+case therefore queues as if it had arrived an hour earlier, and every case
+still moves up as it ages. The (status, dispatch_rank) index lets the next
+case be found with an index seek instead of scanning all pending cases.
+
+Doctors claim a case under a lease (claimed_by / lease_expires_at). Expired
+leases are claimable again, and responding requires holding the lease or no
+lease being active. Claims and responses first write to the consultation to
+take its lock, then re-read it, so two doctors can never hold the same case.
+"""
+from typing import Optional
+from fastapi import HTTPException
+from neo4j import WRITE_ACCESS
+
+from config.settings import CONSULTATION_LEASE_SECONDS
+from database.connection import driver, read_query
+from services.analytics_rollup import analytics_rollups, stamp_epoch
+
+SEVERITY_BOOST_SECONDS = {"low": 0, "medium": 15 * 60, "high": 60 * 60}
+CATEGORY_BOOST_SECONDS = {"general": 0, "followup": 0, "emergency": 4 * 60 * 60}
+
+# Candidates examined per claim when racing doctors take the first ones
+CLAIM_CANDIDATES = 10
+
+def priority_boost_seconds(severity: Optional[str], category: Optional[str]) -> int:
+    return SEVERITY_BOOST_SECONDS.get(severity or "medium", 0) + CATEGORY_BOOST_SECONDS.get(category or "general", 0)
+
+# Claimable by $doctor_id: pending, not under someone else's live lease, and
+# either open to everyone or addressed to this doctor
+_CLAIMABLE = """
+c.status = 'pending'
+AND (c.claimed_by IS NULL OR c.claimed_by = $doctor_id OR c.lease_expires_at < datetime())
+AND (c.preferred_doctor_id IS NULL OR c.preferred_doctor_id = $doctor_id)
+"""
+
+QUEUE_QUERY = f"""
+MATCH (c:Consultation)
+WHERE c.dispatch_rank IS NOT NULL
+  AND {_CLAIMABLE}
+  {{filters}}
+RETURN c
+ORDER BY c.dispatch_rank ASC
+LIMIT $limit
+"""
+
+ACTIVE_LEASE_QUERY = """
+MATCH (c:Consultation {claimed_by: $doctor_id, status: 'pending'})
+WHERE c.lease_expires_at >= datetime()
+RETURN c
+ORDER BY c.dispatch_rank ASC
+LIMIT 1
+"""
+
+LOCK_QUERY = """
+MATCH (c:Consultation {id: $consultation_id})
+SET c.dispatch_version = coalesce(c.dispatch_version, 0) + 1
+RETURN c.id as id
+"""
+
+# Read after LOCK_QUERY in the same transaction, so it sees the latest committed state
+FRESH_STATE_QUERY = f"""
+MATCH (c:Consultation {{id: $consultation_id}})
+OPTIONAL MATCH (c)<-[r:RESPONDED_TO]-(:Doctor {{user_id: $doctor_id}})
+RETURN c, {_CLAIMABLE} as claimable, r IS NOT NULL as answered_by_doctor
+"""
+
+CLAIM_QUERY = """
+MATCH (c:Consultation {id: $consultation_id})
+SET c.claimed_by = $doctor_id,
+    c.claimed_at = datetime(),
+    c.lease_expires_at = datetime() + duration({seconds: $lease_seconds})
+RETURN c
+"""
+
+RELEASE_QUERY = """
+MATCH (c:Consultation {id: $consultation_id, claimed_by: $doctor_id})
+REMOVE c.claimed_by, c.claimed_at, c.lease_expires_at
+RETURN c
+"""
+
+RESPOND_QUERY = """
+MATCH (c:Consultation {id: $consultation_id})
+MATCH (d:Doctor {user_id: $doctor_id})
+SET c.response = $response,
+    c.diagnosis = $diagnosis,
+    c.prescription = $prescription,
+    c.follow_up_needed = $follow_up_needed,
+    c.follow_up_date = $follow_up_date,
+    c.status = 'answered',
+    c.answered_at = datetime(),
+    c.updated_at = datetime()
+REMOVE c.claimed_by, c.claimed_at, c.lease_expires_at
+MERGE (d)-[:RESPONDED_TO]->(c)
+ON CREATE SET d.consultations_answered = coalesce(d.consultations_answered, 0) + 1
+RETURN c, duration.inSeconds(c.created_at, c.answered_at).seconds as response_seconds
+"""
+
+def _filters(severity: Optional[str], category: Optional[str], params: dict) -> str:
+    conditions = []
+    if severity:
+        conditions.append("c.severity = $severity")
+        params["severity"] = severity
+    if category:
+        conditions.append("c.category = $category")
+        params["category"] = category
+    return "".join(f" AND {condition}" for condition in conditions)
+
+def list_queue(doctor_id: Optional[str], severity: Optional[str] = None, category: Optional[str] = None, limit: int = 20):
+    """Cases a doctor could claim, in dispatch order (cases open to any doctor when doctor_id is None)"""
+    params = {"doctor_id": doctor_id, "limit": limit}
+    query = QUEUE_QUERY.replace("{filters}", _filters(severity, category, params))
+    return [record["c"] for record in read_query(query, params)]
+
+def _lock_and_read(tx, consultation_id: str, doctor_id: str):
+    if not tx.run(LOCK_QUERY, {"consultation_id": consultation_id}).single():
+        return None
+    return tx.run(FRESH_STATE_QUERY, {"consultation_id": consultation_id, "doctor_id": doctor_id}).single()
+
+def _claim(tx, consultation_id: str, doctor_id: str):
+    state = _lock_and_read(tx, consultation_id, doctor_id)
+    if state is None or not state["claimable"]:
+        return None
+    return tx.run(CLAIM_QUERY, {
+        "consultation_id": consultation_id,
+        "doctor_id": doctor_id,
+        "lease_seconds": CONSULTATION_LEASE_SECONDS
+    }).single()["c"]
+
+def _claim_next(tx, doctor_id: str, severity: Optional[str], category: Optional[str]):
+    # A doctor with a live lease keeps getting that case until it is answered or released
+    current = tx.run(ACTIVE_LEASE_QUERY, {"doctor_id": doctor_id}).single()
+    if current:
+        return current["c"]
+
+    params = {"doctor_id": doctor_id, "limit": CLAIM_CANDIDATES}
+    query = QUEUE_QUERY.replace("{filters}", _filters(severity, category, params))
+    for candidate in tx.run(query, params).data():
+        claimed = _claim(tx, candidate["c"]["id"], doctor_id)
+        if claimed:
+            return claimed
+    return None
+
+def claim_next(doctor_id: str, severity: Optional[str] = None, category: Optional[str] = None):
+    """Lease the highest-priority claimable case to the doctor, or return None"""
+    with driver.session(default_access_mode=WRITE_ACCESS) as session:
+        return session.execute_write(_claim_next, doctor_id, severity, category)
+
+def claim(consultation_id: str, doctor_id: str):
+    """Lease a specific case to the doctor or raise 404/409"""
+    def work(tx):
+        if tx.run("MATCH (c:Consultation {id: $consultation_id}) RETURN c.id", {"consultation_id": consultation_id}).single() is None:
+            raise HTTPException(status_code=404, detail="Consultation not found")
+        claimed = _claim(tx, consultation_id, doctor_id)
+        if claimed is None:
+            raise HTTPException(status_code=409, detail="Consultation is not available to claim")
+        return claimed
+
+    with driver.session(default_access_mode=WRITE_ACCESS) as session:
+        return session.execute_write(work)
+
+def release(consultation_id: str, doctor_id: str):
+    """Give a leased case back to the queue; None if the doctor doesn't hold it"""
+    with driver.session(default_access_mode=WRITE_ACCESS) as session:
+        record = session.execute_write(
+            lambda tx: tx.run(RELEASE_QUERY, {"consultation_id": consultation_id, "doctor_id": doctor_id}).single()
+        )
+        return record["c"] if record else None
+
+def respond(consultation_id: str, doctor_id: str, response_fields: dict):
+    """Answer a case the doctor holds (or that nobody holds), exactly once"""
+    def work(tx):
+        state = _lock_and_read(tx, consultation_id, doctor_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Consultation not found")
+        if state["c"].get("status") == "completed":
+            raise HTTPException(status_code=400, detail="Consultation already completed")
+        # Pending cases need a free or own lease; answered ones may only be
+        # amended by the doctor who answered them
+        if not (state["claimable"] or state["answered_by_doctor"]):
+            raise HTTPException(status_code=409, detail="Consultation is claimed by or answered by another doctor")
+        record = tx.run(RESPOND_QUERY, {
+            "consultation_id": consultation_id,
+            "doctor_id": doctor_id,
+            **response_fields
+        }).single()
+        if record is None:
+            raise HTTPException(status_code=404, detail="Doctor profile not found")
+        return record, state["c"].get("status"), stamp_epoch(tx)
+
+    with driver.session(default_access_mode=WRITE_ACCESS) as session:
+        record, previous_status, stamp = session.execute_write(work)
+    analytics_rollups.status_changed(stamp, "consultation", previous_status, "answered")
+    if previous_status == "pending":
+        analytics_rollups.consultation_answered(stamp, record["response_seconds"])
+    return record["c"]
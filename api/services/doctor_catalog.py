@@ -0,0 +1,343 @@
+"""In-process catalog of doctor profiles for autocomplete and filtered search.
+
+Each doctor gets a slot number, and every index maps a key to a Python int
+used as a bitset of slots: n-grams of names, specializations and clinic
+addresses, languages, available days, and rating/fee buckets. A search ANDs
+the bitsets of its filters and only checks the surviving records exactly, so
+keystroke autocomplete never reaches Neo4j.
+
+The catalog is loaded at startup, updated per doctor whenever a profile or
+rating changes in this process, and fully reloaded every
+DOCTOR_CATALOG_REFRESH_SECONDS to pick up writes made by other workers.
+Updates made while a reload is reading from Neo4j are replayed on top of
+the reloaded records, so a reload never reverts them.
+"""
+import heapq
+import threading
+
+from config.settings import DOCTOR_CATALOG_FEE_BUCKET
+from database.connection import read_query
+from database import async_connection
+from database.serialization import serialize_node
+
+GRAM_SIZES = (2, 3)
+RATING_BUCKETS_PER_STAR = 2
+
+DOCTOR_PROFILES_QUERY = """
+MATCH (d:Doctor)
+OPTIONAL MATCH (u:User {id: d.user_id})
+RETURN d, u
+"""
+
+DOCTOR_PROFILE_QUERY = """
+MATCH (d:Doctor {user_id: $user_id})
+OPTIONAL MATCH (u:User {id: d.user_id})
+RETURN d, u
+"""
+
+def _record(doctor, user) -> "DoctorRecord":
+    return DoctorRecord(serialize_node(doctor, "Doctor") or {}, serialize_node(user, "User") or {})
+
+def _grams(text: str):
+    return {text[i:i + size] for size in GRAM_SIZES for i in range(len(text) - size + 1)}
+
+def _iter_slots(bits: int):
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+class DoctorRecord:
+    """Search fields of one doctor plus the cleaned profile returned to clients"""
+
+    __slots__ = (
+        "user_id", "full_name", "specialization", "clinic_address", "rating",
+        "total_reviews", "consultation_fee", "languages", "available_days",
+        "active", "profile", "user"
+    )
+
+    def __init__(self, doctor: dict, user: dict):
+        self.user_id = doctor.get("user_id")
+        self.full_name = (doctor.get("full_name") or "").lower()
+        self.specialization = (doctor.get("specialization") or "").lower()
+        self.clinic_address = (doctor.get("clinic_address") or "").lower()
+        self.rating = float(doctor.get("rating") or 0.0)
+        self.total_reviews = int(doctor.get("total_reviews") or 0)
+        fee = doctor.get("consultation_fee")
+        self.consultation_fee = float(fee) if fee is not None else None
+        self.languages = frozenset(language.lower() for language in doctor.get("languages") or [])
+        self.available_days = frozenset(day.lower() for day in doctor.get("available_days") or [])
+        self.active = user.get("role") == "doctor" and user.get("status") in (None, "active")
+        self.profile = doctor
+        self.user = user
+
+    def rank_key(self):
+        return (-self.rating, -self.total_reviews)
+
+    def index_keys(self):
+        """Every (index name, key) pair this record sets its bit in"""
+        keys = [("name", gram) for gram in _grams(self.full_name)]
+        keys += [("specialization", gram) for gram in _grams(self.specialization)]
+        keys += [("address", gram) for gram in _grams(self.clinic_address)]
+        keys += [("language", language) for language in self.languages]
+        keys += [("day", day) for day in self.available_days]
+        keys.append(("rating", int(self.rating * RATING_BUCKETS_PER_STAR)))
+        if self.consultation_fee is not None:
+            keys.append(("fee", int(self.consultation_fee // DOCTOR_CATALOG_FEE_BUCKET)))
+        if self.active:
+            keys.append(("active", True))
+        return keys
+
+class DoctorCatalog:
+    """Bitset-indexed doctor records; every method is safe to call from any thread"""
+
+    def __init__(self):
+        self.loaded = False
+        self._records = []
+        self._slots_by_id = {}
+        self._free_slots = []
+        self._index = {}
+        self._ranked = None
+        # Per reload in progress: user_id -> record upserted (None if removed) since it began
+        self._journals = []
+        self._lock = threading.Lock()
+
+    def begin_load(self) -> dict:
+        """Start recording updates; call before reading the rows for load()"""
+        journal = {}
+        with self._lock:
+            self._journals.append(journal)
+        return journal
+
+    def end_load(self, journal: dict):
+        """Stop recording for a reload that was loaded or abandoned"""
+        with self._lock:
+            if journal in self._journals:
+                self._journals.remove(journal)
+
+    def load(self, rows, journal: dict = None):
+        """Replace the catalog with (doctor, user) pairs, then replay the journal's updates"""
+        records = [_record(doctor, user) for doctor, user in rows]
+        index = {}
+        for slot, record in enumerate(records):
+            for key in record.index_keys():
+                index[key] = index.get(key, 0) | (1 << slot)
+
+        with self._lock:
+            self._records = records
+            self._slots_by_id = {record.user_id: slot for slot, record in enumerate(records)}
+            self._free_slots = []
+            self._index = index
+            self._ranked = None
+            self.loaded = True
+            if journal is not None:
+                if journal in self._journals:
+                    self._journals.remove(journal)
+                for user_id, record in journal.items():
+                    if record is None:
+                        self._remove(user_id)
+                    else:
+                        self._upsert(record)
+
+    def upsert(self, doctor, user):
+        record = _record(doctor, user)
+        with self._lock:
+            for journal in self._journals:
+                journal[record.user_id] = record
+            self._upsert(record)
+
+    def remove(self, user_id: str):
+        with self._lock:
+            for journal in self._journals:
+                journal[user_id] = None
+            self._remove(user_id)
+
+    def _upsert(self, record):
+        slot = self._slots_by_id.get(record.user_id)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                slot = len(self._records)
+                self._records.append(None)
+            self._slots_by_id[record.user_id] = slot
+        else:
+            self._clear_slot(slot)
+
+        self._records[slot] = record
+        self._ranked = None
+        for key in record.index_keys():
+            self._index[key] = self._index.get(key, 0) | (1 << slot)
+
+    def _remove(self, user_id: str):
+        slot = self._slots_by_id.pop(user_id, None)
+        if slot is not None:
+            self._clear_slot(slot)
+            self._records[slot] = None
+            self._free_slots.append(slot)
+            self._ranked = None
+
+    def __len__(self):
+        return len(self._slots_by_id)
+
+    def search(
+        self,
+        name: str = None,
+        specialization: str = None,
+        location: str = None,
+        min_rating: float = None,
+        max_fee: float = None,
+        language: str = None,
+        day: str = None,
+        active_only: bool = True,
+        limit: int = 20
+    ):
+        """Matching records, best rated first"""
+        with self._lock:
+            bits = self._index.get(("active", True), 0) if active_only else self._all_slots()
+            checks = []
+
+            for field, text in (("name", name), ("specialization", specialization), ("address", location)):
+                if text:
+                    text = text.lower()
+                    bits &= self._text_bits(field, text)
+                    checks.append(lambda record, field=field, text=text: text in self._field_value(record, field))
+
+            if min_rating:
+                lowest = int(min_rating * RATING_BUCKETS_PER_STAR)
+                bits &= self._bucket_bits("rating", range(lowest, 5 * RATING_BUCKETS_PER_STAR + 1))
+                checks.append(lambda record: record.rating >= min_rating)
+
+            if max_fee is not None:
+                highest = int(max_fee // DOCTOR_CATALOG_FEE_BUCKET)
+                bits &= self._bucket_bits("fee", range(0, highest + 1))
+                checks.append(lambda record: record.consultation_fee <= max_fee)
+
+            if language:
+                bits &= self._index.get(("language", language.lower()), 0)
+
+            if day:
+                bits &= self._index.get(("day", day.lower()), 0)
+
+            return self._select(bits, checks, limit)
+
+    def specializations(self, text: str, limit: int = 10):
+        """Distinct specialization names containing text, alphabetically"""
+        text = text.lower()
+        with self._lock:
+            names = {}
+            for slot in _iter_slots(self._text_bits("specialization", text)):
+                record = self._records[slot]
+                if text in record.specialization:
+                    names.setdefault(record.specialization, record.profile.get("specialization"))
+            return sorted(names.values())[:limit]
+
+    def _select(self, bits: int, checks, limit: int):
+        # The bitsets narrow candidates by n-gram/bucket; confirm each exactly
+        if not bits:
+            return []
+        ranked = self._ranked_slots()
+        # Walking best-first visits about len(ranked) * limit / candidates slots
+        candidates = bin(bits).count("1")
+        if candidates * candidates < len(ranked) * limit:
+            matches = [
+                record for record in (self._records[slot] for slot in _iter_slots(bits))
+                if all(check(record) for check in checks)
+            ]
+            return heapq.nsmallest(limit, matches, key=DoctorRecord.rank_key)
+
+        # Dense candidate sets: walk the doctors best-first and stop at the limit
+        flags = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+        matches = []
+        for slot in ranked:
+            if slot >> 3 < len(flags) and flags[slot >> 3] >> (slot & 7) & 1:
+                record = self._records[slot]
+                if all(check(record) for check in checks):
+                    matches.append(record)
+                    if len(matches) == limit:
+                        break
+        return matches
+
+    def _ranked_slots(self):
+        if self._ranked is None:
+            self._ranked = sorted(self._slots_by_id.values(), key=lambda slot: self._records[slot].rank_key())
+        return self._ranked
+
+    def _all_slots(self):
+        bits = 0
+        for slot in self._slots_by_id.values():
+            bits |= 1 << slot
+        return bits
+
+    def _text_bits(self, field: str, text: str):
+        if len(text) < min(GRAM_SIZES):
+            return self._all_slots()
+        size = min(len(text), max(GRAM_SIZES))
+        bits = -1
+        for i in range(len(text) - size + 1):
+            bits &= self._index.get((field, text[i:i + size]), 0)
+            if not bits:
+                break
+        return bits
+
+    def _bucket_bits(self, field: str, buckets):
+        bits = 0
+        for bucket in buckets:
+            bits |= self._index.get((field, bucket), 0)
+        return bits
+
+    @staticmethod
+    def _field_value(record, field):
+        if field == "name":
+            return record.full_name
+        if field == "specialization":
+            return record.specialization
+        return record.clinic_address
+
+    def _clear_slot(self, slot: int):
+        mask = ~(1 << slot)
+        for key in self._records[slot].index_keys():
+            remaining = self._index.get(key, 0) & mask
+            if remaining:
+                self._index[key] = remaining
+            else:
+                self._index.pop(key, None)
+
+doctor_catalog = DoctorCatalog()
+
+def _profile_rows(records):
+    return [(record["d"], record["u"]) for record in records]
+
+async def load_doctor_catalog():
+    """Load (or reload) every doctor profile into the catalog"""
+    journal = doctor_catalog.begin_load()
+    try:
+        records = await async_connection.read_query(DOCTOR_PROFILES_QUERY)
+        doctor_catalog.load(_profile_rows(records), journal)
+    finally:
+        doctor_catalog.end_load(journal)
+
+def get_doctor_catalog():
+    """The catalog, loaded synchronously on first use if startup couldn't load it"""
+    if not doctor_catalog.loaded:
+        journal = doctor_catalog.begin_load()
+        try:
+            doctor_catalog.load(_profile_rows(read_query(DOCTOR_PROFILES_QUERY)), journal)
+        finally:
+            doctor_catalog.end_load(journal)
+    return doctor_catalog
+
+def refresh_doctor(user_id: str):
+    """Re-read one doctor after a profile, rating or account status change"""
+    if not doctor_catalog.loaded:
+        return
+    try:
+        records = read_query(DOCTOR_PROFILE_QUERY, {"user_id": user_id})
+    except Exception as e:
+        # The periodic reload will pick the change up
+        print(f"Doctor catalog refresh failed for {user_id}: {e}")
+        return
+    if records:
+        doctor_catalog.upsert(records[0]["d"], records[0]["u"])
+    else:
+        doctor_catalog.remove(user_id)
@@ -0,0 +1,81 @@
+"""Running rating aggregate on Doctor nodes.
+
+Each doctor carries rating_sum, total_reviews and a star histogram
+(rating_1 .. rating_5); rating is rating_sum / total_reviews. A review
+create, edit or delete adjusts these counters by the one rating that
+changed, in the same transaction as the review write, instead of
+re-averaging every review the doctor has.
+
+reconcile_ratings() recomputes every doctor from the reviews in batches,
+to repair drift or after importing reviews outside the API:
+
+    python -m services.doctor_ratings
+"""
+from typing import Optional
+
+from database.connection import driver
+
+STARS = range(1, 6)
+
+def _star_change(star: int) -> str:
+    return (
+        f"d.rating_{star} = coalesce(d.rating_{star}, 0)"
+        f" + CASE $added_rating WHEN {star} THEN 1 ELSE 0 END"
+        f" - CASE $removed_rating WHEN {star} THEN 1 ELSE 0 END"
+    )
+
+_STAR_CHANGES = ",\n    ".join(_star_change(star) for star in STARS)
+_STAR_RECOUNTS = ",\n        ".join(f"d.rating_{star} = size([rating IN ratings WHERE rating = {star}])" for star in STARS)
+
+# Replaces $removed_rating with $added_rating on doctor d; either may be null
+# (a new review removes nothing, a deleted one adds nothing)
+RATING_CHANGE_CLAUSE = f"""
+SET d.rating_sum = coalesce(d.rating_sum, 0) + coalesce($added_rating, 0) - coalesce($removed_rating, 0),
+    d.total_reviews = coalesce(d.total_reviews, 0)
+        + CASE WHEN $added_rating IS NULL THEN 0 ELSE 1 END
+        - CASE WHEN $removed_rating IS NULL THEN 0 ELSE 1 END,
+    {_STAR_CHANGES},
+    d.updated_at = datetime()
+SET d.rating = CASE WHEN d.total_reviews > 0 THEN toFloat(d.rating_sum) / d.total_reviews ELSE 0.0 END
+"""
+
+APPLY_RATING_CHANGE_QUERY = f"""
+MATCH (d:Doctor {{user_id: $doctor_id}})
+{RATING_CHANGE_CLAUSE}
+RETURN d
+"""
+
+RECONCILE_QUERY = f"""
+MATCH (d:Doctor)
+CALL {{
+    WITH d
+    OPTIONAL MATCH (d)<-[:REVIEWED]-(r:Review)
+    WITH d, collect(r.rating) as ratings
+    WITH d, ratings, reduce(total = 0, rating IN ratings | total + rating) as rating_sum
+    SET d.rating_sum = rating_sum,
+        d.total_reviews = size(ratings),
+        {_STAR_RECOUNTS},
+        d.rating = CASE WHEN size(ratings) > 0 THEN toFloat(rating_sum) / size(ratings) ELSE 0.0 END
+}} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(d) as doctors
+"""
+
+def apply_rating_change(tx, doctor_id: str, added_rating: Optional[int] = None, removed_rating: Optional[int] = None):
+    """Adjust a doctor's aggregate inside an open transaction; returns the doctor node"""
+    record = tx.run(APPLY_RATING_CHANGE_QUERY, {
+        "doctor_id": doctor_id, "added_rating": added_rating, "removed_rating": removed_rating
+    }).single()
+    return record["d"] if record else None
+
+def rating_histogram(doctor) -> dict:
+    """Review count per star, {"1": n, ..., "5": n}, from a doctor node or dict"""
+    return {str(star): doctor.get(f"rating_{star}") or 0 for star in STARS}
+
+def reconcile_ratings(batch_size: int = 500) -> int:
+    """Recompute every doctor's aggregate from its reviews; returns the number of doctors"""
+    # CALL ... IN TRANSACTIONS needs an auto-commit transaction
+    with driver.session() as session:
+        return session.run(RECONCILE_QUERY, batch_size=batch_size).single()["doctors"]
+
+if __name__ == "__main__":
+    print(f"Reconciled ratings of {reconcile_ratings()} doctors")
@@ -0,0 +1,74 @@
+"""Streaming storage for uploaded files.
+
+Uploads are copied to disk in UPLOAD_CHUNK_SIZE chunks rather than read
+into memory whole, so a worker's memory use stays flat however large the
+files are. The copy goes to a temporary file in the target directory; the
+size limit is checked chunk by chunk, and the SHA-256 and size are computed
+as the bytes pass through. Only a complete file is renamed into place
+(atomically), so readers never see a partial upload and an oversized or
+failed one leaves nothing behind. Stored files get STORED_FILE_MODE rather
+than the owner-only mode temporary files are created with.
+
+benchmark_uploads.py compares peak memory against reading the whole file.
+"""
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, NamedTuple, Optional
+
+from fastapi import HTTPException
+
+from config.settings import UPLOAD_CHUNK_SIZE
+
+# rw-r--r--, like a file written with open() under the usual 022 umask
+STORED_FILE_MODE = 0o644
+
+class StoredFile(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds the maximum size of {max_size} bytes")
+
+def store_stream(
+    source: BinaryIO,
+    directory: str,
+    filename: str,
+    max_size: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredFile:
+    """Copy a file object to directory/filename, or raise a 413 HTTPException past max_size bytes"""
+    os.makedirs(directory, exist_ok=True)
+    # Same directory as the target, so the final rename stays on one filesystem
+    temp = tempfile.NamedTemporaryFile(dir=directory, prefix=".upload-", delete=False)
+    try:
+        with temp:
+            digest = hashlib.sha256()
+            size = 0
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise _too_large(max_size)
+                digest.update(chunk)
+                temp.write(chunk)
+            temp.flush()
+            os.fchmod(temp.fileno(), STORED_FILE_MODE)
+            os.fsync(temp.fileno())
+        path = os.path.join(directory, filename)
+        os.replace(temp.name, path)
+    except BaseException:
+        os.unlink(temp.name)
+        raise
+    return StoredFile(path, size, digest.hexdigest())
+
+def store_upload(upload, directory: str, filename: str, max_size: int) -> StoredFile:
+    """Stream a FastAPI UploadFile to disk (see store_stream)"""
+    # Multipart bodies carry the part size when the client sent it; fail before copying anything
+    declared_size: Optional[int] = getattr(upload, "size", None)
+    if declared_size is not None and declared_size > max_size:
+        raise _too_large(max_size)
+    return store_stream(upload.file, directory, filename, max_size)
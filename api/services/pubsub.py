@@ -0,0 +1,179 @@
+"""Pub/sub fan-out between worker processes.
+
+Every worker subscribes handlers for the channels it serves (for example the
+notification channel, whose handler writes to the WebSockets this worker
+holds) and publishes events instead of delivering them itself. Which worker
+owns a socket then no longer matters.
+
+The backend is chosen by PUBSUB_URL:
+
+    memory://                  - in-process only, for a single worker
+    redis://[:password@]host:port
+    unix:///path/to/redis.sock - any server speaking the Redis protocol
+
+The Redis backend talks RESP directly over asyncio streams: one connection
+for PUBLISH and one long-lived SUBSCRIBE connection that reconnects (and
+resubscribes) on failure.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List
+from urllib.parse import urlparse, unquote
+
+from config.settings import PUBSUB_URL
+
+Handler = Callable[[str], Awaitable[None]]
+
+RECONNECT_DELAY_SECONDS = 1.0
+
+async def _dispatch(handlers: List[Handler], message: str):
+    for handler in handlers:
+        try:
+            await handler(message)
+        except Exception as e:
+            print(f"Pub/sub handler failed: {e}")
+
+class InProcessPubSub:
+    """Delivers published messages to this process's handlers"""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    def subscribe(self, channel: str, handler: Handler):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def publish(self, channel: str, message: str):
+        await _dispatch(self._handlers.get(channel, []), message)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+def _encode_command(*parts) -> bytes:
+    chunks = [b"*%d\r\n" % len(parts)]
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode()
+        chunks.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(chunks)
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readuntil(b"\r\n")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body
+    if kind == b"-":
+        raise ConnectionError(f"Pub/sub server error: {body.decode(errors='replace')}")
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected pub/sub reply: {line!r}")
+
+class RedisPubSub:
+    """PUBLISH/SUBSCRIBE against a Redis-protocol server over TCP or a unix socket"""
+
+    def __init__(self, url: str):
+        self.url = urlparse(url)
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._publisher = None
+        self._publish_lock = asyncio.Lock()
+        self._subscriber = None
+        self._listener = None
+
+    async def _connect(self):
+        if self.url.scheme == "unix":
+            reader, writer = await asyncio.open_unix_connection(self.url.path)
+        else:
+            reader, writer = await asyncio.open_connection(self.url.hostname or "localhost", self.url.port or 6379)
+        if self.url.password:
+            auth = ("AUTH", unquote(self.url.username), unquote(self.url.password)) if self.url.username \
+                else ("AUTH", unquote(self.url.password))
+            writer.write(_encode_command(*auth))
+            await writer.drain()
+            await _read_reply(reader)
+        return reader, writer
+
+    def subscribe(self, channel: str, handler: Handler):
+        new_channel = channel not in self._handlers
+        self._handlers.setdefault(channel, []).append(handler)
+        if new_channel and self._subscriber is not None:
+            # Subscribed connections accept further SUBSCRIBE commands
+            self._subscriber.write(_encode_command("SUBSCRIBE", channel))
+
+    async def publish(self, channel: str, message: str):
+        async with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = await self._connect()
+                    reader, writer = self._publisher
+                    writer.write(_encode_command("PUBLISH", channel, message))
+                    await writer.drain()
+                    await _read_reply(reader)
+                    return
+                except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                    # Reconnect once; a second failure goes to the caller
+                    self._close_publisher()
+                    if attempt:
+                        raise
+
+    async def _listen(self):
+        while True:
+            writer = None
+            try:
+                reader, writer = await self._connect()
+                if self._handlers:
+                    writer.write(_encode_command("SUBSCRIBE", *self._handlers))
+                    await writer.drain()
+                self._subscriber = writer
+                while True:
+                    reply = await _read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        await _dispatch(self._handlers.get(reply[1].decode(), []), reply[2].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Pub/sub subscriber disconnected, reconnecting: {e}")
+            finally:
+                self._subscriber = None
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    def _close_publisher(self):
+        if self._publisher is not None:
+            self._publisher[1].close()
+            self._publisher = None
+
+    async def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self._close_publisher()
+
+def create_pubsub(url: str):
+    scheme = urlparse(url).scheme
+    if scheme in ("", "memory"):
+        return InProcessPubSub()
+    if scheme in ("redis", "unix"):
+        return RedisPubSub(url)
+    raise ValueError(f"Unsupported PUBSUB_URL scheme: {scheme}")
+
+pubsub = create_pubsub(PUBSUB_URL)
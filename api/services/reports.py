@@ -0,0 +1,210 @@
+"""Daily and monthly admin reports, materialized once their period closes.
+
+A closed day or month cannot change any more, so its report is computed
+once and stored as an immutable (:Report {key}) snapshot, e.g.
+key "daily:2024-05-01" or "monthly:2024-05". Historical requests read the
+snapshot; only the open period (today, this month) is computed live.
+
+ReportScheduler runs in the app lifespan. At startup and every
+REPORT_SCHEDULER_INTERVAL_SECONDS it materializes any of the last
+REPORT_BACKFILL_DAYS days and REPORT_BACKFILL_MONTHS months that have no
+snapshot yet. Older periods are materialized the first time they are
+requested. Periods are UTC.
+
+Every statistic is its own count over an indexed range (created_at or
+appointment_date), so an empty entity no longer zeroes the whole report
+the way the old chained MATCHes did.
+"""
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from config.settings import REPORT_SCHEDULER_INTERVAL_SECONDS, REPORT_BACKFILL_DAYS, REPORT_BACKFILL_MONTHS
+from database.async_connection import read_query, write_query
+
+DAILY_FIELDS = ["new_users", "new_consultations", "appointments_today", "new_prescriptions"]
+MONTHLY_FIELDS = ["new_users", "consultations", "appointments", "doctor_responses", "active_doctors"]
+
+CREATED_COUNT_QUERY = """
+MATCH (n:{label})
+WHERE n.created_at >= datetime($start) AND n.created_at < datetime($end)
+RETURN count(n) as count
+"""
+
+APPOINTMENT_COUNT_QUERY = """
+MATCH (a:Appointment)
+WHERE a.appointment_date >= $start AND a.appointment_date < $end
+RETURN count(a) as count
+"""
+
+DOCTOR_RESPONSES_QUERY = """
+MATCH (c:Consultation)
+WHERE c.created_at >= datetime($start) AND c.created_at < datetime($end)
+MATCH (d:Doctor)-[:RESPONDED_TO]->(c)
+RETURN count(c) as doctor_responses, count(DISTINCT d.user_id) as active_doctors
+"""
+
+SNAPSHOT_QUERY = """
+MERGE (r:Report {key: $key})
+ON CREATE SET r.report_type = $report_type,
+    r.period = $period,
+    r += $statistics,
+    r.generated_at = datetime()
+RETURN r
+"""
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def _next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _previous_month(month: date) -> date:
+    return (month - timedelta(days=1)).replace(day=1)
+
+async def _count(query: str, start: date, end: date) -> int:
+    records = await read_query(query, {"start": start.isoformat(), "end": end.isoformat()})
+    return records[0]["count"] if records else 0
+
+async def _created(label: str, start: date, end: date) -> int:
+    return await _count(CREATED_COUNT_QUERY.replace("{label}", label), start, end)
+
+async def compute_daily_statistics(day: date) -> dict:
+    end = day + timedelta(days=1)
+    return {
+        "new_users": await _created("User", day, end),
+        "new_consultations": await _created("Consultation", day, end),
+        "appointments_today": await _count(APPOINTMENT_COUNT_QUERY, day, end),
+        "new_prescriptions": await _created("Prescription", day, end)
+    }
+
+async def compute_monthly_statistics(month: date) -> dict:
+    end = _next_month(month)
+    responses = await read_query(DOCTOR_RESPONSES_QUERY, {"start": month.isoformat(), "end": end.isoformat()})
+    return {
+        "new_users": await _created("User", month, end),
+        "consultations": await _created("Consultation", month, end),
+        "appointments": await _count(APPOINTMENT_COUNT_QUERY, month, end),
+        "doctor_responses": responses[0]["doctor_responses"] if responses else 0,
+        "active_doctors": responses[0]["active_doctors"] if responses else 0
+    }
+
+def daily_key(day: date) -> Tuple[str, str]:
+    return f"daily:{day.isoformat()}", day.isoformat()
+
+def monthly_key(month: date) -> Tuple[str, str]:
+    period = month.strftime("%Y-%m")
+    return f"monthly:{period}", period
+
+async def _snapshot(report_type: str, key: str, period: str, statistics: dict, fields: List[str]) -> dict:
+    # ON CREATE only: a snapshot written first by another worker is kept as is
+    records = await write_query(SNAPSHOT_QUERY, {
+        "key": key, "report_type": report_type, "period": period, "statistics": statistics
+    })
+    return _snapshot_statistics(records[0]["r"], fields)
+
+def _snapshot_statistics(report, fields: List[str]) -> dict:
+    return {field: report.get(field, 0) for field in fields}
+
+async def _read_snapshot(key: str):
+    records = await read_query("MATCH (r:Report {key: $key}) RETURN r", {"key": key})
+    return records[0]["r"] if records else None
+
+async def daily_report(day: date) -> dict:
+    """Statistics for one UTC day, from its snapshot once the day is over"""
+    if day >= _utc_today():
+        return {"statistics": await compute_daily_statistics(day), "materialized": False}
+    key, period = daily_key(day)
+    report = await _read_snapshot(key)
+    if report is not None:
+        return {"statistics": _snapshot_statistics(report, DAILY_FIELDS), "materialized": True}
+    statistics = await _snapshot("daily", key, period, await compute_daily_statistics(day), DAILY_FIELDS)
+    return {"statistics": statistics, "materialized": True}
+
+async def monthly_report(year: int, month: int) -> dict:
+    """Statistics for one UTC month, from its snapshot once the month is over"""
+    month_start = date(year, month, 1)
+    if month_start >= _month_start(_utc_today()):
+        return {"statistics": await compute_monthly_statistics(month_start), "materialized": False}
+    key, period = monthly_key(month_start)
+    report = await _read_snapshot(key)
+    if report is not None:
+        return {"statistics": _snapshot_statistics(report, MONTHLY_FIELDS), "materialized": True}
+    statistics = await _snapshot("monthly", key, period, await compute_monthly_statistics(month_start), MONTHLY_FIELDS)
+    return {"statistics": statistics, "materialized": True}
+
+class ReportScheduler:
+    """Materializes recently closed days and months in the background"""
+
+    def __init__(
+        self,
+        interval: float = REPORT_SCHEDULER_INTERVAL_SECONDS,
+        backfill_days: int = REPORT_BACKFILL_DAYS,
+        backfill_months: int = REPORT_BACKFILL_MONTHS
+    ):
+        self.interval = interval
+        self.backfill_days = backfill_days
+        self.backfill_months = backfill_months
+        self._task: Optional[asyncio.Task] = None
+
+    def closed_periods(self, today: date):
+        """(report_type, key, period, period start) of every closed period in the backfill window"""
+        periods = []
+        for offset in range(1, self.backfill_days + 1):
+            day = today - timedelta(days=offset)
+            periods.append(("daily", *daily_key(day), day))
+        month = _month_start(today)
+        for _ in range(self.backfill_months):
+            month = _previous_month(month)
+            periods.append(("monthly", *monthly_key(month), month))
+        return periods
+
+    async def materialize_closed_periods(self) -> int:
+        """Snapshot every closed period in the window that has none; returns how many were written"""
+        periods = self.closed_periods(_utc_today())
+        records = await read_query(
+            "MATCH (r:Report) WHERE r.key IN $keys RETURN r.key as key",
+            {"keys": [key for _, key, _, _ in periods]}
+        )
+        existing = {record["key"] for record in records}
+
+        written = 0
+        for report_type, key, period, start in periods:
+            if key in existing:
+                continue
+            if report_type == "daily":
+                await _snapshot(report_type, key, period, await compute_daily_statistics(start), DAILY_FIELDS)
+            else:
+                await _snapshot(report_type, key, period, await compute_monthly_statistics(start), MONTHLY_FIELDS)
+            written += 1
+        return written
+
+    async def _run(self):
+        while True:
+            try:
+                written = await self.materialize_closed_periods()
+                if written:
+                    print(f"Materialized {written} report snapshots")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Report materialization failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+report_scheduler = ReportScheduler()
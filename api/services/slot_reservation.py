@@ -0,0 +1,180 @@
+"""Atomic appointment slot reservation.
+
+A booking runs as one managed write transaction that first writes to the
+doctor node - taking its write lock, so bookings for the same doctor are
+serialized - then looks for any active appointment whose [start, end) interval
+overlaps the requested one on that day, and only then creates the appointment.
+Every appointment also carries a slot_key (doctor|date|time) protected by a
+uniqueness constraint, which is removed when the appointment is released.
+Moving a released appointment back into an active status goes through the
+same lock and overlap check (reclaim_slot) before its slot_key is restored.
+"""
+from datetime import datetime
+from fastapi import HTTPException
+from neo4j import WRITE_ACCESS
+from neo4j.exceptions import ConstraintError
+
+from database.connection import driver
+from services.analytics_rollup import stamp_epoch
+
+# Appointments in these states occupy their slot
+ACTIVE_APPOINTMENT_STATUSES = ["scheduled", "confirmed", "in_progress", "urgent"]
+# Moving to one of these frees the slot for new bookings
+RELEASED_APPOINTMENT_STATUSES = ["cancelled", "no_show"]
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_DURATION_MINUTES = 30
+
+LOCK_DOCTOR_QUERY = """
+MATCH (d:Doctor {user_id: $doctor_id})
+MATCH (u:User {id: $doctor_id, role: 'doctor'})
+SET d.booking_version = coalesce(d.booking_version, 0) + 1
+RETURN d.booking_version as booking_version
+"""
+
+# Appointments booked before start/end minutes were stored are derived from
+# their HH:MM time and duration
+OVERLAP_QUERY = """
+MATCH (a:Appointment {doctor_id: $doctor_id, appointment_date: $appointment_date})
+WHERE a.status IN $active_statuses
+WITH a, coalesce(
+    a.start_minute,
+    toInteger(split(a.appointment_time, ':')[0]) * 60 + toInteger(split(a.appointment_time, ':')[1])
+) as start_minute
+WITH a, start_minute, coalesce(a.end_minute, start_minute + coalesce(a.duration_minutes, $default_duration)) as end_minute
+WHERE start_minute < $end_minute AND $start_minute < end_minute
+RETURN a.id as id, a.appointment_time as appointment_time, end_minute - start_minute as duration_minutes
+LIMIT 1
+"""
+
+def _raise_conflict(conflict):
+    raise HTTPException(
+        status_code=409,
+        detail=f"Time slot not available: overlaps the {conflict['duration_minutes']} minute "
+               f"appointment at {conflict['appointment_time']}"
+    )
+
+CREATE_APPOINTMENT_QUERY = """
+CREATE (a:Appointment {
+    id: $appointment_id,
+    patient_id: $patient_id,
+    doctor_id: $doctor_id,
+    appointment_date: $appointment_date,
+    appointment_time: $appointment_time,
+    appointment_type: $appointment_type,
+    reason: $reason,
+    duration_minutes: $duration_minutes,
+    start_minute: $start_minute,
+    end_minute: $end_minute,
+    slot_key: $slot_key,
+    status: $status,
+    is_urgent: $is_urgent,
+    created_at: datetime(),
+    updated_at: datetime()
+})
+RETURN a
+"""
+
+def parse_slot(appointment_date: str, appointment_time: str, duration_minutes: int):
+    """Validate a requested slot and return its (start, end) minute of the day"""
+    try:
+        datetime.strptime(appointment_date, "%Y-%m-%d")
+        slot_time = datetime.strptime(appointment_time, "%H:%M")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Expected appointment_date YYYY-MM-DD and appointment_time HH:MM")
+
+    start_minute = slot_time.hour * 60 + slot_time.minute
+    end_minute = start_minute + duration_minutes
+    if duration_minutes <= 0 or end_minute > MINUTES_PER_DAY:
+        raise HTTPException(status_code=400, detail="Appointment must have a positive duration and end on the same day")
+    return start_minute, end_minute
+
+def make_slot_key(doctor_id: str, appointment_date: str, appointment_time: str) -> str:
+    return f"{doctor_id}|{appointment_date}|{appointment_time}"
+
+def _reserve(tx, params: dict):
+    doctor = tx.run(LOCK_DOCTOR_QUERY, params).single()
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+
+    # The doctor lock is held from here to commit, so no other booking for
+    # this doctor can slip in between the overlap check and the create
+    conflict = tx.run(OVERLAP_QUERY, params).single()
+    if conflict:
+        _raise_conflict(conflict)
+
+    appointment = tx.run(CREATE_APPOINTMENT_QUERY, params).single()["a"]
+    return appointment, doctor["booking_version"], stamp_epoch(tx)
+
+def reserve_slot(
+    appointment_id: str,
+    patient_id: str,
+    doctor_id: str,
+    appointment_date: str,
+    appointment_time: str,
+    appointment_type: str,
+    reason: str,
+    duration_minutes: int,
+    is_urgent: bool
+):
+    """Book the slot or raise a 404/409 HTTPException, atomically.
+
+    Returns the appointment node, the doctor's new booking_version and the
+    analytics stamp of the booking.
+    """
+    start_minute, end_minute = parse_slot(appointment_date, appointment_time, duration_minutes)
+    params = {
+        "appointment_id": appointment_id,
+        "patient_id": patient_id,
+        "doctor_id": doctor_id,
+        "appointment_date": appointment_date,
+        "appointment_time": appointment_time,
+        "appointment_type": appointment_type,
+        "reason": reason,
+        "duration_minutes": duration_minutes,
+        "start_minute": start_minute,
+        "end_minute": end_minute,
+        "slot_key": make_slot_key(doctor_id, appointment_date, appointment_time),
+        "status": "urgent" if is_urgent else "scheduled",
+        "is_urgent": is_urgent,
+        "active_statuses": ACTIVE_APPOINTMENT_STATUSES,
+        "default_duration": DEFAULT_DURATION_MINUTES,
+    }
+
+    try:
+        with driver.session(default_access_mode=WRITE_ACCESS) as session:
+            return session.execute_write(_reserve, params)
+    except ConstraintError:
+        # Another transaction committed the same doctor/date/time first
+        raise HTTPException(status_code=409, detail="Time slot not available")
+
+def reclaim_slot(tx, appointment) -> str:
+    """Lock the doctor and check a released appointment's slot is still free, inside tx.
+
+    Raises a 404/409 HTTPException, or returns the slot_key to restore; the
+    caller sets the new status in the same transaction.
+    """
+    params = {
+        "doctor_id": appointment["doctor_id"],
+        "appointment_date": appointment["appointment_date"],
+        "active_statuses": ACTIVE_APPOINTMENT_STATUSES,
+        "default_duration": DEFAULT_DURATION_MINUTES,
+    }
+    start_minute = appointment.get("start_minute")
+    if start_minute is None:
+        start_minute, end_minute = parse_slot(
+            appointment["appointment_date"],
+            appointment["appointment_time"],
+            appointment.get("duration_minutes") or DEFAULT_DURATION_MINUTES
+        )
+    else:
+        end_minute = appointment["end_minute"]
+    params.update(start_minute=start_minute, end_minute=end_minute)
+
+    if not tx.run(LOCK_DOCTOR_QUERY, params).single():
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    # The appointment itself is not active, so any overlap is another booking
+    conflict = tx.run(OVERLAP_QUERY, params).single()
+    if conflict:
+        _raise_conflict(conflict)
+    return make_slot_key(appointment["doctor_id"], appointment["appointment_date"], appointment["appointment_time"])
@@ -0,0 +1,96 @@
+"""Patient timeline assembled from independent per-type event streams.
+
+Each stream (consultations, appointments, prescriptions, history entries) is
+its own index-backed query returning at most one page, newest first; the
+streams run concurrently and are k-way merged with a heap. Cost is linear in
+the page size instead of the product of the per-type counts a single
+multi-OPTIONAL MATCH query produces.
+"""
+import asyncio
+import heapq
+from itertools import islice
+from typing import Optional
+
+from database.async_connection import read_query
+from database.pagination import keyset_condition, encode_cursor
+
+# (event type, MATCH for the patient's events as `e`, OPTIONAL MATCH for the
+# doctor as `doctor`, title expression, description expression)
+TIMELINE_STREAMS = [
+    (
+        "consultation",
+        "MATCH (e:Consultation {patient_id: $patient_id})",
+        "OPTIONAL MATCH (e)<-[:RESPONDED_TO]-(doctor:Doctor)",
+        "'Medical Consultation'",
+        "e.question",
+    ),
+    (
+        "appointment",
+        "MATCH (e:Appointment {patient_id: $patient_id})",
+        "OPTIONAL MATCH (doctor:Doctor {user_id: e.doctor_id})",
+        "'Appointment'",
+        "e.reason",
+    ),
+    (
+        "prescription",
+        "MATCH (e:Prescription {patient_id: $patient_id})",
+        "OPTIONAL MATCH (doctor:Doctor {user_id: e.doctor_id})",
+        "'Prescription'",
+        "'Medication prescribed'",
+    ),
+    (
+        "medical_history",
+        "MATCH (e:MedicalHistory {patient_id: $patient_id})",
+        "OPTIONAL MATCH (doctor:Doctor {user_id: e.doctor_id})",
+        "e.title",
+        "e.description",
+    ),
+]
+
+def _stream_query(match: str, doctor_match: str, title: str, description: str, after_cursor: Optional[str]):
+    conditions = ["e.created_at IS NOT NULL"]
+    if after_cursor:
+        conditions.append(after_cursor)
+    return f"""
+    {match}
+    WHERE {' AND '.join(conditions)}
+    WITH e ORDER BY e.created_at DESC, e.id DESC LIMIT $limit
+    {doctor_match}
+    WITH e, collect(doctor)[0] as doctor
+    RETURN e, doctor, {title} as title, {description} as description
+    ORDER BY e.created_at DESC, e.id DESC
+    """
+
+async def _fetch_stream(event_type: str, query: str, params: dict):
+    records = await read_query(query, params)
+    return [
+        {
+            "type": event_type,
+            "date": record["e"]["created_at"],
+            "data": dict(record["e"]),
+            "doctor": dict(record["doctor"]) if record["doctor"] else None,
+            "title": record["title"],
+            "description": record["description"],
+        }
+        for record in records
+    ]
+
+async def get_patient_timeline(patient_id: str, limit: int, cursor: Optional[str] = None):
+    """One page of a patient's events, newest first, and the cursor for the next page"""
+    # One extra row per stream tells us whether there is a next page
+    params = {"patient_id": patient_id, "limit": limit + 1}
+    after_cursor = keyset_condition(cursor, "e.created_at", "e.id", params)
+
+    streams = await asyncio.gather(*[
+        _fetch_stream(event_type, _stream_query(match, doctor_match, title, description, after_cursor), params)
+        for event_type, match, doctor_match, title, description in TIMELINE_STREAMS
+    ])
+
+    merged = heapq.merge(*streams, key=lambda event: (event["date"], event["data"]["id"]), reverse=True)
+    events = list(islice(merged, limit + 1))
+
+    next_cursor = None
+    if len(events) > limit:
+        last = events[limit - 1]
+        next_cursor = encode_cursor(last["date"], last["data"]["id"])
+    return events[:limit], next_cursor
@@ -0,0 +1,82 @@
+"""Daily platform trends: users, consultations and appointments created per day.
+
+Each entity is counted with its own range query on the created_at index and
+grouped by (UTC) day, then merged into one dense days x entities NumPy
+array where days without any activity are zero rows.
+
+A day's counts can no longer change once it is over, so closed days are
+cached per worker and only the days not seen yet - normally just today -
+are queried again.
+"""
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from database.connection import read_query
+
+MAX_TREND_DAYS = 365
+
+# Response field and node label of each counted entity, in column order
+TREND_ENTITIES = [
+    ("new_users", "User"),
+    ("consultations", "Consultation"),
+    ("appointments", "Appointment"),
+]
+
+DAILY_COUNTS_QUERY = """
+MATCH (n:{label})
+WHERE n.created_at >= datetime($start) AND n.created_at < datetime($end)
+RETURN toString(date(n.created_at)) as day, count(n) as count
+"""
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+def count_days(start: date, end: date) -> np.ndarray:
+    """Per-day counts for start <= day < end, one row per day and one column per entity"""
+    counts = np.zeros(((end - start).days, len(TREND_ENTITIES)), dtype=np.int64)
+    params = {"start": start.isoformat(), "end": end.isoformat()}
+    for column, (_, label) in enumerate(TREND_ENTITIES):
+        records = read_query(DAILY_COUNTS_QUERY.replace("{label}", label), params)
+        if not records:
+            continue
+        rows = np.array([(date.fromisoformat(record["day"]) - start).days for record in records])
+        counts[rows, column] = [record["count"] for record in records]
+    return counts
+
+class DailyTrends:
+    """Dense daily counts with closed days cached"""
+
+    def __init__(self, max_days: int = MAX_TREND_DAYS):
+        self.max_days = max_days
+        self._closed: Dict[date, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def daily_counts(self, days: int) -> Tuple[List[date], np.ndarray]:
+        """The days from `days` ago through today and their counts, oldest first"""
+        today = _utc_today()
+        start = today - timedelta(days=days)
+        dates = [start + timedelta(days=offset) for offset in range(days + 1)]
+        with self._lock:
+            missing = [day for day in dates[:-1] if day not in self._closed]
+
+        # Closed days are fetched once; today is counted on every call
+        if missing:
+            fetched = count_days(missing[0], missing[-1] + timedelta(days=1))
+        today_counts = count_days(today, today + timedelta(days=1))
+
+        with self._lock:
+            if missing:
+                for offset, row in enumerate(fetched):
+                    self._closed[missing[0] + timedelta(days=offset)] = row
+            oldest_kept = today - timedelta(days=self.max_days)
+            for cached_day in [cached_day for cached_day in self._closed if cached_day < oldest_kept]:
+                del self._closed[cached_day]
+            closed_rows = [self._closed[day] for day in dates[:-1]]
+
+        counts = np.vstack(closed_rows + [today_counts[0]]) if closed_rows else today_counts
+        return dates, counts
+
+platform_trends = DailyTrends()
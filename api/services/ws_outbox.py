@@ -0,0 +1,173 @@
+"""Bounded outbound queues for WebSocket clients.
+
+Senders never await a client's socket. Each connection gets an Outbox: a
+bounded queue drained by its own writer task, so a slow client only delays
+its own messages. put() never blocks; what happens when a message can't be
+queued depends on how it was sent:
+
+    coalesce_key - replaces a message with the same key that is still
+                   queued (latest state wins, e.g. presence per user)
+    droppable    - when the queue is full, the oldest queued droppable
+                   message is evicted for it, or the new one is dropped
+
+A full queue with nothing droppable means the client can't keep up with
+messages it must receive, so the connection is closed instead of growing
+without bound.
+"""
+import asyncio
+import weakref
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from config.settings import WEBSOCKET_SEND_QUEUE_SIZE, WEBSOCKET_SEND_TIMEOUT_SECONDS
+
+class OutboxMetrics:
+    """Counters and live queue depth of every outbox of one connection manager"""
+
+    def __init__(self):
+        self.enqueued = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.overflow_disconnects = 0
+        self.send_failures = 0
+        self.peak_depth = 0
+        self._outboxes = weakref.WeakSet()
+
+    def snapshot(self) -> dict:
+        depths = [len(outbox) for outbox in self._outboxes if not outbox.closed]
+        return {
+            "connections": len(depths),
+            "queued": sum(depths),
+            "max_depth": max(depths, default=0),
+            "peak_depth": self.peak_depth,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "overflow_disconnects": self.overflow_disconnects,
+            "send_failures": self.send_failures
+        }
+
+_metrics: Dict[str, OutboxMetrics] = {}
+
+def get_outbox_metrics(name: str) -> OutboxMetrics:
+    return _metrics.setdefault(name, OutboxMetrics())
+
+def get_outbox_stats() -> dict:
+    return {name: metrics.snapshot() for name, metrics in _metrics.items()}
+
+class Outbox:
+    """Outbound queue of one WebSocket, drained by a writer task"""
+
+    def __init__(
+        self,
+        websocket,
+        metrics: OutboxMetrics,
+        on_close: Optional[Callable[[], None]] = None,
+        max_messages: int = WEBSOCKET_SEND_QUEUE_SIZE,
+        send_timeout: float = WEBSOCKET_SEND_TIMEOUT_SECONDS
+    ):
+        self.websocket = websocket
+        self.metrics = metrics
+        self.max_messages = max_messages
+        self.send_timeout = send_timeout
+        self.closed = False
+        self._on_close = on_close
+        # Entries are [coalesce_key, message, droppable] so coalescing can update them in place
+        self._queue = deque()
+        self._keyed = {}
+        self._ready = asyncio.Event()
+        metrics._outboxes.add(self)
+        self._writer = asyncio.create_task(self._run())
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, message: str, coalesce_key: Optional[str] = None, droppable: bool = False) -> bool:
+        """Queue a message without waiting; False if it was dropped or the outbox is closed"""
+        if self.closed:
+            return False
+
+        if coalesce_key is not None:
+            entry = self._keyed.get(coalesce_key)
+            if entry is not None:
+                entry[1] = message
+                self.metrics.coalesced += 1
+                return True
+
+        if len(self._queue) >= self.max_messages and not self._evict_droppable():
+            if droppable:
+                self.metrics.dropped += 1
+                return False
+            self.metrics.overflow_disconnects += 1
+            self.close()
+            return False
+
+        entry = [coalesce_key, message, droppable]
+        self._queue.append(entry)
+        if coalesce_key is not None:
+            self._keyed[coalesce_key] = entry
+        self.metrics.enqueued += 1
+        self.metrics.peak_depth = max(self.metrics.peak_depth, len(self._queue))
+        self._ready.set()
+        return True
+
+    def _evict_droppable(self) -> bool:
+        for entry in self._queue:
+            if entry[2]:
+                self._queue.remove(entry)
+                if entry[0] is not None and self._keyed.get(entry[0]) is entry:
+                    del self._keyed[entry[0]]
+                self.metrics.dropped += 1
+                return True
+        return False
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                while not self._queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                entry = self._queue.popleft()
+                if entry[0] is not None and self._keyed.get(entry[0]) is entry:
+                    del self._keyed[entry[0]]
+                # A timer rather than wait_for, which would start a task per message
+                deadline = loop.call_later(self.send_timeout, self._send_timed_out)
+                try:
+                    await self.websocket.send_text(entry[1])
+                finally:
+                    deadline.cancel()
+                self.metrics.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            self.metrics.send_failures += 1
+        finally:
+            self._shutdown()
+
+    def _send_timed_out(self):
+        self.metrics.send_failures += 1
+        self._writer.cancel()
+
+    def _shutdown(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        self._keyed.clear()
+        asyncio.create_task(self._close_socket())
+        if self._on_close is not None:
+            self._on_close()
+
+    async def _close_socket(self):
+        try:
+            await asyncio.wait_for(self.websocket.close(), self.send_timeout)
+        except Exception:
+            pass
+
+    def close(self):
+        """Stop the writer, discard queued messages and close the socket"""
+        self._writer.cancel()
+        self._shutdown()
@@ -144,6 +144,38 @@ def test_imports():
     except Exception as e:
         print(f"❌ Import failed: {e}")
 
+def test_busy_hash_pool_returns_503():
+    """A full hashing queue surfaces as 503 from the reset handler, not 500"""
+    print("\n⏳ Testing Busy Hash Pool")
+    print("=" * 40)
+    
+    import asyncio
+    from fastapi import HTTPException
+    import auth.utils
+    import routers.password_reset as password_reset
+    from config.settings import PASSWORD_HASH_QUEUE_LIMIT
+    
+    async def valid_token(query, params=None):
+        return [{"r": {"token": params["token"]}, "u": {"id": "user-1", "email": "test@example.com"}}]
+    
+    original_read_query = password_reset.read_query
+    original_pending = auth.utils._pending_hash_jobs
+    password_reset.read_query = valid_token
+    auth.utils._pending_hash_jobs = PASSWORD_HASH_QUEUE_LIMIT
+    try:
+        asyncio.run(password_reset.confirm_password_reset(
+            PasswordResetConfirm(token="test_token_123", new_password="newpassword123")
+        ))
+        status_code = 200
+    except HTTPException as e:
+        status_code = e.status_code
+    finally:
+        password_reset.read_query = original_read_query
+        auth.utils._pending_hash_jobs = original_pending
+    
+    print(f"Confirm with a full hash queue: {status_code} (should be 503)")
+    assert status_code == 503, status_code
+
 def main():
     """Run all tests"""
     print("🔍 Password Reset Functionality Analysis")
@@ -154,6 +186,7 @@ def main():
     test_password_hashing()
     test_token_generation()
     test_validation_logic()
+    test_busy_hash_pool_returns_503()
     
     print("\n" + "=" * 50)
     print("🎯 Analysis Complete!")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Concurrency test for appointment slot reservation
+Hammers one doctor's slot from many threads against the configured Neo4j database
+and checks that exactly one overlapping booking wins, including when a cancelled
+appointment is moved back to scheduled
+"""
+
+import sys
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import HTTPException
+from database.connection import driver
+from services.slot_reservation import reserve_slot, parse_slot, make_slot_key
+from routers.advanced_appointments import AppointmentUpdate, cancel_appointment, update_appointment
+
+THREADS = 32
+TEST_DATE = "2099-01-05"
+
+def try_booking(doctor_id, appointment_time, duration_minutes):
+    """Attempt one booking and return its HTTP status"""
+    try:
+        reserve_slot(
+            appointment_id=str(uuid.uuid4()),
+            patient_id=f"slot-test-patient-{uuid.uuid4()}",
+            doctor_id=doctor_id,
+            appointment_date=TEST_DATE,
+            appointment_time=appointment_time,
+            appointment_type="consultation",
+            reason="slot reservation concurrency test",
+            duration_minutes=duration_minutes,
+            is_urgent=False
+        )
+        return 200
+    except HTTPException as e:
+        return e.status_code
+
+def test_parse_slot():
+    """Slot validation needs no database"""
+    assert parse_slot(TEST_DATE, "10:00", 30) == (600, 630)
+    assert parse_slot(TEST_DATE, "00:00", 15) == (0, 15)
+    assert parse_slot(TEST_DATE, "23:30", 30) == (1410, 1440)
+    for appointment_date, appointment_time, duration_minutes in [
+        ("05/01/2099", "10:00", 30),  # wrong date format
+        (TEST_DATE, "10am", 30),      # wrong time format
+        (TEST_DATE, "25:00", 30),     # no such hour
+        (TEST_DATE, "10:00", 0),      # no duration
+        (TEST_DATE, "23:45", 30),     # runs past midnight
+    ]:
+        with pytest.raises(HTTPException) as excinfo:
+            parse_slot(appointment_date, appointment_time, duration_minutes)
+        assert excinfo.value.status_code == 400
+    print("✅ parse_slot accepts same-day slots and rejects the rest with 400")
+
+def test_make_slot_key():
+    assert make_slot_key("doctor-1", TEST_DATE, "10:00") == f"doctor-1|{TEST_DATE}|10:00"
+    # One key per doctor/date/time, so the uniqueness constraint only collides on the same slot
+    assert make_slot_key("doctor-1", TEST_DATE, "10:00") != make_slot_key("doctor-2", TEST_DATE, "10:00")
+    assert make_slot_key("doctor-1", TEST_DATE, "10:00") != make_slot_key("doctor-1", TEST_DATE, "10:30")
+    print("✅ make_slot_key is unique per doctor, date and time")
+
+def test_slot_reservation():
+    print("🗓️  Testing Concurrent Slot Reservation")
+    print("=" * 50)
+
+    try:
+        driver.verify_connectivity()
+    except Exception as e:
+        pytest.skip(f"Neo4j not reachable: {e}")
+
+    doctor_id = f"slot-test-doctor-{uuid.uuid4()}"
+    with driver.session() as session:
+        session.run(
+            """
+            CREATE (:User {id: $doctor_id, role: 'doctor', email: $doctor_id + '@example.com'})
+            CREATE (:Doctor {user_id: $doctor_id, full_name: 'Slot Test Doctor'})
+            """,
+            doctor_id=doctor_id
+        ).consume()
+
+    try:
+        # Same start time from every thread
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            statuses = list(executor.map(lambda _: try_booking(doctor_id, "10:00", 30), range(THREADS)))
+        print(f"Same slot:        {statuses.count(200)} booked, {statuses.count(409)} rejected (409)")
+        assert statuses.count(200) == 1, statuses
+        assert statuses.count(409) == THREADS - 1, statuses
+
+        # Different start times that all overlap 11:00-12:00
+        times = [f"11:{minute:02d}" for minute in range(0, 60, 5)] * (THREADS // 12 + 1)
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            statuses = list(executor.map(lambda t: try_booking(doctor_id, t, 60), times[:THREADS]))
+        print(f"Overlapping slots: {statuses.count(200)} booked, {statuses.count(409)} rejected (409)")
+        assert statuses.count(200) == 1, statuses
+
+        # Back-to-back slots do not overlap
+        assert try_booking(doctor_id, "09:30", 30) == 200
+        assert try_booking(doctor_id, "10:30", 30) == 200
+        print("Adjacent slots:   both booked")
+
+        # Cancel, let someone else take the slot, then try to reschedule the cancelled one
+        patient = {"id": f"slot-test-patient-{uuid.uuid4()}"}
+        appointment, _, _ = reserve_slot(
+            appointment_id=str(uuid.uuid4()),
+            patient_id=patient["id"],
+            doctor_id=doctor_id,
+            appointment_date=TEST_DATE,
+            appointment_time="14:00",
+            appointment_type="consultation",
+            reason="slot reservation reschedule test",
+            duration_minutes=30,
+            is_urgent=False
+        )
+        cancel_appointment(appointment["id"], "reschedule test", patient)
+        assert try_booking(doctor_id, "14:15", 30) == 200
+        try:
+            update_appointment(appointment["id"], AppointmentUpdate(status="scheduled"), patient)
+            status = 200
+        except HTTPException as e:
+            status = e.status_code
+        print(f"Reschedule into taken slot: {status}")
+        assert status == 409, status
+
+        print("✅ Exactly one booking won every contested slot")
+    finally:
+        with driver.session() as session:
+            session.run(
+                """
+                MATCH (n) WHERE n:Appointment AND n.doctor_id = $doctor_id
+                   OR n:Doctor AND n.user_id = $doctor_id
+                   OR n:User AND n.id = $doctor_id
+                DETACH DELETE n
+                """,
+                doctor_id=doctor_id
+            ).consume()
+
+if __name__ == "__main__":
+    test_parse_slot()
+    test_make_slot_key()
+    test_slot_reservation()